@@ -5,6 +5,11 @@ import sys
 
 import pygame
 
+from src.asset_manager import get_asset_manager
+from src.engine.engine_service import close_engine_service
+from src.engine.evaluation_cache import close_evaluation_cache
+from src.engine.opening_book import close_opening_book
+from src.engine.tablebase import close_tablebase
 from src.enums import GameState, GlobalConstants
 from src.game import Game
 from src.gamestates.menu import Menu
@@ -12,27 +17,41 @@ from src.gamestates.mid_game import MidGame
 from src.gamestates.post_game import PostGame
 from src.gamestates.pre_game import PreGame
 from src.gamestates.splash import Splash
+from src.timing import get_startup_timer
 
 
 if __name__ == "__main__":
     try:
+        get_startup_timer()
         pygame.init()
         screen = pygame.display.set_mode((GlobalConstants.X_SCREEN_SIZE.value, GlobalConstants.Y_SCREEN_SIZE.value))
         pygame.display.set_caption("Schach mit Power-Ups")
-        states = {
-            GameState.SPLASH: Splash(),
-            GameState.MENU: Menu(),
-            GameState.PRE_GAME: PreGame(),
-            GameState.MID_GAME: MidGame(),
-            GameState.POST_GAME: PostGame(),
+        get_startup_timer().mark("display created")
+        # the states are created when they are entered the first time
+        state_factories = {
+            GameState.SPLASH: Splash,
+            GameState.MENU: Menu,
+            GameState.PRE_GAME: PreGame,
+            GameState.MID_GAME: MidGame,
+            GameState.POST_GAME: PostGame,
         }
 
-        game = Game(screen, states, GameState.SPLASH)
+        game = Game(screen, state_factories, GameState.SPLASH)
         game.run()
 
+        close_engine_service()
+        close_evaluation_cache()
+        close_opening_book()
+        close_tablebase()
+        get_asset_manager().close()
         pygame.quit()
         sys.exit()
     except Exception as e:
         print(e)
+        close_engine_service()
+        close_evaluation_cache()
+        close_opening_book()
+        close_tablebase()
+        get_asset_manager().close()
         pygame.quit()
         sys.exit()
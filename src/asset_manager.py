@@ -0,0 +1,127 @@
+"""
+This module contains the AssetManager class, which decodes and scales the images of the game in a thread pool.
+"""
+import concurrent.futures
+
+import pygame
+
+from .asset_pack import AssetKey, AssetPack, open_asset_pack_or_none
+from .config.globals import ASSET_LOADER_THREADS, ASSET_PACK_PATH
+
+
+def load_scaled_images(path: str, sizes: list[tuple[int, int] | None],
+                       asset_pack: AssetPack | None) -> dict[tuple[int, int] | None, pygame.Surface]:
+    """
+    Gets an image in every size. Sizes in the asset pack are used without decoding, for the others the image is
+    decoded once and scaled.
+    :param path: image path
+    :param sizes: sizes, None for the original size
+    :param asset_pack: asset pack or None
+    :return: images by size
+    """
+    images = {}
+    if asset_pack is not None:
+        for size in sizes:
+            if size is not None:
+                image = asset_pack.get_image_or_none(path, size)
+                if image is not None:
+                    images[size] = image
+    missing_sizes = [size for size in sizes if size not in images]
+    if missing_sizes:
+        image = pygame.image.load(path)
+        for size in missing_sizes:
+            images[size] = image if size is None else pygame.transform.scale(image, size)
+    return images
+
+
+class AssetManager:
+    """
+    This class represents the images of the game by (path, size). Preloaded images are decoded and scaled in a
+    thread pool, every image is converted to the display format once on the main thread, when it is first used.
+    Images in the asset pack are taken from it instead of decoding the source.
+    """
+    executor: concurrent.futures.ThreadPoolExecutor
+    futures: dict[AssetKey, concurrent.futures.Future]
+    images: dict[AssetKey, pygame.Surface]
+    asset_pack: AssetPack | None
+
+    def __init__(self, threads: int, asset_pack_path: str) -> None:
+        self.executor = concurrent.futures.ThreadPoolExecutor(threads, thread_name_prefix="asset-loader")
+        self.futures = {}
+        self.images = {}
+        self.asset_pack = open_asset_pack_or_none(asset_pack_path)
+
+    def preload(self, keys: list[AssetKey]) -> None:
+        """
+        Starts loading images in the background. Every path is decoded once for all of its sizes.
+        :param keys: (path, size) of the images, size None for the original size
+        """
+        sizes_by_path = {}
+        for path, size in keys:
+            if (path, size) not in self.images and (path, size) not in self.futures:
+                sizes_by_path.setdefault(path, []).append(size)
+        for path, sizes in sizes_by_path.items():
+            future = self.executor.submit(load_scaled_images, path, sizes, self.asset_pack)
+            for size in sizes:
+                self.futures[(path, size)] = future
+
+    def is_loading(self) -> bool:
+        """
+        Checks if preloaded images are still decoded.
+        :return: True if loading, False otherwise
+        """
+        return any(not future.done() for future in self.futures.values())
+
+    def is_loaded(self, path: str, size: tuple[int, int] | None = None) -> bool:
+        """
+        Checks if an image can be got without waiting for the decoding.
+        :param path: image path
+        :param size: size or None for the original size
+        :return: True if loaded, False otherwise
+        """
+        future = self.futures.get((path, size))
+        return (path, size) in self.images or (future is not None and future.done())
+
+    def get_image(self, path: str, size: tuple[int, int] | None = None) -> pygame.Surface:
+        """
+        Gets an image. A preloaded image is waited for, an unknown image is loaded at once. The surface is shared,
+        so it must not be drawn on.
+        :param path: image path
+        :param size: size or None for the original size
+        :return: image
+        """
+        key = (path, size)
+        image = self.images.get(key)
+        if image is not None:
+            return image
+        future = self.futures.pop(key, None)
+        if future is not None:
+            image = future.result()[size]
+        else:
+            image = load_scaled_images(path, [size], self.asset_pack)[size]
+        # converting needs a display mode
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha() if image.get_flags() & pygame.SRCALPHA else image.convert()
+        self.images[key] = image
+        return image
+
+    def close(self) -> None:
+        """
+        Stops loading, images that are not decoded yet are dropped.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.futures.clear()
+
+
+_asset_manager: AssetManager | None = None
+
+
+def get_asset_manager() -> AssetManager:
+    """
+    Gets the asset manager shared by the whole game.
+    :return: asset manager
+    """
+    global _asset_manager
+    if _asset_manager is None:
+        _asset_manager = AssetManager(ASSET_LOADER_THREADS, ASSET_PACK_PATH)
+    return _asset_manager
@@ -0,0 +1,169 @@
+"""
+This module contains the AssetPack class, images stored pre-scaled as raw RGBA in one memory-mapped file.
+Build the pack with: python -m src.asset_pack
+"""
+import json
+import mmap
+import os
+import struct
+
+import pygame
+
+from .config.globals import ASSET_PACK_PATH, ASSET_PACK_MIP_LEVELS
+
+PACK_MAGIC = b"CWPPACK1"
+# magic and length of the index
+PACK_HEADER = struct.Struct("<8sI")
+PACK_ALIGNMENT = 16
+MIN_MIP_SIZE = 8
+
+AssetKey = tuple[str, tuple[int, int] | None]
+
+
+def get_pack_path_key(path: str) -> str:
+    """
+    Gets the key of an image path in the index, the same on every system.
+    :param path: image path
+    :return: key
+    """
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+def get_source_stamp(path: str) -> list[int]:
+    """
+    Gets the size and the modification time of a source image, to find outdated images in the pack.
+    :param path: image path
+    :return: size and modification time in nanoseconds
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def get_mip_sizes(size: tuple[int, int], mip_levels: int) -> list[tuple[int, int]]:
+    """
+    Gets a size and its mip levels, every level is half as large as the one before.
+    :param size: size
+    :param mip_levels: number of levels below the size
+    :return: sizes
+    """
+    sizes = [size]
+    for _ in range(mip_levels):
+        size = (size[0] // 2, size[1] // 2)
+        if min(size) < MIN_MIP_SIZE:
+            break
+        sizes.append(size)
+    return sizes
+
+
+def build_asset_pack(keys: list[AssetKey], pack_path: str, mip_levels: int) -> int:
+    """
+    Builds the asset pack. Every image is decoded once and stored in each size and its mip levels.
+    :param keys: (path, size) of the images, images in their original size are skipped
+    :param pack_path: path of the pack
+    :param mip_levels: number of mip levels below each size
+    :return: number of stored images
+    """
+    sizes_by_path = {}
+    for path, size in keys:
+        if size is not None:
+            sizes_by_path.setdefault(path, set()).update(get_mip_sizes(size, mip_levels))
+    entries = []
+    sources = {}
+    data = bytearray()
+    for path, sizes in sizes_by_path.items():
+        image = pygame.image.load(path)
+        sources[get_pack_path_key(path)] = get_source_stamp(path)
+        for size in sorted(sizes):
+            data += bytes(-len(data) % PACK_ALIGNMENT)
+            entries.append({"path": get_pack_path_key(path), "width": size[0], "height": size[1],
+                            "offset": len(data)})
+            data += pygame.image.tobytes(pygame.transform.scale(image, size), "RGBA")
+    index = json.dumps({"sources": sources, "entries": entries}).encode("utf-8")
+    # the data starts aligned behind the header and the index
+    header_length = PACK_HEADER.size + len(index)
+    padding = -header_length % PACK_ALIGNMENT
+    os.makedirs(os.path.dirname(pack_path) or ".", exist_ok=True)
+    with open(pack_path, "wb") as file:
+        file.write(PACK_HEADER.pack(PACK_MAGIC, len(index)))
+        file.write(index)
+        file.write(bytes(padding))
+        file.write(data)
+    return len(entries)
+
+
+class AssetPack:
+    """
+    This class represents an opened asset pack. The file is memory-mapped, surfaces are built on the mapped bytes
+    without decoding. Images whose source changed after the pack was built are not used.
+    """
+    buffer: mmap.mmap
+    data_offset: int
+    entries: dict[str, dict[tuple[int, int], int]]
+    fresh_paths: set[str]
+
+    def __init__(self, pack_path: str) -> None:
+        with open(pack_path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = PACK_HEADER.unpack_from(self.buffer, 0)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{pack_path} is not an asset pack")
+        index = json.loads(self.buffer[PACK_HEADER.size:PACK_HEADER.size + index_length])
+        header_length = PACK_HEADER.size + index_length
+        self.data_offset = header_length + -header_length % PACK_ALIGNMENT
+        self.entries = {}
+        for entry in index["entries"]:
+            self.entries.setdefault(entry["path"], {})[(entry["width"], entry["height"])] = entry["offset"]
+        self.fresh_paths = {path for path, stamp in index["sources"].items()
+                            if os.path.exists(path) and get_source_stamp(path) == stamp}
+
+    def get_image_or_none(self, path: str, size: tuple[int, int]) -> pygame.Surface | None:
+        """
+        Gets an image in a size. A size that is not stored is scaled from the smallest larger mip level.
+        :param path: image path
+        :param size: size
+        :return: image or None if the image is not in the pack or outdated
+        """
+        key = get_pack_path_key(path)
+        if key not in self.fresh_paths:
+            return None
+        offsets = self.entries.get(key, {})
+        if size in offsets:
+            return self._get_surface(offsets[size], size)
+        larger_sizes = [stored for stored in offsets if stored[0] >= size[0] and stored[1] >= size[1]]
+        if not larger_sizes:
+            return None
+        stored_size = min(larger_sizes)
+        return pygame.transform.scale(self._get_surface(offsets[stored_size], stored_size), size)
+
+    def _get_surface(self, offset: int, size: tuple[int, int]) -> pygame.Surface:
+        """
+        Builds a surface on the mapped bytes.
+        :param offset: offset of the image in the data
+        :param size: size
+        :return: surface
+        """
+        start = self.data_offset + offset
+        return pygame.image.frombuffer(memoryview(self.buffer)[start:start + size[0] * size[1] * 4], size, "RGBA")
+
+
+def open_asset_pack_or_none(pack_path: str) -> AssetPack | None:
+    """
+    Opens the asset pack.
+    :param pack_path: path of the pack
+    :return: asset pack or None if there is no usable pack
+    """
+    if not os.path.exists(pack_path):
+        return None
+    try:
+        return AssetPack(pack_path)
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print(e)
+        return None
+
+
+if __name__ == "__main__":
+    from .gamestates.mid_game import MidGame
+
+    pygame.init()
+    count = build_asset_pack(MidGame.get_asset_keys(), ASSET_PACK_PATH, ASSET_PACK_MIP_LEVELS)
+    print(f'{count} images written to {ASSET_PACK_PATH} ({os.path.getsize(ASSET_PACK_PATH)} bytes)')
@@ -0,0 +1,40 @@
+"""
+This module benchmarks the built-in chess engine. Run it with: python -m src.benchmark
+"""
+import sys
+import time
+
+import chess
+import chess.engine
+
+from src.engine.python_engine import Searcher
+
+BENCHMARK_POSITIONS = [
+    chess.STARTING_FEN,
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+]
+
+
+def run_benchmark(depth: int) -> tuple[int, float]:
+    """
+    Searches every benchmark position to a fixed depth with a fresh search.
+    :param depth: search depth
+    :return: nodes and seconds
+    """
+    nodes = 0
+    elapsed = 0.0
+    for fen in BENCHMARK_POSITIONS:
+        searcher = Searcher()
+        start = time.perf_counter()
+        searcher.search(chess.Board(fen), chess.engine.Limit(depth=depth))
+        elapsed += time.perf_counter() - start
+        nodes += searcher.nodes
+    return nodes, elapsed
+
+
+if __name__ == "__main__":
+    nodes, elapsed = run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
+    print(f'{nodes} nodes in {elapsed:.2f}s: {int(nodes / elapsed)} nodes per second')
@@ -3,3 +3,34 @@ Global variables
 """
 CHESS_BOARD_COLORS = [(255, 206, 158), (209, 139, 71)]
 ENGINE_PATH = r"assets/stockfish/stockfish-windows-x86-64-avx2.exe"
+ENGINE_POOL_SIZE = 2
+EVALUATION_STREAMING = True
+EVALUATION_MAX_TIME = 2.0
+EVALUATION_STABLE_PLIES = 4
+EVALUATION_STABLE_MARGIN = 15
+EVALUATION_CACHE_MEMORY = 4 * 1024 * 1024
+EVALUATION_CACHE_MIN_DEPTH = 14
+AI_HELPS_CACHE_MIN_DEPTH = 18
+ANALYSIS_STORE_PATH = r"analysis_store.sqlite3"
+ANALYSIS_STORE_MAX_ENTRIES = 200000
+AI_PONDER = True
+OPENING_BOOK_PATH = r"assets/books/book.bin"
+OPENING_BOOK_MAX_PLIES = 16
+SYZYGY_PATH = r"assets/syzygy"
+SYZYGY_CACHE_SIZE = 65536
+POWER_UP_SEARCH_SHARE = 0.3
+POWER_UP_SEARCH_CANDIDATES = 6
+POWER_UP_SEARCH_SAMPLES = 8
+POWER_UP_SEARCH_MARGIN = 80
+POWER_UP_POLICY_SHARE = 0.3
+POWER_UP_POLICY_MARGIN = 50
+POWER_UP_POLICY_DOUBLE_MOVES = 4
+DIRTY_RECT_RENDERING = True
+FRAME_STATS_REPORT = False
+ENGINE_STATS_REPORT = False
+IDLE_WAIT_TIME = 250
+EVALUATION_BAR_SMOOTHING_TIME = 150
+ASSET_LOADER_THREADS = 4
+STARTUP_TIMING_REPORT = True
+ASSET_PACK_PATH = r"assets/pack/assets.pack"
+ASSET_PACK_MIP_LEVELS = 2
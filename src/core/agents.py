@@ -0,0 +1,123 @@
+"""
+This module contains the agents that play games in the headless simulator.
+"""
+import random
+from abc import ABC, abstractmethod
+
+import chess
+
+from ..core.game_core import GameCore
+from ..enums import ChessColor, PowerUpTypes
+from ..mid_game.power_ups import PowerUp
+
+PIECE_VALUES = {chess.PAWN: 1, chess.KNIGHT: 3, chess.BISHOP: 3, chess.ROOK: 5, chess.QUEEN: 9, chess.KING: 0}
+
+
+def get_material_score(board: chess.Board) -> float:
+    """
+    Gets a score from the material on the board, in the range of the evaluation bar.
+    :param board: board
+    :return: score from -1, black wins, to 1, white wins
+    """
+    balance = 0
+    for piece_type, value in PIECE_VALUES.items():
+        balance += value * (len(board.pieces(piece_type, chess.WHITE)) - len(board.pieces(piece_type, chess.BLACK)))
+    return max(-1.0, min(1.0, balance / 10))
+
+
+class Agent(ABC):
+    """
+    This class represents a player of the simulator. An agent decides on the power-ups, the draw offers and the
+    moves of one color.
+    """
+    def choose_powerup_or_none(self, core: GameCore, color: ChessColor) -> PowerUp | None:
+        """
+        Chooses a power-up to use at the start of the turn.
+        :param core: game core
+        :param color: color of the agent
+        :return: power-up of the inventory or None
+        """
+        return None
+
+    def offers_draw(self, core: GameCore, color: ChessColor) -> bool:
+        """
+        Decides whether to offer a draw during the turn.
+        :param core: game core
+        :param color: color of the agent
+        :return: True to offer a draw, False otherwise
+        """
+        return False
+
+    def accepts_draw(self, core: GameCore, color: ChessColor) -> bool:
+        """
+        Decides whether to accept the open draw offer during the turn.
+        :param core: game core
+        :param color: color of the agent
+        :return: True to accept, False otherwise
+        """
+        return False
+
+    @abstractmethod
+    def choose_move(self, core: GameCore, color: ChessColor, moves: list[chess.Move]) -> chess.Move:
+        """
+        Chooses a move.
+        :param core: game core
+        :param color: color of the agent
+        :param moves: legal moves, never empty
+        :return: move
+        """
+
+
+class RandomAgent(Agent):
+    """
+    This class represents an agent that plays random moves. It uses its power-ups and offers and accepts draws by
+    chance, which makes it good for fuzzing the rules.
+    """
+    powerup_chance: float
+    draw_chance: float
+
+    def __init__(self, powerup_chance: float = 0.5, draw_chance: float = 0.0) -> None:
+        self.powerup_chance = powerup_chance
+        self.draw_chance = draw_chance
+
+    def choose_powerup_or_none(self, core, color):
+        power_ups = core.players[color].get_powerups()
+        if not power_ups or random.random() >= self.powerup_chance:
+            return None
+        return random.choice(power_ups)
+
+    def offers_draw(self, core, color):
+        return random.random() < self.draw_chance
+
+    def accepts_draw(self, core, color):
+        return random.random() < self.draw_chance
+
+    def choose_move(self, core, color, moves):
+        return random.choice(moves)
+
+
+class GreedyAgent(Agent):
+    """
+    This class represents an agent that captures the most valuable piece it can, promotes to a queen and otherwise
+    plays a random move. It uses destroy, random promotion and double move at once.
+    """
+    def choose_powerup_or_none(self, core, color):
+        for power_up in core.players[color].get_powerups():
+            if power_up.power_up_type != PowerUpTypes.AI_HELPS:
+                return power_up
+        return None
+
+    def choose_move(self, core, color, moves):
+        best_value = 0
+        best_moves = []
+        for move in moves:
+            captured_piece_type = core.board.piece_type_at(move.to_square)
+            value = PIECE_VALUES[captured_piece_type] if captured_piece_type is not None else 0
+            if move.promotion is not None:
+                value += PIECE_VALUES[move.promotion] - 1
+            if value > best_value:
+                best_value = value
+                best_moves = [move]
+            elif value == best_value:
+                best_moves.append(move)
+        return random.choice(best_moves)
@@ -0,0 +1,207 @@
+"""
+This module contains the GameCore class, the rules of a game with power-ups without anything to draw.
+"""
+import random
+
+import chess
+
+from ..enums import ChessColor, MidGamePersistentDataKeys, PowerUpTypes
+from ..mid_game.player import Player
+from ..mid_game.power_ups import PowerUp, DestroyPowerUp, DoubleMovePowerUp, AIHelpsPowerUp, RandomPromotionPowerUp
+
+# the behind player gets a power-up once the score is this far against them
+POWER_UP_SCORE_MARGIN = 0.1
+POWER_UP_WEIGHTS = {
+    PowerUpTypes.DESTROY: 0.5,
+    PowerUpTypes.DOUBLE_MOVE: 0.5,  # Double move is less likely
+    PowerUpTypes.AI_HELPS: 1,
+    PowerUpTypes.RANDOM_PROMOTION: 0.8
+}
+
+
+class GameCore:
+    """
+    This class represents the rules of the game: moves, power-ups, draw offers and the end of the game. The mid game
+    and the headless simulator both play through it. The draw offers are kept in the mid_game_persist, which the
+    mid game shares with its player UI.
+    """
+    board: chess.Board
+    players: dict[ChessColor, Player]
+    power_up_multiplicator: float
+    mid_game_persist: dict[MidGamePersistentDataKeys, object]
+    double_move: bool
+
+    def __init__(self, board: chess.Board) -> None:
+        self.board = board
+        self.players = {}
+        self.power_up_multiplicator = 0
+        self.mid_game_persist = {}
+        self.double_move = False
+
+    def reset(self, players: dict[ChessColor, Player], power_up_multiplicator: float) -> None:
+        """
+        Resets the board for a new game.
+        :param players: players by color that hold power-ups
+        :param power_up_multiplicator: chance of a power-up from 1 to 10
+        """
+        self.board.reset()
+        self.players = players
+        self.power_up_multiplicator = power_up_multiplicator
+        self.mid_game_persist = {
+            MidGamePersistentDataKeys.DRAW_OFFERED: None,
+            MidGamePersistentDataKeys.DRAW_ACCEPTED: False,
+            MidGamePersistentDataKeys.FORFEIT: False
+        }
+        self.double_move = False
+
+    def get_legal_moves(self) -> list[chess.Move]:
+        """
+        Gets the legal moves. Moves that capture the king, which a power-up can allow, are left out.
+        :return: legal moves
+        """
+        kings = self.board.kings
+        return [move for move in self.board.legal_moves if not chess.BB_SQUARES[move.to_square] & kings]
+
+    def get_power_up_types(self) -> list[PowerUpTypes]:
+        """
+        Gets the power-ups both players hold, they change what a position is worth.
+        :return: power-up types
+        """
+        return [power_up.power_up_type for player in self.players.values() for power_up in player.get_powerups()]
+
+    def add_powerup(self, color: ChessColor, score: float) -> PowerUp | None:
+        """
+        Gives the player a random power-up at the start of their turn if they are behind.
+        :param color: color of the player
+        :param score: score from -1, black wins, to 1, white wins
+        :return: power-up or None
+        """
+        player = self.players.get(color)
+        if player is None:
+            return None
+        if color == ChessColor.WHITE and score > -POWER_UP_SCORE_MARGIN:
+            return None
+        if color == ChessColor.BLACK and score < POWER_UP_SCORE_MARGIN:
+            return None
+        power_up = self.get_random_powerup_or_none()
+        player.add_powerup(power_up)
+        return power_up
+
+    def get_random_powerup_or_none(self, power_up_weights=None) -> PowerUp | None:
+        """
+        Gets a random powerup or None, with individual probabilities for each powerup.
+        :param power_up_weights: Dictionary with PowerUpTypes as keys and their weights as values.
+        :return: random powerup or None
+        """
+        probability = self.power_up_multiplicator / 10  # Convert the multiplier into a probability between 0.1 and 1.0
+
+        # Default weights if none provided
+        if power_up_weights is None:
+            power_up_weights = POWER_UP_WEIGHTS
+
+        # If a random number is less than the probability, we give a power-up
+        if random.random() < probability:
+            total_weight = sum(power_up_weights.values())
+            random_choice = random.uniform(0, total_weight)
+            cumulative_weight = 0
+
+            for power_up_type, weight in power_up_weights.items():
+                cumulative_weight += weight
+                if random_choice <= cumulative_weight:
+                    if power_up_type == PowerUpTypes.DESTROY:
+                        return DestroyPowerUp()
+                    elif power_up_type == PowerUpTypes.DOUBLE_MOVE:
+                        return DoubleMovePowerUp()
+                    elif power_up_type == PowerUpTypes.AI_HELPS:
+                        return AIHelpsPowerUp()
+                    elif power_up_type == PowerUpTypes.RANDOM_PROMOTION:
+                        return RandomPromotionPowerUp()
+                    break
+
+        return None
+
+    def use_powerup(self, color: ChessColor, power_up: PowerUp) -> None:
+        """
+        Uses a power-up of the player to move. Destroy and random promotion change the board at once, a double move
+        lasts until the next move. AI helps does not change the board, the caller shows the move of the engine.
+        :param color: color of the player
+        :param power_up: power-up
+        """
+        player = self.players.get(color)
+        if player is not None:
+            player.use_powerup(power_up)
+        if power_up.power_up_type == PowerUpTypes.DOUBLE_MOVE:
+            self.double_move = True
+        else:
+            power_up.apply_power_up(self.board)
+
+    def push_move(self, move: chess.Move) -> bool:
+        """
+        Makes a move. After the first move of a double move a null move gives the turn back, unless the move ended
+        the game.
+        :param move: move
+        :return: True if the turn is over, False if the player moves again
+        """
+        self.board.push(move)
+        if not self.double_move:
+            return True
+        self.double_move = False
+        if self.board.is_game_over():
+            return True
+        self.board.push(chess.Move.null())
+        return False
+
+    def give_up_second_move(self, color: ChessColor) -> None:
+        """
+        Gives up the second move of a double move by taking back the null move, the turn is over then. The player
+        gets the power-up back, it was used up without effect.
+        :param color: color of the player
+        """
+        self.board.pop()
+        player = self.players.get(color)
+        if player is not None:
+            player.add_powerup(DoubleMovePowerUp())
+
+    def offer_draw(self, color: ChessColor) -> None:
+        """
+        Offers a draw, only one offer can be open.
+        :param color: color of the offering player
+        """
+        if self.mid_game_persist[MidGamePersistentDataKeys.DRAW_OFFERED] is None:
+            self.mid_game_persist[MidGamePersistentDataKeys.DRAW_OFFERED] = color
+
+    def accept_draw(self) -> None:
+        """
+        Accepts the open draw offer.
+        """
+        if self.mid_game_persist[MidGamePersistentDataKeys.DRAW_OFFERED] is not None:
+            self.mid_game_persist[MidGamePersistentDataKeys.DRAW_ACCEPTED] = True
+
+    def get_outcome_or_none(self, color: ChessColor) -> chess.Outcome | None:
+        """
+        Checks if the game is over after a turn or an accepted draw. A draw offer the player did not accept during
+        their turn is dropped.
+        :param color: color of the player whose turn it is
+        :return: outcome or None if the game goes on
+        """
+        # check if game is over
+        outcome = self.board.outcome()
+        if outcome is not None:
+            return outcome
+
+        # check forfeit
+        if self.mid_game_persist.get(MidGamePersistentDataKeys.FORFEIT):
+            return chess.Outcome(chess.Termination.VARIANT_LOSS, color.value)
+
+        # check old draw offer
+        draw_offered = self.mid_game_persist.get(MidGamePersistentDataKeys.DRAW_OFFERED)
+        draw_accepted = self.mid_game_persist.get(MidGamePersistentDataKeys.DRAW_ACCEPTED)
+        if draw_offered != color and not draw_accepted:
+            self.mid_game_persist[MidGamePersistentDataKeys.DRAW_OFFERED] = None
+        # normal draw between two players
+        elif draw_offered != color and draw_accepted:
+            return chess.Outcome(chess.Termination.VARIANT_DRAW, None)
+        # draw claimed
+        elif not draw_offered and draw_accepted:
+            return chess.Outcome(chess.Termination.VARIANT_DRAW, None)
+        return None
@@ -0,0 +1,85 @@
+"""
+This module plays complete games between agents without a display or an engine, to load-test and fuzz the rules.
+Run it with: python -m src.core.simulator [games] [seed]
+"""
+import random
+import sys
+import time
+from collections import Counter
+
+import chess
+
+from ..core.agents import Agent, RandomAgent, GreedyAgent, get_material_score
+from ..core.game_core import GameCore
+from ..enums import ChessColor
+from ..mid_game.player import Player
+
+MAX_PLIES = 600
+
+
+def play_game(core: GameCore, agents: dict[ChessColor, Agent], power_up_multiplicator: float,
+              max_plies: int = MAX_PLIES) -> tuple[chess.Outcome | None, int]:
+    """
+    Plays a game like the mid game does: at the start of each turn the player to move may get a power-up, then
+    uses one, offers or accepts a draw and makes its moves. The material on the board stands in for the evaluation.
+    :param core: game core, reset for the game
+    :param agents: agents by color
+    :param power_up_multiplicator: chance of a power-up from 1 to 10
+    :param max_plies: plies after which the game is stopped
+    :return: outcome or None if the game was stopped and the number of plies
+    """
+    core.reset({color: Player(f"Agent {color.name}", color) for color in agents}, power_up_multiplicator)
+    plies = 0
+    while plies < max_plies:
+        color = ChessColor(core.board.turn)
+        agent = agents[color]
+        core.add_powerup(color, get_material_score(core.board))
+        power_up = agent.choose_powerup_or_none(core, color)
+        if power_up is not None:
+            core.use_powerup(color, power_up)
+        if agent.accepts_draw(core, color):
+            core.accept_draw()
+        elif agent.offers_draw(core, color):
+            core.offer_draw(color)
+        turn_over = False
+        while not turn_over:
+            moves = core.get_legal_moves()
+            # a power-up can leave a position without moves that is no checkmate or stalemate
+            if not moves:
+                return core.board.outcome(), plies
+            turn_over = core.push_move(agent.choose_move(core, color, moves))
+            plies += 1
+        outcome = core.get_outcome_or_none(color)
+        if outcome is not None:
+            return outcome, plies
+    return None, plies
+
+
+def run_simulation(games: int, seed: int) -> tuple[int, float, Counter]:
+    """
+    Plays games between a random and a greedy agent, both take every color and every power-up chance.
+    :param games: number of games
+    :param seed: seed of the random numbers, the same seed plays the same games
+    :return: plies, seconds and the number of games by termination
+    """
+    random.seed(seed)
+    core = GameCore(chess.Board())
+    agents = [RandomAgent(0.5, 0.01), GreedyAgent()]
+    plies = 0
+    terminations = Counter()
+    start = time.perf_counter()
+    for game in range(games):
+        white = agents[game % 2]
+        black = agents[(game // 2) % 2]
+        outcome, game_plies = play_game(core, {ChessColor.WHITE: white, ChessColor.BLACK: black}, game % 10 + 1)
+        plies += game_plies
+        terminations[outcome.termination.name if outcome is not None else "STOPPED"] += 1
+    return plies, time.perf_counter() - start, terminations
+
+
+if __name__ == "__main__":
+    plies, elapsed, terminations = run_simulation(int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+                                                  int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    print(f'{sum(terminations.values())} games, {plies} plies in {elapsed:.2f}s: {int(plies / elapsed)} plies '
+          f'per second')
+    print(', '.join(f'{termination} {count}' for termination, count in terminations.most_common()))
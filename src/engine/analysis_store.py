@@ -0,0 +1,179 @@
+"""
+This module contains the AnalysisStore class, a sqlite file that keeps engine results across sessions.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+import chess
+import chess.engine
+
+PLAIN_CONTEXT = ""
+
+
+def get_power_up_context(power_up_types: list) -> str:
+    """
+    Gets the context of a position that depends on power-ups, e.g. the power-ups the players hold.
+    :param power_up_types: power-up types of the context
+    :return: context
+    """
+    return ",".join(sorted(power_up_type.name for power_up_type in power_up_types))
+
+
+def _to_signed(key: int) -> int:
+    """
+    Converts an unsigned 64-bit hash to the signed integer sqlite stores.
+    :param key: hash
+    :return: signed hash
+    """
+    return key - 2 ** 64 if key >= 2 ** 63 else key
+
+
+def _to_unsigned(key: int) -> int:
+    """
+    Converts a signed integer from sqlite back to the unsigned 64-bit hash.
+    :param key: signed hash
+    :return: hash
+    """
+    return key + 2 ** 64 if key < 0 else key
+
+
+class AnalysisStore:
+    """
+    This class represents a persistent store of engine results keyed by position hash and power-up context.
+    All sqlite work happens on a background thread: the newest entries are loaded lazily into memory and
+    writes are batched. The size is capped by evicting the least recently used entries.
+    """
+    path: str
+    max_entries: int
+    batch_size: int
+    flush_interval: float
+    writes: queue.SimpleQueue
+    thread: threading.Thread | None
+
+    def __init__(self, path: str, max_entries: int, batch_size: int = 64, flush_interval: float = 2.0) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writes = queue.SimpleQueue()
+        self.thread = None
+
+    def start(self, preload_limit: int,
+              on_entry: Callable[[int, str, chess.engine.PovScore, int, chess.Move | None], None]) -> None:
+        """
+        Starts the background thread, which loads the most recently used entries and then writes batches.
+        :param preload_limit: maximum number of entries to load
+        :param on_entry: called on the background thread with hash, context, score, depth and best move
+        """
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, args=(preload_limit, on_entry), name="analysis-store",
+                                       daemon=True)
+        self.thread.start()
+
+    def put(self, key: int, context: str, score: chess.engine.PovScore, depth: int,
+            best_move: chess.Move | None) -> None:
+        """
+        Queues an engine result for writing. Never blocks.
+        :param key: position hash
+        :param context: power-up context
+        :param score: score
+        :param depth: depth of the search
+        :param best_move: best move or None
+        """
+        white_score = score.white()
+        self.writes.put((False, (_to_signed(key), context, white_score.score(), white_score.mate(), depth,
+                                 best_move.uci() if best_move else None, time.time())))
+
+    def touch(self, key: int, context: str) -> None:
+        """
+        Queues marking an entry as used, so it is evicted later. Never blocks.
+        :param key: position hash
+        :param context: power-up context
+        """
+        self.writes.put((True, (time.time(), _to_signed(key), context)))
+
+    def close(self) -> None:
+        """
+        Writes the remaining batch and stops the background thread.
+        """
+        if self.thread is not None:
+            self.writes.put(None)
+            self.thread.join(5.0)
+            self.thread = None
+
+    def _run(self, preload_limit: int,
+             on_entry: Callable[[int, str, chess.engine.PovScore, int, chess.Move | None], None]) -> None:
+        """
+        Runs the background thread.
+        :param preload_limit: maximum number of entries to load
+        :param on_entry: called with every loaded entry
+        """
+        try:
+            connection = sqlite3.connect(self.path)
+        except sqlite3.Error as e:
+            print(e)
+            return
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS analysis (hash INTEGER, context TEXT, cp INTEGER, "
+                               "mate INTEGER, depth INTEGER, best_move TEXT, last_used REAL, "
+                               "PRIMARY KEY (hash, context))")
+        self._load(connection, preload_limit, on_entry)
+        stopped = False
+        while not stopped:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    row = self.writes.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    stopped = True
+                    break
+                batch.append(row)
+            if batch:
+                self._write(connection, batch)
+        connection.close()
+
+    @staticmethod
+    def _load(connection: sqlite3.Connection, preload_limit: int,
+              on_entry: Callable[[int, str, chess.engine.PovScore, int, chess.Move | None], None]) -> None:
+        """
+        Loads the most recently used entries.
+        :param connection: sqlite connection
+        :param preload_limit: maximum number of entries
+        :param on_entry: called with every entry
+        """
+        rows = connection.execute("SELECT hash, context, cp, mate, depth, best_move FROM (SELECT * FROM analysis "
+                                  "ORDER BY last_used DESC LIMIT ?) ORDER BY last_used ASC", (preload_limit,))
+        for key, context, cp, mate, depth, best_move in rows:
+            score = chess.engine.Mate(mate) if mate is not None else chess.engine.Cp(cp)
+            on_entry(_to_unsigned(key), context, chess.engine.PovScore(score, chess.WHITE), depth,
+                     chess.Move.from_uci(best_move) if best_move else None)
+
+    def _write(self, connection: sqlite3.Connection, batch: list[tuple[bool, tuple]]) -> None:
+        """
+        Writes a batch, keeps deeper results and evicts the least recently used entries above the cap.
+        :param connection: sqlite connection
+        :param batch: rows to write, touches are marked with True
+        """
+        rows = [row for is_touch, row in batch if not is_touch]
+        touches = [row for is_touch, row in batch if is_touch]
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT INTO analysis VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(hash, context) DO UPDATE SET "
+                    "cp = excluded.cp, mate = excluded.mate, depth = excluded.depth, "
+                    "best_move = excluded.best_move, last_used = excluded.last_used "
+                    "WHERE excluded.depth > analysis.depth", rows)
+                connection.executemany("UPDATE analysis SET last_used = ? WHERE hash = ? AND context = ?", touches)
+                count = connection.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+                if count > self.max_entries:
+                    connection.execute("DELETE FROM analysis WHERE rowid IN (SELECT rowid FROM analysis "
+                                       "ORDER BY last_used ASC LIMIT ?)", (count - self.max_entries,))
+        except sqlite3.Error as e:
+            print(e)
@@ -0,0 +1,230 @@
+"""
+This module contains the EnginePool class, a shared pool of warm chess engine processes.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import chess
+import chess.engine
+
+from ..engine.python_engine import PythonEngineProtocol, is_engine_available
+
+
+class EngineWorker:
+    """
+    This class represents one engine process of the pool.
+    """
+    pool: "EnginePool"
+    transport: asyncio.SubprocessTransport | None
+    protocol: chess.engine.UciProtocol | PythonEngineProtocol | None
+
+    def __init__(self, pool: "EnginePool") -> None:
+        self.pool = pool
+        self.transport = None
+        self.protocol = None
+
+    def is_alive(self) -> bool:
+        """
+        Checks if the engine process is running.
+        :return: True if running, False otherwise
+        """
+        return self.protocol is not None and not self.protocol.returncode.done()
+
+    async def start(self) -> None:
+        """
+        Starts the engine process, replacing a crashed one. Without a Stockfish binary for this system the
+        built-in engine is used.
+        """
+        await self.close()
+        if is_engine_available(self.pool.engine_path):
+            self.transport, self.protocol = await chess.engine.popen_uci(self.pool.engine_path)
+        else:
+            self.protocol = PythonEngineProtocol()
+
+    async def close(self) -> None:
+        """
+        Closes the engine process.
+        """
+        if self.protocol is not None:
+            try:
+                await asyncio.wait_for(self.protocol.quit(), 2.0)
+            except (chess.engine.EngineError, chess.engine.EngineTerminatedError, asyncio.TimeoutError):
+                if self.transport is not None:
+                    self.transport.close()
+            self.transport = None
+            self.protocol = None
+
+    async def play(self, board: chess.Board, limit: chess.engine.Limit, **kwargs) -> chess.engine.PlayResult:
+        """
+        Lets the engine play a move.
+        :param board: board
+        :param limit: search limit
+        :return: play result
+        """
+        return await self._call(lambda: self.protocol.play(board, limit, game=self.pool.game, **kwargs))
+
+    async def analyse(self, board: chess.Board, limit: chess.engine.Limit, **kwargs) -> chess.engine.InfoDict:
+        """
+        Lets the engine analyse a position.
+        :param board: board
+        :param limit: search limit
+        :return: info
+        """
+        return await self._call(lambda: self.protocol.analyse(board, limit, game=self.pool.game, **kwargs))
+
+    async def analysis(self, board: chess.Board, limit: chess.engine.Limit | None = None,
+                       **kwargs) -> chess.engine.AnalysisResult:
+        """
+        Starts an analysis of a position that can be stopped with UCI stop.
+        :param board: board
+        :param limit: search limit, None for infinite
+        :return: running analysis
+        """
+        return await self._call(lambda: self.protocol.analysis(board, limit, game=self.pool.game, **kwargs))
+
+    async def stop(self) -> None:
+        """
+        Stops a search that is still running after its command returned, e.g. pondering.
+        """
+        if self.is_alive():
+            await self.protocol.ping()
+
+    async def _call(self, command: callable):
+        """
+        Runs an engine command and restarts the engine once if it crashed.
+        :param command: engine command
+        :return: result of the command
+        """
+        try:
+            return await command()
+        except chess.engine.EngineTerminatedError:
+            await self.start()
+            return await command()
+
+
+class EnginePool:
+    """
+    This class represents a fixed size pool of engine processes shared by all callers.
+    The processes are started lazily and reused across games. The pool lives on the event loop of the engine
+    service and must only be used from there.
+    """
+    engine_path: str
+    size: int
+    game: object
+    workers: list[EngineWorker]
+    idle_workers: list[EngineWorker]
+    condition: asyncio.Condition
+    closed: bool
+
+    def __init__(self, engine_path: str, size: int) -> None:
+        self.engine_path = engine_path
+        self.size = max(1, size)
+        self.game = object()
+        self.workers = []
+        self.idle_workers = []
+        self.condition = asyncio.Condition()
+        self.closed = False
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[EngineWorker]:
+        """
+        Leases an engine for the duration of the with block. Waits while all engines are busy.
+        :return: leased engine
+        """
+        worker = await self.reserve()
+        try:
+            yield worker
+        finally:
+            await self.give_back(worker)
+
+    async def reserve(self) -> EngineWorker:
+        """
+        Reserves an engine until it is given back, e.g. to keep it pondering between moves.
+        :return: reserved engine
+        """
+        worker = await self._acquire()
+        try:
+            if not worker.is_alive():
+                await worker.start()
+        except BaseException:
+            await self._release(worker)
+            raise
+        return worker
+
+    async def give_back(self, worker: EngineWorker) -> None:
+        """
+        Gives a reserved engine back to the pool.
+        :param worker: engine worker
+        """
+        await self._release(worker)
+
+    async def start(self) -> None:
+        """
+        Starts all engine processes ahead of their first command, e.g. while the player is in the menu. Engines that
+        are busy or already running are left alone.
+        """
+        async with self.condition:
+            if self.closed:
+                raise chess.engine.EngineError("engine pool is closed")
+            while len(self.workers) < self.size:
+                worker = EngineWorker(self)
+                self.workers.append(worker)
+                self.idle_workers.append(worker)
+            # taken out of the pool, so nobody uses them while they start
+            workers = [worker for worker in self.idle_workers if not worker.is_alive()]
+            for worker in workers:
+                self.idle_workers.remove(worker)
+        try:
+            await asyncio.gather(*(worker.start() for worker in workers))
+        finally:
+            for worker in workers:
+                await self._release(worker)
+
+    def new_game(self) -> None:
+        """
+        Starts a new game. Every engine receives ucinewgame before its next command.
+        """
+        self.game = object()
+
+    async def close(self) -> None:
+        """
+        Closes all engine processes.
+        """
+        async with self.condition:
+            self.closed = True
+            workers = list(self.workers)
+            self.workers.clear()
+            self.idle_workers.clear()
+            self.condition.notify_all()
+        for worker in workers:
+            await worker.close()
+
+    async def _acquire(self) -> EngineWorker:
+        """
+        Acquires an idle engine or creates one if the pool is not full yet.
+        :return: engine worker
+        """
+        async with self.condition:
+            while True:
+                if self.closed:
+                    raise chess.engine.EngineError("engine pool is closed")
+                if self.idle_workers:
+                    return self.idle_workers.pop()
+                if len(self.workers) < self.size:
+                    worker = EngineWorker(self)
+                    self.workers.append(worker)
+                    return worker
+                await self.condition.wait()
+
+    async def _release(self, worker: EngineWorker) -> None:
+        """
+        Gives an engine back to the pool.
+        :param worker: engine worker
+        """
+        async with self.condition:
+            if self.closed:
+                await worker.close()
+                return
+            self.idle_workers.append(worker)
+            self.condition.notify()
@@ -0,0 +1,565 @@
+"""
+This module contains the EngineService class, which runs all engine calls on one background event loop.
+"""
+import asyncio
+import concurrent.futures
+import queue
+import threading
+import time
+from typing import Awaitable, Callable
+
+import chess
+import chess.engine
+
+from ..config.globals import ENGINE_PATH, ENGINE_POOL_SIZE
+from ..engine.engine_pool import EnginePool, EngineWorker
+
+
+class EngineRequest:
+    """
+    This class represents a pending engine request. Its callback is called on the main thread, if the request fails
+    its error callback is called instead.
+    """
+    callback: Callable[[object], None]
+    error_callback: Callable[[Exception], None] | None
+    future: concurrent.futures.Future | None
+    cancelled: bool
+
+    def __init__(self, callback: Callable[[object], None],
+                 error_callback: Callable[[Exception], None] | None = None) -> None:
+        self.callback = callback
+        self.error_callback = error_callback
+        self.future = None
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """
+        Cancels the request. Its callback will not be called anymore.
+        """
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def is_done(self) -> bool:
+        """
+        Checks if the request is finished or cancelled.
+        :return: True if done, False otherwise
+        """
+        return self.cancelled or (self.future is not None and self.future.done())
+
+
+class LatestWinsStats:
+    """
+    This class counts the requests of a latest-wins channel that never reached their callback.
+    """
+    requests: int
+    dropped: int
+    cancelled: int
+    saved_time: float
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.dropped = 0
+        self.cancelled = 0
+        self.saved_time = 0.0
+
+    def __str__(self):
+        return f'{self.requests} requests, {self.dropped} dropped, {self.cancelled} cancelled, ' \
+               f'{self.saved_time:.2f}s engine time saved'
+
+
+class LatestWinsChannel:
+    """
+    This class represents a channel of analysis requests of which only the newest one is analysed.
+    A request that did not start yet is dropped, a running one is stopped with UCI stop.
+    """
+    pending: tuple | None  # board, limit, request, stream, stop condition
+    running_request: EngineRequest | None
+    running_analysis: chess.engine.AnalysisResult | None
+    running_limit_time: float | None
+    running_since: float
+    running_stopped: bool
+    task: asyncio.Task | None
+    stats: LatestWinsStats
+
+    def __init__(self) -> None:
+        self.pending = None
+        self.running_request = None
+        self.running_analysis = None
+        self.running_limit_time = None
+        self.running_since = 0.0
+        self.running_stopped = False
+        self.task = None
+        self.stats = LatestWinsStats()
+
+
+class EngineService:
+    """
+    This class represents the engine service. Engine commands run on a background asyncio event loop, results
+    are queued and handed to their callbacks by process_results, which the game loop calls once per frame.
+    """
+    pool: EnginePool
+    loop: asyncio.AbstractEventLoop
+    thread: threading.Thread
+    results: queue.SimpleQueue
+    channels: dict[str, LatestWinsChannel]
+    reserved_workers: dict[object, EngineWorker]
+    wakeup: Callable[[], None] | None
+
+    def __init__(self, engine_path: str, pool_size: int) -> None:
+        self.results = queue.SimpleQueue()
+        self.wakeup = None
+        self.channels = {}
+        self.reserved_workers = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name="engine-service", daemon=True)
+        self.thread.start()
+        self.pool = self._run_sync(self._create_pool(engine_path, pool_size))
+
+    def play(self, board: chess.Board, limit: chess.engine.Limit, callback: Callable[[chess.engine.PlayResult], None],
+             error_callback: Callable[[Exception], None] | None = None, **kwargs) -> EngineRequest:
+        """
+        Lets an engine of the pool play a move.
+        :param board: board, copied before the call returns
+        :param limit: search limit
+        :param callback: called with the play result on the main thread
+        :param error_callback: called with the error on the main thread if the engine failed
+        :return: request
+        """
+        board = board.copy()
+        return self.submit(lambda engine: engine.play(board, limit, **kwargs), callback, error_callback)
+
+    def analyse(self, board: chess.Board, limit: chess.engine.Limit, callback: Callable[[chess.engine.InfoDict], None],
+                error_callback: Callable[[Exception], None] | None = None, **kwargs) -> EngineRequest:
+        """
+        Lets an engine of the pool analyse a position.
+        :param board: board, copied before the call returns
+        :param limit: search limit
+        :param callback: called with the info on the main thread
+        :param error_callback: called with the error on the main thread if the engine failed
+        :return: request
+        """
+        board = board.copy()
+        return self.submit(lambda engine: engine.analyse(board, limit, **kwargs), callback, error_callback)
+
+    def analyse_batch(self, boards: list[chess.Board], limit: chess.engine.Limit,
+                      callback: Callable[[list[chess.engine.InfoDict | None]], None], **kwargs) -> EngineRequest:
+        """
+        Lets the engines of the pool analyse several positions as one request, as many at once as engines are free.
+        :param boards: boards, copied before the call returns
+        :param limit: search limit of every position
+        :param callback: called on the main thread with the infos in the order of the boards, None if one failed
+        :return: request
+        """
+        boards = [board.copy() for board in boards]
+        request = EngineRequest(callback)
+        request.future = asyncio.run_coroutine_threadsafe(self._run_batch(boards, limit, request, **kwargs),
+                                                          self.loop)
+        return request
+
+    def play_pondering(self, owner: object, board: chess.Board, limit: chess.engine.Limit,
+                       callback: Callable[[chess.engine.PlayResult], None],
+                       error_callback: Callable[[Exception], None] | None = None, **kwargs) -> EngineRequest:
+        """
+        Lets the engine reserved for the owner play a move and ponder on the expected reply afterwards.
+        If the next board of the owner is the pondered one, the engine answers with ponderhit.
+        A pool of one engine can not spare it for the owner, a leased engine plays without pondering then.
+        :param owner: owner of the reserved engine
+        :param board: board, copied before the call returns
+        :param limit: search limit
+        :param callback: called with the play result on the main thread
+        :param error_callback: called with the error on the main thread if the engine failed
+        :return: request
+        """
+        if not self.can_ponder():
+            return self.play(board, limit, callback, error_callback, **kwargs)
+        board = board.copy()
+        request = EngineRequest(callback, error_callback)
+        request.future = asyncio.run_coroutine_threadsafe(
+            self._run_reserved(owner, lambda engine: engine.play(board, limit, ponder=True, **kwargs), request),
+            self.loop)
+        return request
+
+    def can_ponder(self) -> bool:
+        """
+        Checks if the pool can reserve an engine for pondering and still lease one to the other callers.
+        :return: True if an engine can be reserved, False otherwise
+        """
+        return self.pool.size > 1
+
+    def stop_pondering(self, owner: object) -> None:
+        """
+        Stops the pondering of the engine reserved for the owner.
+        :param owner: owner of the reserved engine
+        """
+        asyncio.run_coroutine_threadsafe(self._stop_reserved(owner, False), self.loop)
+
+    def release_engine(self, owner: object) -> None:
+        """
+        Stops the engine reserved for the owner and gives it back to the pool.
+        :param owner: owner of the reserved engine
+        """
+        asyncio.run_coroutine_threadsafe(self._stop_reserved(owner, True), self.loop)
+
+    def analyse_latest(self, channel_name: str, board: chess.Board, limit: chess.engine.Limit,
+                       callback: Callable[[chess.engine.InfoDict], None], stream: bool = False,
+                       stop_condition: Callable[[chess.engine.InfoDict], bool] | None = None) -> EngineRequest:
+        """
+        Lets an engine analyse a position on a latest-wins channel. Older requests of the same channel are dropped
+        or stopped and never reach their callback.
+        :param channel_name: name of the channel
+        :param board: board, copied before the call returns
+        :param limit: search limit, must have a time limit
+        :param callback: called with the info on the main thread
+        :param stream: if True the callback is called with every info that has a score instead of the final info
+        :param stop_condition: called on the event loop with every info, the analysis stops once it returns True
+        :return: request
+        """
+        request = EngineRequest(callback)
+        if channel_name not in self.channels:
+            self.channels[channel_name] = LatestWinsChannel()
+        channel = self.channels[channel_name]
+        self.loop.call_soon_threadsafe(self._enqueue_latest, channel, board.copy(), limit, request, stream,
+                                       stop_condition)
+        return request
+
+    def cancel_latest(self, channel_name: str) -> None:
+        """
+        Drops the pending request of a latest-wins channel and stops the running one.
+        :param channel_name: name of the channel
+        """
+        if channel_name in self.channels:
+            self.loop.call_soon_threadsafe(self._cancel_channel, self.channels[channel_name])
+
+    def get_channel_stats(self, channel_name: str) -> LatestWinsStats:
+        """
+        Gets the statistics of a latest-wins channel.
+        :param channel_name: name of the channel
+        :return: statistics
+        """
+        if channel_name not in self.channels:
+            self.channels[channel_name] = LatestWinsChannel()
+        return self.channels[channel_name].stats
+
+    def submit(self, command: Callable[[EngineWorker], Awaitable[object]], callback: Callable[[object], None],
+               error_callback: Callable[[Exception], None] | None = None) -> EngineRequest:
+        """
+        Runs a command with a leased engine on the event loop.
+        :param command: creates the awaitable from the leased engine
+        :param callback: called with the result on the main thread
+        :param error_callback: called with the error on the main thread if the engine failed
+        :return: request
+        """
+        request = EngineRequest(callback, error_callback)
+        request.future = asyncio.run_coroutine_threadsafe(self._run_command(command, request), self.loop)
+        return request
+
+    def run_in_background(self, function: Callable[[], object], callback: Callable[[object], None],
+                          error_callback: Callable[[Exception], None] | None = None) -> EngineRequest:
+        """
+        Runs a function that needs no engine on a worker thread, e.g. a search of the built-in engine.
+        :param function: function
+        :param callback: called with the result on the main thread
+        :param error_callback: called with the error on the main thread if the function raised
+        :return: request
+        """
+        request = EngineRequest(callback, error_callback)
+        request.future = asyncio.run_coroutine_threadsafe(self._run_function(function, request), self.loop)
+        return request
+
+    def start_engines(self) -> None:
+        """
+        Starts all engines of the pool and waits until they are ready, so the first move does not pay for the start.
+        """
+        try:
+            self._run_sync(self.pool.start())
+        except (chess.engine.EngineError, chess.engine.EngineTerminatedError, OSError) as e:
+            print(e)
+
+    def new_game(self) -> None:
+        """
+        Starts a new game on all engines.
+        """
+        self.pool.new_game()
+
+    def set_wakeup(self, wakeup: Callable[[], None] | None) -> None:
+        """
+        Sets the function that is called on the background thread whenever a result is queued, so a sleeping game
+        loop can wake up.
+        :param wakeup: wakeup function or None
+        """
+        self.wakeup = wakeup
+
+    def has_results(self) -> bool:
+        """
+        Checks if results are waiting for process_results.
+        :return: True if results are queued, False otherwise
+        """
+        return not self.results.empty()
+
+    def process_results(self) -> None:
+        """
+        Hands all finished results to their callbacks and all errors to their error callbacks. Never blocks.
+        """
+        while True:
+            try:
+                request, result, error = self.results.get_nowait()
+            except queue.Empty:
+                return
+            if request.cancelled:
+                continue
+            if error is None:
+                request.callback(result)
+            elif request.error_callback is not None:
+                request.error_callback(error)
+
+    def close(self) -> None:
+        """
+        Closes all engines and stops the event loop.
+        """
+        try:
+            self._run_sync(self.pool.close(), 5.0)
+        except (concurrent.futures.TimeoutError, chess.engine.EngineError):
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(1.0)
+
+    def _put_result(self, request: EngineRequest, result: object, error: Exception | None = None) -> None:
+        """
+        Queues a result or an error for process_results and wakes the game loop up.
+        :param request: request
+        :param result: result
+        :param error: error if the request failed
+        """
+        self.results.put((request, result, error))
+        if self.wakeup is not None:
+            self.wakeup()
+
+    async def _run_command(self, command: Callable[[EngineWorker], Awaitable[object]],
+                           request: EngineRequest) -> None:
+        """
+        Leases an engine, runs the command and queues the result.
+        :param command: command
+        :param request: request
+        """
+        try:
+            async with self.pool.lease() as engine:
+                result = await command(engine)
+        except Exception as e:
+            print(e)
+            self._put_result(request, None, e)
+            return
+        self._put_result(request, result)
+
+    async def _run_batch(self, boards: list[chess.Board], limit: chess.engine.Limit, request: EngineRequest,
+                         **kwargs) -> None:
+        """
+        Analyses all boards with leased engines and queues the infos.
+        :param boards: boards
+        :param limit: search limit
+        :param request: request
+        """
+
+        async def analyse(board: chess.Board) -> chess.engine.InfoDict | None:
+            if request.cancelled:
+                return None
+            try:
+                async with self.pool.lease() as engine:
+                    return await engine.analyse(board, limit, **kwargs)
+            except Exception as e:
+                print(e)
+                return None
+
+        infos = await asyncio.gather(*(analyse(board) for board in boards))
+        self._put_result(request, list(infos))
+
+    async def _run_function(self, function: Callable[[], object], request: EngineRequest) -> None:
+        """
+        Runs a function on a worker thread and queues the result.
+        :param function: function
+        :param request: request
+        """
+        try:
+            result = await self.loop.run_in_executor(None, function)
+        except Exception as e:
+            print(e)
+            self._put_result(request, None, e)
+            return
+        self._put_result(request, result)
+
+    async def _run_reserved(self, owner: object, command: Callable[[EngineWorker], Awaitable[object]],
+                            request: EngineRequest) -> None:
+        """
+        Runs a command with the engine reserved for the owner and queues the result.
+        :param owner: owner of the reserved engine
+        :param command: command
+        :param request: request
+        """
+        try:
+            if owner not in self.reserved_workers:
+                self.reserved_workers[owner] = await self.pool.reserve()
+            engine = self.reserved_workers[owner]
+            if not engine.is_alive():
+                await engine.start()
+            result = await command(engine)
+        except Exception as e:
+            print(e)
+            self._put_result(request, None, e)
+            return
+        self._put_result(request, result)
+
+    async def _stop_reserved(self, owner: object, give_back: bool) -> None:
+        """
+        Stops the engine reserved for the owner.
+        :param owner: owner of the reserved engine
+        :param give_back: if True the engine is given back to the pool
+        """
+        if owner not in self.reserved_workers:
+            return
+        engine = self.reserved_workers.pop(owner) if give_back else self.reserved_workers[owner]
+        try:
+            await engine.stop()
+        except (chess.engine.EngineError, chess.engine.EngineTerminatedError):
+            pass
+        if give_back:
+            await self.pool.give_back(engine)
+
+    def _enqueue_latest(self, channel: LatestWinsChannel, board: chess.Board, limit: chess.engine.Limit,
+                        request: EngineRequest, stream: bool,
+                        stop_condition: Callable[[chess.engine.InfoDict], bool] | None) -> None:
+        """
+        Replaces the pending request of the channel and stops the running one. Runs on the event loop.
+        :param channel: channel
+        :param board: board
+        :param limit: search limit
+        :param request: request
+        :param stream: stream every info with a score
+        :param stop_condition: stops the analysis once it returns True
+        """
+        channel.stats.requests += 1
+        self._cancel_channel(channel)
+        channel.pending = (board, limit, request, stream, stop_condition)
+        if channel.task is None or channel.task.done():
+            channel.task = self.loop.create_task(self._run_channel(channel))
+
+    def _cancel_channel(self, channel: LatestWinsChannel) -> None:
+        """
+        Drops the pending request of the channel and stops the running one. Runs on the event loop.
+        :param channel: channel
+        """
+        if channel.pending is not None:
+            channel.pending[2].cancelled = True
+            channel.stats.dropped += 1
+            channel.stats.saved_time += channel.pending[1].time or 0.0
+            channel.pending = None
+        if channel.running_request is not None and not channel.running_stopped:
+            channel.running_request.cancelled = True
+            channel.running_stopped = True
+            if channel.running_analysis is not None:
+                channel.running_analysis.stop()
+            channel.stats.cancelled += 1
+            elapsed = time.perf_counter() - channel.running_since
+            channel.stats.saved_time += max(0.0, (channel.running_limit_time or 0.0) - elapsed)
+
+    async def _run_channel(self, channel: LatestWinsChannel) -> None:
+        """
+        Analyses the pending requests of a channel one after another.
+        :param channel: channel
+        """
+        while channel.pending is not None:
+            board, limit, request, stream, stop_condition = channel.pending
+            channel.pending = None
+            if request.cancelled:
+                continue
+            try:
+                async with self.pool.lease() as engine:
+                    if request.cancelled:
+                        continue
+                    channel.running_request = request
+                    channel.running_stopped = False
+                    channel.running_limit_time = limit.time
+                    channel.running_since = time.perf_counter()
+                    channel.running_analysis = await engine.analysis(board, limit)
+                    if request.cancelled:
+                        channel.running_analysis.stop()
+                    async for info in channel.running_analysis:
+                        if request.cancelled or "score" not in info:
+                            continue
+                        if stream:
+                            self._put_result(request, info)
+                        if stop_condition is not None and stop_condition(info):
+                            channel.running_analysis.stop()
+                    await channel.running_analysis.wait()
+                    info = channel.running_analysis.info
+            except Exception as e:
+                print(e)
+                if not request.cancelled:
+                    self._put_result(request, None, e)
+                continue
+            finally:
+                channel.running_request = None
+                channel.running_analysis = None
+            if not request.cancelled and not stream:
+                self._put_result(request, info)
+
+    @staticmethod
+    async def _create_pool(engine_path: str, pool_size: int) -> EnginePool:
+        """
+        Creates the pool on the event loop.
+        :param engine_path: engine path
+        :param pool_size: pool size
+        :return: pool
+        """
+        return EnginePool(engine_path, pool_size)
+
+    def _run_sync(self, coroutine: Awaitable, timeout: float | None = None) -> object:
+        """
+        Runs a coroutine on the event loop and waits for it.
+        :param coroutine: coroutine
+        :param timeout: timeout in seconds
+        :return: result of the coroutine
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def _run_loop(self) -> None:
+        """
+        Runs the event loop of the background thread.
+        """
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+
+_engine_service: EngineService | None = None
+_engine_service_lock = threading.Lock()
+
+
+def get_engine_service() -> EngineService:
+    """
+    Gets the engine service shared by the whole game.
+    :return: engine service
+    """
+    global _engine_service
+    with _engine_service_lock:
+        if _engine_service is None:
+            _engine_service = EngineService(ENGINE_PATH, ENGINE_POOL_SIZE)
+        return _engine_service
+
+
+def get_engine_service_or_none() -> EngineService | None:
+    """
+    Gets the engine service if it was started.
+    :return: engine service or None
+    """
+    with _engine_service_lock:
+        return _engine_service
+
+
+def close_engine_service() -> None:
+    """
+    Closes the engine service if it was started.
+    """
+    global _engine_service
+    with _engine_service_lock:
+        if _engine_service is not None:
+            _engine_service.close()
+            _engine_service = None
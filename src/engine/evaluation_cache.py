@@ -0,0 +1,183 @@
+"""
+This module contains the EvaluationCache class, an in-memory cache of engine results keyed by the zobrist hash.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import chess
+import chess.engine
+import chess.polyglot
+
+from ..config.globals import EVALUATION_CACHE_MEMORY, ANALYSIS_STORE_PATH, ANALYSIS_STORE_MAX_ENTRIES
+from ..engine.analysis_store import AnalysisStore, PLAIN_CONTEXT
+
+
+class CacheEntry:
+    """
+    This class represents the cached engine result of one position.
+    """
+    score: chess.engine.PovScore
+    depth: int
+    best_move: chess.Move | None
+
+    def __init__(self, score: chess.engine.PovScore, depth: int, best_move: chess.Move | None) -> None:
+        self.score = score
+        self.depth = depth
+        self.best_move = best_move
+
+    def __repr__(self):
+        return f'CacheEntry {self.score} at depth {self.depth} best move {self.best_move}'
+
+
+# rough size of one entry including its key and the slot in the ordered dict
+ENTRY_SIZE = sys.getsizeof(CacheEntry(chess.engine.PovScore(chess.engine.Cp(0), chess.WHITE), 0, None)) + \
+             sys.getsizeof(chess.engine.PovScore(chess.engine.Cp(0), chess.WHITE)) + \
+             sys.getsizeof(chess.Move.from_uci("e2e4")) + sys.getsizeof(2 ** 63) + 100
+
+
+class EvaluationCache:
+    """
+    This class represents a LRU cache of engine results within a memory budget, keyed by zobrist hash and
+    power-up context. An entry is only overwritten by a deeper search. With a store attached the results are
+    kept across sessions.
+    """
+    max_entries: int
+    entries: OrderedDict[tuple[int, str], CacheEntry]
+    hits: int
+    misses: int
+    lock: threading.Lock
+    store: AnalysisStore | None
+
+    def __init__(self, memory_budget: int) -> None:
+        """
+        Initialize the EvaluationCache.
+        :param memory_budget: The memory budget in bytes.
+        """
+        self.max_entries = max(1, memory_budget // ENTRY_SIZE)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.store = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def attach_store(self, store: AnalysisStore) -> None:
+        """
+        Attaches a persistent store. Its entries are loaded in the background, new results are written to it.
+        :param store: store
+        """
+        self.store = store
+        store.start(self.max_entries, self._load_entry)
+
+    def get(self, board: chess.Board, min_depth: int = 0, context: str = PLAIN_CONTEXT) -> CacheEntry | None:
+        """
+        Gets the cached result of a position.
+        :param board: board
+        :param min_depth: minimum depth the cached search must have
+        :param context: power-up context of the position
+        :return: cached result or None
+        """
+        key = (chess.polyglot.zobrist_hash(board), context)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.depth < min_depth:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        if self.store is not None:
+            self.store.touch(*key)
+        return entry
+
+    def put(self, board: chess.Board, score: chess.engine.PovScore, depth: int, best_move: chess.Move | None,
+            context: str = PLAIN_CONTEXT) -> None:
+        """
+        Stores the result of a search, unless a deeper one is cached already.
+        :param board: board
+        :param score: score
+        :param depth: depth of the search
+        :param best_move: best move or None
+        :param context: power-up context of the position
+        """
+        key = chess.polyglot.zobrist_hash(board)
+        if self._put_key(key, context, score, depth, best_move) and self.store is not None:
+            self.store.put(key, context, score, depth, best_move)
+
+    def put_info(self, board: chess.Board, info: chess.engine.InfoDict, context: str = PLAIN_CONTEXT) -> None:
+        """
+        Stores the result of a search from an engine info.
+        :param board: board
+        :param info: info of the engine
+        :param context: power-up context of the position
+        """
+        if "score" not in info or "depth" not in info or "lowerbound" in info or "upperbound" in info:
+            return
+        pv = info.get("pv")
+        self.put(board, info["score"], info["depth"], pv[0] if pv else None, context)
+
+    def _put_key(self, key: int, context: str, score: chess.engine.PovScore, depth: int,
+                 best_move: chess.Move | None) -> bool:
+        """
+        Stores a result by its hash, unless a deeper one is cached already.
+        :param key: zobrist hash
+        :param context: power-up context
+        :param score: score
+        :param depth: depth of the search
+        :param best_move: best move or None
+        :return: True if stored, False otherwise
+        """
+        with self.lock:
+            entry = self.entries.get((key, context))
+            if entry is not None and entry.depth >= depth:
+                return False
+            self.entries[(key, context)] = CacheEntry(score, depth, best_move)
+            self.entries.move_to_end((key, context))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return True
+
+    def _load_entry(self, key: int, context: str, score: chess.engine.PovScore, depth: int,
+                    best_move: chess.Move | None) -> None:
+        """
+        Adds an entry loaded from the store without writing it back.
+        :param key: zobrist hash
+        :param context: power-up context
+        :param score: score
+        :param depth: depth of the search
+        :param best_move: best move or None
+        """
+        self._put_key(key, context, score, depth, best_move)
+
+    def get_stats(self) -> str:
+        """
+        Gets the hit and miss counters.
+        :return: statistics
+        """
+        return f'{len(self.entries)} entries, {self.hits} hits, {self.misses} misses'
+
+
+_evaluation_cache: EvaluationCache | None = None
+
+
+def get_evaluation_cache() -> EvaluationCache:
+    """
+    Gets the evaluation cache shared by the whole game.
+    :return: evaluation cache
+    """
+    global _evaluation_cache
+    if _evaluation_cache is None:
+        _evaluation_cache = EvaluationCache(EVALUATION_CACHE_MEMORY)
+        if ANALYSIS_STORE_PATH is not None:
+            _evaluation_cache.attach_store(AnalysisStore(ANALYSIS_STORE_PATH, ANALYSIS_STORE_MAX_ENTRIES))
+    return _evaluation_cache
+
+
+def close_evaluation_cache() -> None:
+    """
+    Writes the pending results of the evaluation cache to its store.
+    """
+    if _evaluation_cache is not None and _evaluation_cache.store is not None:
+        _evaluation_cache.store.close()
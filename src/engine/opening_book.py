@@ -0,0 +1,103 @@
+"""
+This module contains the OpeningBook class, a fast path for AI moves from a Polyglot opening book.
+"""
+import os
+
+import chess
+import chess.polyglot
+
+from ..config.globals import OPENING_BOOK_PATH, OPENING_BOOK_MAX_PLIES
+
+
+def is_standard_position(board: chess.Board) -> bool:
+    """
+    Checks if the position was reached from the standard start position by normal moves only, i.e. no power-up
+    removed or changed a piece and no double move was played.
+    :param board: board
+    :return: True if standard, False otherwise
+    """
+    replayed = board.root()
+    if replayed != chess.Board():
+        return False
+    for move in board.move_stack:
+        if not move or not replayed.is_legal(move):
+            return False
+        replayed.push(move)
+    return replayed == board
+
+
+class OpeningBook:
+    """
+    This class represents a Polyglot opening book. The file is memory-mapped on first use, a missing book
+    disables the fast path.
+    """
+    path: str
+    max_plies: int
+    reader: chess.polyglot.MemoryMappedReader | None
+    opened: bool
+
+    def __init__(self, path: str, max_plies: int) -> None:
+        self.path = path
+        self.max_plies = max_plies
+        self.reader = None
+        self.opened = False
+
+    def get_move(self, board: chess.Board) -> chess.Move | None:
+        """
+        Gets a weighted random book move for a standard position within the book depth.
+        :param board: board
+        :return: book move or None
+        """
+        if len(board.move_stack) >= self.max_plies:
+            return None
+        reader = self._get_reader()
+        if reader is None or not is_standard_position(board):
+            return None
+        try:
+            return reader.weighted_choice(board).move
+        except IndexError:
+            return None
+
+    def close(self) -> None:
+        """
+        Closes the book file.
+        """
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def _get_reader(self) -> chess.polyglot.MemoryMappedReader | None:
+        """
+        Opens the book file on first use.
+        :return: reader or None if there is no book
+        """
+        if not self.opened:
+            self.opened = True
+            if self.path is not None and os.path.isfile(self.path):
+                try:
+                    self.reader = chess.polyglot.open_reader(self.path)
+                except (OSError, ValueError) as e:
+                    print(e)
+        return self.reader
+
+
+_opening_book: OpeningBook | None = None
+
+
+def get_opening_book() -> OpeningBook:
+    """
+    Gets the opening book shared by the whole game.
+    :return: opening book
+    """
+    global _opening_book
+    if _opening_book is None:
+        _opening_book = OpeningBook(OPENING_BOOK_PATH, OPENING_BOOK_MAX_PLIES)
+    return _opening_book
+
+
+def close_opening_book() -> None:
+    """
+    Closes the file of the opening book.
+    """
+    if _opening_book is not None:
+        _opening_book.close()
@@ -0,0 +1,241 @@
+"""
+This module contains the PowerUpSearch class, which searches moves with the power-ups of both players in mind.
+"""
+import random
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import chess
+import chess.polyglot
+
+from ..engine.python_engine import Searcher, SearchStopped, MATE_SCORE
+from ..enums import PowerUpTypes
+
+PROMOTION_PIECE_TYPES = [chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT]
+
+
+def get_power_up_outcomes(board: chess.Board, power_up_type: PowerUpTypes,
+                          color: chess.Color) -> list[tuple[float, chess.Board]]:
+    """
+    Gets the positions a power-up can lead to with their probabilities. Destroy removes a random piece of the
+    opponent except the king, random promotion turns a random own pawn into a random piece. The other power-ups do
+    not change the position when they are activated.
+    :param board: board
+    :param power_up_type: power-up type
+    :param color: color of the player that activates the power-up
+    :return: probabilities and positions
+    """
+    if power_up_type == PowerUpTypes.DESTROY:
+        squares = [square for square, piece in board.piece_map().items()
+                   if piece.color != color and piece.piece_type != chess.KING]
+        outcomes = []
+        for square in squares:
+            outcome = board.copy(stack=False)
+            outcome.remove_piece_at(square)
+            outcomes.append((1 / len(squares), outcome))
+        return outcomes
+    if power_up_type == PowerUpTypes.RANDOM_PROMOTION:
+        squares = list(board.pieces(chess.PAWN, color))
+        outcomes = []
+        for square in squares:
+            for piece_type in PROMOTION_PIECE_TYPES:
+                outcome = board.copy(stack=False)
+                outcome.set_piece_at(square, chess.Piece(piece_type, color))
+                outcomes.append((1 / (len(squares) * len(PROMOTION_PIECE_TYPES)), outcome))
+        return outcomes
+    return [(1.0, board.copy(stack=False))]
+
+
+class PowerUpSearch:
+    """
+    This class represents a search layer on top of the engine that treats power-ups as extra moves.
+    A double move is a ply after which the same side moves again, like after a null move. Destroy and random
+    promotion are chance nodes of an expectimax search, large ones are sampled. Positions are evaluated by a
+    quiescence search whose results are cached, so the search fits into a fraction of the AI's move time.
+    """
+    searcher: Searcher
+    samples: int
+    candidates: int
+    margin: int
+    max_evaluations: int
+    evaluations: OrderedDict[int, int]
+    deadline: float | None
+
+    def __init__(self, samples: int, candidates: int, margin: int, max_evaluations: int = 100000) -> None:
+        """
+        Initialize the PowerUpSearch.
+        :param samples: Maximum number of outcomes evaluated per chance node.
+        :param candidates: Number of own moves compared with the move of the engine.
+        :param margin: Centipawns another move must be better than the move of the engine.
+        :param max_evaluations: Size of the cache of evaluations.
+        """
+        self.searcher = Searcher()
+        self.samples = samples
+        self.candidates = candidates
+        self.margin = margin
+        self.max_evaluations = max_evaluations
+        self.evaluations = OrderedDict()
+        self.deadline = None
+
+    def choose_move(self, board: chess.Board, engine_move: chess.Move,
+                    opponent_power_up_types: list[PowerUpTypes], time_limit: float) -> chess.Move:
+        """
+        Compares the move of the engine with the best other moves, assuming the opponent answers with the power-up
+        that hurts most. Keeps the move of the engine if time runs out. Runs on a worker thread.
+        :param board: board, the AI is to move
+        :param engine_move: move of the engine
+        :param opponent_power_up_types: power-ups the opponent holds
+        :param time_limit: time in seconds
+        :return: chosen move
+        """
+        self.deadline = time.perf_counter() + time_limit
+        board = board.copy()
+        try:
+            moves = self._get_candidate_moves(board, engine_move)
+            best_move = engine_move
+            best_value = self._evaluate_move(board, engine_move, opponent_power_up_types) + self.margin
+            for move in moves:
+                if move == engine_move:
+                    continue
+                value = self._evaluate_move(board, move, opponent_power_up_types)
+                if value > best_value:
+                    best_move = move
+                    best_value = value
+        except SearchStopped:
+            return engine_move
+        return best_move
+
+    def get_double_move_boards(self, board: chess.Board, count: int, time_limit: float) -> list[chess.Board]:
+        """
+        Gets the positions after the best first moves of a double move by a quick evaluation, followed by a null
+        move, so the side to move moves again. First moves that give check are left out.
+        :param board: board
+        :param count: maximum number of positions
+        :param time_limit: time in seconds
+        :return: positions
+        """
+        self.deadline = time.perf_counter() + time_limit
+        board = board.copy()
+        values = {}
+        try:
+            for move in board.legal_moves:
+                board.push(move)
+                try:
+                    if board.is_check():
+                        continue
+                    board.push(chess.Move.null())
+                    try:
+                        values[move] = self._evaluate(board)
+                    finally:
+                        board.pop()
+                finally:
+                    board.pop()
+        except SearchStopped:
+            pass
+        boards = []
+        for move in sorted(values, key=values.get, reverse=True)[:count]:
+            outcome = board.copy(stack=False)
+            outcome.push(move)
+            outcome.push(chess.Move.null())
+            boards.append(outcome)
+        return boards
+
+    def _evaluate_move(self, board: chess.Board, move: chess.Move,
+                       opponent_power_up_types: list[PowerUpTypes]) -> float:
+        """
+        Evaluates an own move. The opponent then chooses between no power-up and each power-up it holds.
+        :param board: board
+        :param move: own move
+        :param opponent_power_up_types: power-ups the opponent holds
+        :return: value for the side to move
+        """
+        board.push(move)
+        try:
+            value = -self._evaluate(board)
+            for power_up_type in set(opponent_power_up_types):
+                if power_up_type == PowerUpTypes.DOUBLE_MOVE:
+                    value = min(value, -self._get_double_move_value(board))
+                elif power_up_type in (PowerUpTypes.DESTROY, PowerUpTypes.RANDOM_PROMOTION):
+                    outcomes = get_power_up_outcomes(board, power_up_type, board.turn)
+                    value = min(value, -self._expect(outcomes, self._evaluate))
+        finally:
+            board.pop()
+        return value
+
+    def _get_double_move_value(self, board: chess.Board) -> int:
+        """
+        Gets the value of moving twice for the side to move: after each first move a null move passes the turn
+        back, the second move is left to the quiescence search. A null move can not follow a check, so first moves
+        that give check are only counted if they mate.
+        :param board: board
+        :return: value for the side to move
+        """
+        best_value = None
+        for move in list(board.legal_moves):
+            board.push(move)
+            try:
+                if board.is_checkmate():
+                    return MATE_SCORE
+                if board.is_check():
+                    continue
+                board.push(chess.Move.null())
+                try:
+                    value = self._evaluate(board)
+                finally:
+                    board.pop()
+            finally:
+                board.pop()
+            if best_value is None or value > best_value:
+                best_value = value
+        return best_value if best_value is not None else self._evaluate(board)
+
+    def _expect(self, outcomes: list[tuple[float, chess.Board]], evaluate: Callable[[chess.Board], int]) -> float:
+        """
+        Gets the expected value of a chance node. If it has more outcomes than samples, a random sample of them is
+        evaluated; all outcomes of a power-up are equally likely, so its mean is the expected value.
+        :param outcomes: probabilities and positions
+        :param evaluate: evaluates a position for the side to move
+        :return: expected value
+        """
+        if not outcomes:
+            return 0.0
+        if len(outcomes) > self.samples:
+            outcomes = random.sample(outcomes, self.samples)
+        total = sum(probability for probability, _ in outcomes)
+        return sum(probability * evaluate(outcome) for probability, outcome in outcomes) / total
+
+    def _get_candidate_moves(self, board: chess.Board, engine_move: chess.Move) -> list[chess.Move]:
+        """
+        Gets the best moves by a quick evaluation and the move of the engine.
+        :param board: board
+        :param engine_move: move of the engine
+        :return: candidate moves
+        """
+        values = {}
+        for move in board.legal_moves:
+            board.push(move)
+            try:
+                values[move] = -self._evaluate(board)
+            finally:
+                board.pop()
+        moves = sorted(values, key=values.get, reverse=True)[:self.candidates]
+        if engine_move not in moves:
+            moves.append(engine_move)
+        return moves
+
+    def _evaluate(self, board: chess.Board) -> int:
+        """
+        Evaluates a position by a cached quiescence search.
+        :param board: board
+        :return: value for the side to move
+        """
+        key = chess.polyglot.zobrist_hash(board)
+        if key in self.evaluations:
+            self.evaluations.move_to_end(key)
+            return self.evaluations[key]
+        value = self.searcher.evaluate_quiet(board, self.deadline)
+        self.evaluations[key] = value
+        while len(self.evaluations) > self.max_evaluations:
+            self.evaluations.popitem(last=False)
+        return value
@@ -0,0 +1,601 @@
+"""
+This module contains the built-in chess engine, an alpha-beta search on the python-chess bitboards that is used
+when no Stockfish binary is available.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Callable
+
+import chess
+import chess.engine
+
+MATE_SCORE = 100000
+MATE_BOUND = MATE_SCORE - 1000
+MAX_DEPTH = 64
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+# nodes between two checks of the time and the stop flag
+CHECK_INTERVAL = 1024
+
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 0]
+# piece-square tables from white's point of view, index 0 is a1
+PIECE_SQUARE_TABLES = {
+    chess.PAWN: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    chess.ROOK: [
+        0, 0, 0, 5, 5, 0, 0, 0,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    chess.QUEEN: [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    chess.KING: [
+        20, 30, 10, 0, 0, 10, 30, 20,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+    ],
+}
+# material plus position per color, piece type and square, black squares are mirrored
+SQUARE_VALUES = {
+    color: {
+        piece_type: [PIECE_VALUES[piece_type] +
+                     PIECE_SQUARE_TABLES[piece_type][square if color == chess.WHITE else chess.square_mirror(square)]
+                     for square in chess.SQUARES]
+        for piece_type in chess.PIECE_TYPES
+    }
+    for color in chess.COLORS
+}
+
+
+def is_engine_available(engine_path: str | None) -> bool:
+    """
+    Checks if the engine binary can be started on this system.
+    :param engine_path: path of the engine binary
+    :return: True if available, False otherwise
+    """
+    if engine_path is None or not os.path.isfile(engine_path) or not os.access(engine_path, os.X_OK):
+        return False
+    return os.name == "nt" or not engine_path.lower().endswith(".exe")
+
+
+def evaluate(board: chess.Board) -> int:
+    """
+    Evaluates a position by material and piece-square tables.
+    :param board: board
+    :return: score in centipawns from the point of view of the side to move
+    """
+    score = 0
+    for piece_type in chess.PIECE_TYPES:
+        for square in chess.scan_forward(board.pieces_mask(piece_type, chess.WHITE)):
+            score += SQUARE_VALUES[chess.WHITE][piece_type][square]
+        for square in chess.scan_forward(board.pieces_mask(piece_type, chess.BLACK)):
+            score -= SQUARE_VALUES[chess.BLACK][piece_type][square]
+    return score if board.turn == chess.WHITE else -score
+
+
+class SearchStopped(Exception):
+    """
+    Raised inside the search once the time is up or the search was stopped.
+    """
+
+
+class Searcher:
+    """
+    This class represents the search: iterative deepening alpha-beta with a transposition table, move ordering
+    (transposition table move, MVV-LVA captures, killer moves, history) and a quiescence search of captures.
+    The transposition table is kept between searches of the same game.
+    """
+    transposition_table: dict[tuple, tuple[int, int, int, chess.Move | None]]
+    max_table_size: int
+    killers: list[list[chess.Move | None]]
+    history: dict[tuple[bool, int, int], int]
+    nodes: int
+    seldepth: int
+    deadline: float | None
+    max_nodes: int | None
+    stop_event: threading.Event
+
+    def __init__(self, max_table_size: int = 1000000) -> None:
+        self.transposition_table = {}
+        self.max_table_size = max_table_size
+        self.killers = [[None, None] for _ in range(MAX_DEPTH + 1)]
+        self.history = {}
+        self.nodes = 0
+        self.seldepth = 0
+        self.deadline = None
+        self.max_nodes = None
+        self.stop_event = threading.Event()
+
+    def new_game(self) -> None:
+        """
+        Forgets everything learned in the previous game.
+        """
+        self.transposition_table.clear()
+        self.history.clear()
+
+    def search(self, board: chess.Board, limit: chess.engine.Limit | None,
+               on_info: Callable[[chess.engine.InfoDict], None] | None = None,
+               stop_event: threading.Event | None = None) -> tuple[chess.Move | None, chess.Move | None,
+                                                                    chess.engine.InfoDict]:
+        """
+        Searches a position with iterative deepening until the limit is reached or the search is stopped.
+        :param board: board, it is changed during the search and restored afterwards
+        :param limit: search limit, None for infinite
+        :param on_info: called with the info of every finished depth
+        :param stop_event: stops the search once set
+        :return: best move, expected reply and info of the last finished depth
+        """
+        start = time.perf_counter()
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(MAX_DEPTH + 1)]
+        self.deadline = None
+        self.max_nodes = None
+        max_depth = MAX_DEPTH
+        if limit is not None:
+            move_time = self._get_move_time(board, limit)
+            if move_time is not None:
+                self.deadline = start + move_time
+            if limit.depth is not None:
+                max_depth = max(1, min(MAX_DEPTH, limit.depth))
+            self.max_nodes = limit.nodes
+        if len(self.transposition_table) > self.max_table_size:
+            self.transposition_table.clear()
+        legal_moves = list(board.legal_moves)
+        best_move = legal_moves[0] if legal_moves else None
+        info: chess.engine.InfoDict = {}
+        for depth in range(1, max_depth + 1):
+            if not legal_moves:
+                break
+            self.seldepth = 0
+            try:
+                score = self._search_root(board, depth, legal_moves)
+            except SearchStopped:
+                break
+            pv = self._get_pv(board, depth)
+            best_move = pv[0] if pv else best_move
+            elapsed = time.perf_counter() - start
+            info = {
+                "depth": depth,
+                "seldepth": self.seldepth,
+                "score": chess.engine.PovScore(self._to_engine_score(score), board.turn),
+                "pv": pv,
+                "nodes": self.nodes,
+                "nps": int(self.nodes / elapsed) if elapsed > 0 else 0,
+                "time": elapsed,
+            }
+            if on_info is not None:
+                on_info(info)
+            if abs(score) >= MATE_BOUND and MATE_SCORE - abs(score) <= depth:
+                break
+            # the next depth would not finish in time anyway
+            if self.deadline is not None and time.perf_counter() + elapsed > self.deadline:
+                break
+        pv = info.get("pv", [])
+        return best_move, pv[1] if len(pv) > 1 else None, info
+
+    def stop(self) -> None:
+        """
+        Stops the running search as soon as possible.
+        """
+        self.stop_event.set()
+
+    def evaluate_quiet(self, board: chess.Board, deadline: float | None = None) -> int:
+        """
+        Evaluates a position by a quiescence search of captures, much cheaper than a full search.
+        Raises SearchStopped once the deadline passed.
+        :param board: board, it is changed during the search and restored afterwards
+        :param deadline: deadline of time.perf_counter or None
+        :return: score in centipawns from the point of view of the side to move
+        """
+        self.deadline = deadline
+        self.max_nodes = None
+        self.stop_event = threading.Event()
+        if not any(board.generate_legal_moves()):
+            return -MATE_SCORE if board.is_check() else 0
+        return self._quiescence(board, -MATE_SCORE, MATE_SCORE, 0)
+
+    @staticmethod
+    def _get_move_time(board: chess.Board, limit: chess.engine.Limit) -> float | None:
+        """
+        Gets the time for the move from the limit.
+        :param board: board
+        :param limit: search limit
+        :return: time in seconds or None for no time limit
+        """
+        if limit.time is not None:
+            return limit.time
+        clock = limit.white_clock if board.turn == chess.WHITE else limit.black_clock
+        if clock is not None:
+            increment = (limit.white_inc if board.turn == chess.WHITE else limit.black_inc) or 0.0
+            return clock / (limit.remaining_moves or 30) + increment / 2
+        return None
+
+    @staticmethod
+    def _to_engine_score(score: int) -> chess.engine.Score:
+        """
+        Converts a search score to a score of python-chess.
+        :param score: score
+        :return: score of python-chess
+        """
+        if score >= MATE_BOUND:
+            return chess.engine.Mate((MATE_SCORE - score + 1) // 2)
+        if score <= -MATE_BOUND:
+            return chess.engine.Mate(-((MATE_SCORE + score) // 2))
+        return chess.engine.Cp(score)
+
+    @staticmethod
+    def _to_table_score(score: int, ply: int) -> int:
+        """
+        Converts a mate score from distance to the root to distance to the position for the transposition table.
+        :param score: score
+        :param ply: distance to the root
+        :return: score for the table
+        """
+        if score >= MATE_BOUND:
+            return score + ply
+        if score <= -MATE_BOUND:
+            return score - ply
+        return score
+
+    @staticmethod
+    def _from_table_score(score: int, ply: int) -> int:
+        """
+        Converts a mate score of the transposition table back to distance to the root.
+        :param score: score of the table
+        :param ply: distance to the root
+        :return: score
+        """
+        if score >= MATE_BOUND:
+            return score - ply
+        if score <= -MATE_BOUND:
+            return score + ply
+        return score
+
+    def _check_stop(self) -> None:
+        """
+        Raises SearchStopped once the time is up or the search was stopped.
+        """
+        if self.stop_event.is_set() or \
+                (self.deadline is not None and time.perf_counter() >= self.deadline) or \
+                (self.max_nodes is not None and self.nodes >= self.max_nodes):
+            raise SearchStopped()
+
+    def _search_root(self, board: chess.Board, depth: int, legal_moves: list[chess.Move]) -> int:
+        """
+        Searches all root moves, the best move of the previous depth first.
+        :param board: board
+        :param depth: depth
+        :param legal_moves: legal moves of the root, reordered in place
+        :return: score
+        """
+        entry = self.transposition_table.get(board._transposition_key())
+        if entry is not None and entry[3] in legal_moves:
+            legal_moves.remove(entry[3])
+            legal_moves.insert(0, entry[3])
+        alpha = -MATE_SCORE
+        beta = MATE_SCORE
+        best_move = legal_moves[0]
+        for move in legal_moves:
+            board.push(move)
+            try:
+                score = -self._alpha_beta(board, depth - 1, -beta, -alpha, 1)
+            finally:
+                board.pop()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self.transposition_table[board._transposition_key()] = (depth, alpha, TT_EXACT, best_move)
+        return alpha
+
+    def _alpha_beta(self, board: chess.Board, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """
+        Searches a position with alpha-beta.
+        :param board: board
+        :param depth: remaining depth
+        :param alpha: lower bound
+        :param beta: upper bound
+        :param ply: distance to the root
+        :return: score from the point of view of the side to move
+        """
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self._check_stop()
+        if board.halfmove_clock >= 100 or board.is_repetition(2) or board.is_insufficient_material():
+            return 0
+        in_check = board.is_check()
+        if in_check:
+            depth += 1
+        if depth <= 0:
+            return self._quiescence(board, alpha, beta, ply)
+        key = board._transposition_key()
+        entry = self.transposition_table.get(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, tt_move = entry
+            entry_score = self._from_table_score(entry_score, ply)
+            if entry_depth >= depth:
+                if entry_flag == TT_EXACT:
+                    return entry_score
+                if entry_flag == TT_LOWER and entry_score >= beta:
+                    return entry_score
+                if entry_flag == TT_UPPER and entry_score <= alpha:
+                    return entry_score
+        original_alpha = alpha
+        best_score = -MATE_SCORE
+        best_move = None
+        moves = self._order_moves(board, tt_move, ply)
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+        for move in moves:
+            board.push(move)
+            try:
+                score = -self._alpha_beta(board, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not board.is_capture(move):
+                    killers = self.killers[min(ply, MAX_DEPTH)]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    history_key = (board.turn, move.from_square, move.to_square)
+                    self.history[history_key] = self.history.get(history_key, 0) + depth * depth
+                break
+        if best_score <= original_alpha:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        self.transposition_table[key] = (depth, self._to_table_score(best_score, ply), flag, best_move)
+        return best_score
+
+    def _quiescence(self, board: chess.Board, alpha: int, beta: int, ply: int) -> int:
+        """
+        Searches captures and promotions until the position is quiet.
+        :param board: board
+        :param alpha: lower bound
+        :param beta: upper bound
+        :param ply: distance to the root
+        :return: score from the point of view of the side to move
+        """
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self._check_stop()
+        self.seldepth = max(self.seldepth, ply)
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        captures = list(board.generate_legal_captures())
+        captures.extend(move for move in board.generate_legal_moves(board.pawns, chess.BB_BACKRANKS & ~board.occupied)
+                        if move.promotion == chess.QUEEN)
+        captures.sort(key=lambda move: self._get_capture_value(board, move), reverse=True)
+        for move in captures:
+            board.push(move)
+            try:
+                score = -self._quiescence(board, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    @staticmethod
+    def _get_capture_value(board: chess.Board, move: chess.Move) -> int:
+        """
+        Gets the MVV-LVA value of a capture, most valuable victim first, then least valuable attacker.
+        :param board: board
+        :param move: capture
+        :return: value
+        """
+        # en passant captures a pawn on an empty square
+        victim = (board.piece_type_at(move.to_square) or chess.PAWN) if board.is_capture(move) else 0
+        attacker = board.piece_type_at(move.from_square) or chess.PAWN
+        return PIECE_VALUES[victim] * 10 - PIECE_VALUES[attacker] // 10 + PIECE_VALUES[move.promotion or 0]
+
+    def _order_moves(self, board: chess.Board, tt_move: chess.Move | None, ply: int) -> list[chess.Move]:
+        """
+        Orders the legal moves: transposition table move, captures by MVV-LVA, killer moves, then by history.
+        :param board: board
+        :param tt_move: move of the transposition table
+        :param ply: distance to the root
+        :return: ordered moves
+        """
+        killers = self.killers[min(ply, MAX_DEPTH)]
+        turn = board.turn
+
+        def get_order(move: chess.Move) -> int:
+            if move == tt_move:
+                return 10000000
+            if board.is_capture(move) or move.promotion:
+                return 1000000 + self._get_capture_value(board, move)
+            if move == killers[0]:
+                return 900000
+            if move == killers[1]:
+                return 800000
+            return self.history.get((turn, move.from_square, move.to_square), 0)
+
+        return sorted(board.legal_moves, key=get_order, reverse=True)
+
+    def _get_pv(self, board: chess.Board, depth: int) -> list[chess.Move]:
+        """
+        Gets the principal variation from the transposition table.
+        :param board: board
+        :param depth: maximum length
+        :return: principal variation
+        """
+        pv = []
+        seen = set()
+        for _ in range(depth):
+            key = board._transposition_key()
+            entry = self.transposition_table.get(key)
+            if entry is None or entry[3] is None or key in seen or not board.is_legal(entry[3]):
+                break
+            seen.add(key)
+            pv.append(entry[3])
+            board.push(entry[3])
+        for _ in pv:
+            board.pop()
+        return pv
+
+
+class PythonEngineProtocol:
+    """
+    This class represents the built-in engine with the part of the UCI protocol interface of python-chess the
+    engine pool uses. The search runs on its own thread, so the event loop of the engine service stays free.
+    """
+    searcher: Searcher
+    returncode: asyncio.Future
+    game: object
+    search_lock: asyncio.Lock
+
+    def __init__(self) -> None:
+        self.searcher = Searcher()
+        self.returncode = asyncio.get_running_loop().create_future()
+        self.game = None
+        self.search_lock = asyncio.Lock()
+
+    async def play(self, board: chess.Board, limit: chess.engine.Limit, *, game: object = None,
+                   ponder: bool = False, **kwargs) -> chess.engine.PlayResult:
+        """
+        Plays a move. Pondering is not supported, the expected reply is returned anyway.
+        :param board: board
+        :param limit: search limit
+        :param game: game token, a new one clears the transposition table
+        :param ponder: ignored
+        :return: play result
+        """
+        move, reply, info = await self._search(board, limit, game)
+        return chess.engine.PlayResult(move, reply, info)
+
+    async def analyse(self, board: chess.Board, limit: chess.engine.Limit, *, game: object = None,
+                      **kwargs) -> chess.engine.InfoDict:
+        """
+        Analyses a position.
+        :param board: board
+        :param limit: search limit
+        :param game: game token, a new one clears the transposition table
+        :return: info
+        """
+        _, _, info = await self._search(board, limit, game)
+        return info
+
+    async def analysis(self, board: chess.Board, limit: chess.engine.Limit | None = None, *, game: object = None,
+                       **kwargs) -> chess.engine.AnalysisResult:
+        """
+        Starts an analysis that posts the info of every finished depth and can be stopped.
+        :param board: board
+        :param limit: search limit, None for infinite
+        :param game: game token, a new one clears the transposition table
+        :return: running analysis
+        """
+        loop = asyncio.get_running_loop()
+        stop_event = threading.Event()
+        analysis = chess.engine.AnalysisResult(stop_event.set)
+
+        async def run() -> None:
+            try:
+                move, reply, _ = await self._search(
+                    board, limit, game, lambda info: loop.call_soon_threadsafe(analysis.post, info), stop_event)
+            except Exception as e:
+                analysis.set_exception(e)
+                return
+            # the posted infos are delivered before the analysis finishes
+            loop.call_soon(analysis.set_finished, chess.engine.BestMove(move, reply))
+
+        loop.create_task(run())
+        return analysis
+
+    async def ping(self) -> None:
+        """
+        Nothing runs after a command returned, so there is nothing to wait for.
+        """
+
+    async def quit(self) -> None:
+        """
+        Stops the running search and marks the engine as terminated.
+        """
+        self.searcher.stop()
+        if not self.returncode.done():
+            self.returncode.set_result(0)
+
+    async def _search(self, board: chess.Board, limit: chess.engine.Limit | None, game: object,
+                      on_info: Callable[[chess.engine.InfoDict], None] | None = None,
+                      stop_event: threading.Event | None = None) -> tuple:
+        """
+        Runs a search on its own thread.
+        :param board: board
+        :param limit: search limit
+        :param game: game token
+        :param on_info: called on the search thread with the info of every finished depth
+        :param stop_event: stops the search once set
+        :return: best move, expected reply and info
+        """
+        if self.returncode.done():
+            raise chess.engine.EngineTerminatedError("engine process dead (built-in engine was closed)")
+        async with self.search_lock:
+            if game is not None and game != self.game:
+                self.game = game
+                self.searcher.new_game()
+            board = board.copy()
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.searcher.search, board, limit, on_info, stop_event)
@@ -0,0 +1,189 @@
+"""
+This module contains the Tablebase class, which probes local Syzygy endgame tablebases.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import chess
+import chess.engine
+import chess.polyglot
+import chess.syzygy
+
+from ..config.globals import SYZYGY_PATH, SYZYGY_CACHE_SIZE
+
+# score shown for a won tablebase position, cursed wins and blessed losses are scored lower
+TABLEBASE_WIN_SCORE = 2000
+TABLEBASE_CURSED_WIN_SCORE = 100
+
+
+class Tablebase:
+    """
+    This class represents the Syzygy tablebases in a local directory. The tables are opened on first use, probe
+    results are kept in a LRU cache keyed by zobrist hash. Without tables nothing is probed. The tables can be
+    probed from the main thread and from background searches at the same time.
+    """
+    path: str | None
+    cache_size: int
+    tablebase: chess.syzygy.Tablebase | None
+    max_pieces: int
+    opened: bool
+    wdl_cache: OrderedDict[int, int | None]
+    dtz_cache: OrderedDict[int, int | None]
+    lock: threading.Lock
+
+    def __init__(self, path: str | None, cache_size: int) -> None:
+        self.path = path
+        self.cache_size = max(1, cache_size)
+        self.tablebase = None
+        self.max_pieces = 0
+        self.opened = False
+        self.wdl_cache = OrderedDict()
+        self.dtz_cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def can_probe(self, board: chess.Board) -> bool:
+        """
+        Checks if the position is covered by the tables.
+        :param board: board
+        :return: True if covered, False otherwise
+        """
+        tablebase = self._get_tablebase()
+        return tablebase is not None and chess.popcount(board.occupied) <= self.max_pieces and \
+            not board.castling_rights and board.is_valid()
+
+    def probe_wdl(self, board: chess.Board) -> int | None:
+        """
+        Probes win, draw or loss for the side to move: 2 win, 1 cursed win, 0 draw, -1 blessed loss, -2 loss.
+        :param board: board
+        :return: wdl or None if not covered
+        """
+        if not self.can_probe(board):
+            return None
+        return self._probe(board, self.wdl_cache, self.tablebase.probe_wdl)
+
+    def probe_dtz(self, board: chess.Board) -> int | None:
+        """
+        Probes the distance to the next capture or pawn move (zeroing) for the side to move.
+        :param board: board
+        :return: dtz or None if not covered
+        """
+        if not self.can_probe(board):
+            return None
+        return self._probe(board, self.dtz_cache, self.tablebase.probe_dtz)
+
+    def get_score(self, board: chess.Board) -> chess.engine.PovScore | None:
+        """
+        Gets the tablebase result of a position as score.
+        :param board: board
+        :return: score or None if not covered
+        """
+        wdl = self.probe_wdl(board)
+        if wdl is None:
+            return None
+        score = {2: TABLEBASE_WIN_SCORE, 1: TABLEBASE_CURSED_WIN_SCORE, 0: 0}.get(abs(wdl))
+        return chess.engine.PovScore(chess.engine.Cp(score if wdl >= 0 else -score), board.turn)
+
+    def get_best_move(self, board: chess.Board) -> chess.Move | None:
+        """
+        Gets the best move by the tablebases: a win is converted as fast as possible, a loss is delayed as long as
+        possible.
+        :param board: board
+        :return: best move or None if not covered
+        """
+        if not self.can_probe(board):
+            return None
+        best_move = None
+        best_rank = None
+        for move in board.legal_moves:
+            zeroing = board.is_zeroing(move)
+            board.push(move)
+            try:
+                if board.is_checkmate():
+                    rank = (3, 0, 0)
+                else:
+                    child_wdl = self.probe_wdl(board)
+                    child_dtz = self.probe_dtz(board)
+                    if child_wdl is None or child_dtz is None:
+                        return None
+                    wdl = -child_wdl
+                    if wdl > 0:
+                        rank = (wdl, int(zeroing), -abs(child_dtz))
+                    else:
+                        rank = (wdl, 0, abs(child_dtz))
+            finally:
+                board.pop()
+            if best_rank is None or rank > best_rank:
+                best_move = move
+                best_rank = rank
+        return best_move
+
+    def close(self) -> None:
+        """
+        Closes the table files.
+        """
+        if self.tablebase is not None:
+            self.tablebase.close()
+            self.tablebase = None
+
+    def _probe(self, board: chess.Board, cache: OrderedDict[int, int | None], probe: callable) -> int | None:
+        """
+        Probes a position through the cache.
+        :param board: board
+        :param cache: cache of the probe
+        :param probe: probe function of the tablebase
+        :return: result or None if a table is missing
+        """
+        key = chess.polyglot.zobrist_hash(board)
+        with self.lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        try:
+            result = probe(board)
+        except KeyError:
+            result = None
+        with self.lock:
+            cache[key] = result
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return result
+
+    def _get_tablebase(self) -> chess.syzygy.Tablebase | None:
+        """
+        Opens the tables on first use.
+        :return: tablebase or None if there are no tables
+        """
+        with self.lock:
+            if not self.opened:
+                self.opened = True
+                if self.path is not None and os.path.isdir(self.path):
+                    tablebase = chess.syzygy.open_tablebase(self.path)
+                    if tablebase.wdl:
+                        self.tablebase = tablebase
+                        self.max_pieces = max(len(name) - 1 for name in tablebase.wdl)
+                    else:
+                        tablebase.close()
+            return self.tablebase
+
+
+_tablebase: Tablebase | None = None
+
+
+def get_tablebase() -> Tablebase:
+    """
+    Gets the tablebase shared by the whole game.
+    :return: tablebase
+    """
+    global _tablebase
+    if _tablebase is None:
+        _tablebase = Tablebase(SYZYGY_PATH, SYZYGY_CACHE_SIZE)
+    return _tablebase
+
+
+def close_tablebase() -> None:
+    """
+    Closes the table files of the tablebase.
+    """
+    if _tablebase is not None:
+        _tablebase.close()
@@ -1,11 +1,20 @@
 """
 This module contains the Game class.
 """
+import time
+from typing import Callable
+
 import pygame
 import pygame_widgets
 
+from .config.globals import DIRTY_RECT_RENDERING, FRAME_STATS_REPORT, IDLE_WAIT_TIME, STARTUP_TIMING_REPORT
+from .engine.engine_service import get_engine_service_or_none
 from .enums import GameState, PersistentDataKeys
 from .gamestates.base import BaseState
+from .rendering import FrameStats
+from .timing import FIRST_INTERACTIVE_FRAME, WARM_UP_DONE, get_startup_timer
+
+ENGINE_RESULT_EVENT = pygame.event.custom_type()
 
 
 class Game:
@@ -16,18 +25,37 @@ class Game:
     screen: pygame.Surface
     clock: pygame.time.Clock
     fps: int
+    state_factories: dict[GameState, Callable[[], BaseState]]
     states: dict[GameState, BaseState]
     state_name: GameState
     state: BaseState
+    full_refresh: bool
+    frame_stats: FrameStats
+    waited_event: pygame.event.Event | None
+    start_state: GameState
+    startup_reported: bool
 
-    def __init__(self, screen: pygame.Surface, states: dict[GameState, BaseState], start_state: GameState) -> None:
+    def __init__(self, screen: pygame.Surface, state_factories: dict[GameState, Callable[[], BaseState]],
+                 start_state: GameState) -> None:
+        """
+        Initialize the Game. The states are created when they are entered the first time.
+        :param screen: screen
+        :param state_factories: functions that create the states, like their classes
+        :param start_state: first state
+        """
         self.done = False
         self.screen = screen
         self.clock = pygame.time.Clock()
         self.fps = 60
-        self.states = states
+        self.state_factories = state_factories
+        self.states = {}
         self.state_name = start_state
-        self.state = self.states[self.state_name]
+        self.start_state = start_state
+        self.state = self._get_state(self.state_name)
+        self.startup_reported = False
+        self.full_refresh = True
+        self.frame_stats = FrameStats(screen.get_size())
+        self.waited_event = None
         persistent = {
             PersistentDataKeys.BACKGROUND_IMAGE: None,
             PersistentDataKeys.SINGLE_PLAYER: None,
@@ -41,15 +69,21 @@ class Game:
 
     def run(self) -> None:
         """
-        Runs the game.
+        Runs the game. While nothing moves, the loop sleeps until input or an engine result arrives.
         :return: None
         """
         while not self.done:
-            dt = self.clock.tick(self.fps)
+            if self._is_idle():
+                self._wait_for_event()
+                dt = self.clock.tick()
+            else:
+                dt = self.clock.tick(self.fps)
             self._event_loop()
+            self._process_engine_results()
             self._update(dt)
             self._draw()
-            pygame.display.update()
+        if FRAME_STATS_REPORT:
+            print(self.frame_stats)
 
     def _event_loop(self) -> None:
         """
@@ -57,10 +91,60 @@ class Game:
         :return: None
         """
         events = pygame.event.get()
+        if self.waited_event is not None:
+            events.insert(0, self.waited_event)
+            self.waited_event = None
         pygame_widgets.update(events)
         for event in events:
+            # the window content was lost
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.full_refresh = True
             self.state.get_event(event)
 
+    def _is_idle(self) -> bool:
+        """
+        Checks if the next frame can wait for an event.
+        :return: True if nothing changes without input, False otherwise
+        """
+        engine_service = get_engine_service_or_none()
+        return not (self.full_refresh or self.state.done or self.state.quit or self.state.is_active() or
+                    (engine_service is not None and engine_service.has_results()))
+
+    def _process_engine_results(self) -> None:
+        """
+        Hands the engine results to their callbacks, once the engines were started.
+        :return: None
+        """
+        engine_service = get_engine_service_or_none()
+        if engine_service is None:
+            return
+        # engine results wake the loop up, the event is posted from the engine thread
+        if engine_service.wakeup is None:
+            engine_service.set_wakeup(lambda: pygame.event.post(pygame.event.Event(ENGINE_RESULT_EVENT)))
+        engine_service.process_results()
+
+    def _get_state(self, state_name: GameState) -> BaseState:
+        """
+        Gets a state, it is created on the first call.
+        :param state_name: state name
+        :return: state
+        """
+        state = self.states.get(state_name)
+        if state is None:
+            state = self.state_factories[state_name]()
+            self.states[state_name] = state
+            get_startup_timer().mark(f"{state_name.name.lower()} created")
+        return state
+
+    def _wait_for_event(self) -> None:
+        """
+        Sleeps until an event arrives or the idle wait time passed.
+        :return: None
+        """
+        event = pygame.event.wait(IDLE_WAIT_TIME)
+        if event.type != pygame.NOEVENT:
+            self.waited_event = event
+
     def _flip_state(self) -> None:
         """
         Flips the state.
@@ -68,10 +152,12 @@ class Game:
         """
         next_state = self.state.next_state
         self.state.done = False
+        self.state.cleanup()
         self.state_name = next_state
         persistent = self.state.persist
-        self.state = self.states[self.state_name]
+        self.state = self._get_state(self.state_name)
         self.state.startup(persistent)
+        self.full_refresh = True
 
     def _update(self, dt: int) -> None:
         """
@@ -87,8 +173,41 @@ class Game:
 
     def _draw(self) -> None:
         """
-        Draws the game.
+        Draws the game. In dirty rect mode only the regions that changed are drawn and sent to the display,
+        a frame without changes is skipped.
+        :return: None
+        """
+        start_time = time.perf_counter()
+        dirty_rects = None
+        if DIRTY_RECT_RENDERING and not self.full_refresh:
+            dirty_rects = self.state.get_dirty_rects()
+        self.full_refresh = False
+        if dirty_rects is None:
+            self.state.draw(self.screen)
+            pygame.display.update()
+        elif dirty_rects:
+            self.screen.set_clip(dirty_rects[0].unionall(dirty_rects[1:]))
+            self.state.draw(self.screen)
+            self.screen.set_clip(None)
+            pygame.display.update(dirty_rects)
+        self.frame_stats.add_frame(dirty_rects, start_time)
+        self._mark_first_frames()
+
+    def _mark_first_frames(self) -> None:
+        """
+        Marks the first frame and the first interactive frame, the first frame after the start state.
+        The startup timing is reported once the warm-up is done, too.
         :return: None
         """
-        self.state.draw(self.screen)
+        if self.startup_reported:
+            return
+        startup_timer = get_startup_timer()
+        startup_timer.mark("first frame")
+        if self.state_name != self.start_state:
+            startup_timer.mark(FIRST_INTERACTIVE_FRAME)
+        if startup_timer.get_mark_or_none(FIRST_INTERACTIVE_FRAME) is not None and \
+                startup_timer.get_mark_or_none(WARM_UP_DONE) is not None:
+            self.startup_reported = True
+            if STARTUP_TIMING_REPORT:
+                print(startup_timer.get_report())
 
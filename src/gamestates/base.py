@@ -36,6 +36,12 @@ class BaseState:
         """
         self.persist = persistent
 
+    def cleanup(self) -> None:
+        """
+        Cleans up the state before the next state starts.
+        """
+        pass
+
     def get_event(self, event: pygame.event.Event) -> None:
         """
         Gets an event.
@@ -56,3 +62,18 @@ class BaseState:
         :param surface: surface
         """
         pass
+
+    def get_dirty_rects(self) -> list[pygame.Rect] | None:
+        """
+        Gets the regions that change with the next draw. Only these regions are drawn and sent to the display.
+        :return: dirty rects or None if the whole screen has to be redrawn
+        """
+        return None
+
+    def is_active(self) -> bool:
+        """
+        Checks if the state changes without input, like a fade or a drag. An inactive state only gets frames on
+        input, engine results or after the idle wait time.
+        :return: True if the state needs the full frame rate, False otherwise
+        """
+        return False
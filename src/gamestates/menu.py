@@ -3,6 +3,7 @@ Menu game state
 """
 import pygame
 from ..gamestates.base import BaseState
+from ..gamestates.mid_game import MidGame
 from ..enums import GameState, PersistentDataKeys
 
 
@@ -12,10 +13,12 @@ class Menu(BaseState):
     """
     active_index: int
     options: dict[int, str]
+    warmed_up: bool
 
     def __init__(self):
         super(Menu, self).__init__()
         self.active_index = 0
+        self.warmed_up = False
         self.next_state = GameState.PRE_GAME
         self.font = pygame.font.Font(None, 45)
         self.start_button = pygame.Rect(0, 0, 300, 50)
@@ -35,6 +38,10 @@ class Menu(BaseState):
         self.background_image = persistent[PersistentDataKeys.BACKGROUND_IMAGE]
         self.background_rect: pygame.Rect = self.background_image.get_rect(center=self.screen_rect.center)
         self.next_state = GameState.PRE_GAME
+        # the first game is prepared while the player is in the menu
+        if not self.warmed_up:
+            MidGame.warm_up()
+            self.warmed_up = True
 
     def get_event(self, event):
         if event.type == pygame.QUIT:
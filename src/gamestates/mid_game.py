@@ -1,22 +1,31 @@
 """
 MidGame class
 """
-import random
+import threading
 
 import pygame
 import chess
 import chess.engine
 
+from ..config.globals import ENGINE_STATS_REPORT
+from ..engine.analysis_store import get_power_up_context
+from ..engine.engine_service import get_engine_service
+from ..engine.evaluation_cache import get_evaluation_cache
+from ..core.game_core import GameCore
 from ..enums import MidGameState, PersistentDataKeys, ChessColor, MidGamePersistentDataKeys, GameState, \
-    GlobalConstants, PowerUpTypes
+    GlobalConstants
+from ..asset_manager import AssetKey, get_asset_manager
 from ..gamestates.base import BaseState
 from ..gamestates.mid_game_gamestates.mid_game_base import MidGameBaseState
 from ..gamestates.mid_game_gamestates.mid_game_pause import MidGamePause
 from ..gamestates.mid_game_gamestates.mid_game_ai_turn import MidGameAiTurn
 from ..gamestates.mid_game_gamestates.mid_game_player_turn import MidGamePlayerTurn
 from ..mid_game.chess_board_gui import ChessBoardGui
+from ..mid_game.evaluation_bar import EvaluationBar
+from ..mid_game.sprite_cache import get_sprite_cache
 from ..mid_game.player_ui import PlayerUI
-from ..mid_game.power_ups import PowerUp, DestroyPowerUp, DoubleMovePowerUp, AIHelpsPowerUp, RandomPromotionPowerUp
+from ..mid_game.power_ups import PowerUp
+from ..timing import WARM_UP_DONE, get_startup_timer
 
 SQUARE_SIZE = int(GlobalConstants.Y_SCREEN_SIZE.value * GlobalConstants.SQUARE_SIZE_MULTIPLIER.value)
 PIECES_SIZE = GlobalConstants.PIECES_SIZE.value
@@ -29,71 +38,116 @@ class MidGame(BaseState):
     mid_game_states: dict[MidGameState, MidGameBaseState]
     mid_game_state_name: MidGameState
     mid_game_state: MidGameBaseState
+    pause: MidGamePause
+    player_turns: dict[tuple[ChessColor, str], MidGamePlayerTurn]
+    ai_turns: dict[ChessColor, MidGameAiTurn]
     players_ui: PlayerUI
+    core: GameCore
+    board: chess.Board
     board_gui: ChessBoardGui
+    full_redraw: bool
 
     def __init__(self):
         super(MidGame, self).__init__()
-        # init states
-        self.mid_game_states: dict[MidGameState, MidGameBaseState] = {
-            MidGameState.PAUSE: MidGamePause(ChessColor.BLACK)}
+        # the rules, the board, its gui and the states are created once and reset for every game
+        self.core = GameCore(chess.Board())
+        self.board = self.core.board
+        self.board_gui = ChessBoardGui(self.board, SQUARE_SIZE, PIECES_SIZE)
+        # init states, the turns are created when a game first needs them
+        self.pause = MidGamePause(ChessColor.BLACK, self.core, self.board_gui)
+        self.player_turns = {}
+        self.ai_turns = {}
+        self.mid_game_states: dict[MidGameState, MidGameBaseState] = {MidGameState.PAUSE: self.pause}
         self.mid_game_state_name: MidGameState = MidGameState.PAUSE
         self.mid_game_state: MidGameBaseState = self.mid_game_states[self.mid_game_state_name]
-        board: chess.Board = chess.Board()
-        self.board_gui = ChessBoardGui(board, SQUARE_SIZE, PIECES_SIZE)
         self.players_ui = PlayerUI((SQUARE_SIZE * 8, 0), (GlobalConstants.X_SCREEN_SIZE.value,
                                                           GlobalConstants.Y_SCREEN_SIZE.value))
+        self.full_redraw = True
+
+    @staticmethod
+    def get_asset_keys() -> list[AssetKey]:
+        """
+        Gets the images of the mid game in the sizes they are drawn in, to preload them.
+        :return: asset keys
+        """
+        # figures and the promotion dialog
+        asset_keys = get_sprite_cache().get_asset_keys([SQUARE_SIZE * PIECES_SIZE, SQUARE_SIZE])
+        return asset_keys + PlayerUI.get_asset_keys((SQUARE_SIZE * 8, 0), (GlobalConstants.X_SCREEN_SIZE.value,
+                                                                          GlobalConstants.Y_SCREEN_SIZE.value))
+
+    @staticmethod
+    def warm_up() -> None:
+        """
+        Prepares everything the first game needs, so it starts without waiting. The images are converted on the main
+        thread, the engines start in the background.
+        """
+        asset_manager = get_asset_manager()
+        for path, size in MidGame.get_asset_keys():
+            asset_manager.get_image(path, size)
+        get_startup_timer().mark("images converted")
+        # loads the stored analysis in the background
+        get_evaluation_cache()
+        threading.Thread(target=MidGame._warm_up_engines, name="warm-up", daemon=True).start()
+
+    @staticmethod
+    def _warm_up_engines() -> None:
+        """
+        Starts the engines, runs on the warm-up thread.
+        """
+        get_engine_service().start_engines()
+        get_startup_timer().mark("engines started")
+        get_startup_timer().mark(WARM_UP_DONE)
 
     def startup(self, persistent):
         super(MidGame, self).startup(persistent)
-        # init board
-        board: chess.Board = chess.Board()
-        self.board_gui = ChessBoardGui(board, SQUARE_SIZE, PIECES_SIZE)
-        self.board_gui.set_figures_according_to_board()
+        # engines start a new game
+        get_engine_service().new_game()
+        # the gui and the states are reused
+        self.players_ui.reset()
         # init background
         self.background_image = persistent[PersistentDataKeys.BACKGROUND_IMAGE]
         self.background_rect: pygame.Rect = self.background_image.get_rect(center=self.screen_rect.center)
         # init states
-        self.mid_game_states = {MidGameState.PAUSE: MidGamePause(ChessColor.BLACK)}
+        self.pause.reset()
+        self.mid_game_states = {MidGameState.PAUSE: self.pause}
         # single player
         if self.persist[PersistentDataKeys.SINGLE_PLAYER]:
+            ais_strength = float(self.persist[PersistentDataKeys.DIFFICULTY])
             # start with white
             if self.persist[PersistentDataKeys.STARTS_WITH_WHITE]:
-                self.mid_game_states[MidGameState.TURN_PLAYER_1] = MidGamePlayerTurn(ChessColor.WHITE, "Player 1",
-                                                                                      board, self.board_gui)
-                self.mid_game_states[MidGameState.TURN_PLAYER_2] = MidGameAiTurn(ChessColor.BLACK,
-                                                                                 float(self.persist[
-                                                                                             PersistentDataKeys.DIFFICULTY]),
-                                                                                 board, self.board_gui)
+                self.mid_game_states[MidGameState.TURN_PLAYER_1] = self._get_player_turn(ChessColor.WHITE, "Player 1")
+                self.mid_game_states[MidGameState.TURN_PLAYER_2] = self._get_ai_turn(ChessColor.BLACK, ais_strength)
             # start with black
             else:
-                self.board_gui.rotate_board()
-                self.mid_game_states[MidGameState.TURN_PLAYER_1] = MidGameAiTurn(ChessColor.WHITE,
-                                                                                 float(self.persist[
-                                                                                             PersistentDataKeys.DIFFICULTY]),
-                                                                                 board, self.board_gui)
-                self.mid_game_states[MidGameState.TURN_PLAYER_2] = MidGamePlayerTurn(ChessColor.BLACK, "Player 1",
-                                                                                      board, self.board_gui)
+                self.mid_game_states[MidGameState.TURN_PLAYER_1] = self._get_ai_turn(ChessColor.WHITE, ais_strength)
+                self.mid_game_states[MidGameState.TURN_PLAYER_2] = self._get_player_turn(ChessColor.BLACK, "Player 1")
+            # the AI takes the power-ups of the player into account
+            self.mid_game_states[MidGameState.TURN_PLAYER_1].set_opponent(
+                self.mid_game_states[MidGameState.TURN_PLAYER_2].get_player_or_none())
+            self.mid_game_states[MidGameState.TURN_PLAYER_2].set_opponent(
+                self.mid_game_states[MidGameState.TURN_PLAYER_1].get_player_or_none())
         # multi player
         else:
-            self.mid_game_states[MidGameState.TURN_PLAYER_1] = MidGamePlayerTurn(ChessColor.WHITE, "Player 1", board,
-                                                                                  self.board_gui)
-            self.mid_game_states[MidGameState.TURN_PLAYER_2] = MidGamePlayerTurn(ChessColor.BLACK, "Player 2", board,
-                                                                                  self.board_gui)
+            self.mid_game_states[MidGameState.TURN_PLAYER_1] = self._get_player_turn(ChessColor.WHITE, "Player 1")
+            self.mid_game_states[MidGameState.TURN_PLAYER_2] = self._get_player_turn(ChessColor.BLACK, "Player 2")
+        # reset board, the players of both turns hold the power-ups
+        turns = [self.mid_game_states[MidGameState.TURN_PLAYER_1], self.mid_game_states[MidGameState.TURN_PLAYER_2]]
+        self.core.reset({turn.color: turn.get_inventory_or_none() for turn in turns},
+                        self.persist[PersistentDataKeys.POWER_UP_MULTIPLICATOR])
+        # the player sees the board from below, also when starting with black against the AI
+        self.board_gui.reset(self.persist[PersistentDataKeys.SINGLE_PLAYER] and
+                             not self.persist[PersistentDataKeys.STARTS_WITH_WHITE])
         # set first state
         self.mid_game_state_name = MidGameState.TURN_PLAYER_1
         self.mid_game_state = self.mid_game_states[self.mid_game_state_name]
-        # set data and start
-        mid_game_persist = {
-            MidGamePersistentDataKeys.CURRENT_TURN: self.mid_game_state_name,
-            MidGamePersistentDataKeys.DRAW_OFFERED: None,
-            MidGamePersistentDataKeys.DRAW_ACCEPTED: False,
-            MidGamePersistentDataKeys.FORFEIT: False,
-            MidGamePersistentDataKeys.RESTART: False
-        }
+        # set data and start, the draw offers are kept by the core
+        mid_game_persist = self.core.mid_game_persist
+        mid_game_persist[MidGamePersistentDataKeys.CURRENT_TURN] = self.mid_game_state_name
+        mid_game_persist[MidGamePersistentDataKeys.RESTART] = False
         self.persist[PersistentDataKeys.BOARD_GUI] = self.board_gui
         self.players_ui.change_player(mid_game_persist, self.mid_game_states[self.mid_game_state_name].get_player_or_none())
         self.mid_game_state.startup(mid_game_persist)
+        self.full_redraw = True
 
     def get_event(self, event):
         if event.type == pygame.QUIT:
@@ -112,7 +166,7 @@ class MidGame(BaseState):
                     self.mid_game_state.next_state = self.mid_game_state.mid_game_persist[
                         MidGamePersistentDataKeys.CURRENT_TURN]
         self.mid_game_state.get_event(event)
-        self.players_ui.get_event(event, self.mid_game_state.activate_powerup)
+        self.players_ui.get_event(event, self._activate_powerup)
         # check for draw
         if self.players_ui.mid_game_persist[MidGamePersistentDataKeys.DRAW_ACCEPTED]:
             self._checks_between_moves()
@@ -126,12 +180,79 @@ class MidGame(BaseState):
             self._checks_between_moves()
             self.flip_state()
         self.mid_game_state.update(dt)
+        self.players_ui.update(dt)
 
     def draw(self, surface):
         surface.fill(pygame.Color("black"))
         surface.blit(self.background_image, self.background_rect)
         self.players_ui.draw(surface)
         self.mid_game_state.draw(surface)
+        self.full_redraw = False
+
+    def is_active(self):
+        return self.full_redraw or self.mid_game_state.is_active() or self.players_ui.is_animating()
+
+    def get_dirty_rects(self):
+        if self.full_redraw:
+            return None
+        rects = self.mid_game_state.get_dirty_rects()
+        if rects is None:
+            return None
+        return rects + self.players_ui.get_dirty_rects()
+
+    def cleanup(self):
+        for mid_game_state in self.mid_game_states.values():
+            mid_game_state.cleanup()
+        if ENGINE_STATS_REPORT:
+            self._report_engine_stats()
+
+    def _report_engine_stats(self) -> None:
+        """
+        Prints the statistics of the engine users at the end of a game.
+        """
+        print(f'evaluation: {EvaluationBar.get_request_stats()}')
+        print(f'evaluation cache: {get_evaluation_cache().get_stats()}')
+        for color, ai_turn in self.ai_turns.items():
+            print(f'AI {color.name}: {ai_turn.get_ponder_stats()}')
+
+    def _get_player_turn(self, color: ChessColor, players_name: str) -> MidGamePlayerTurn:
+        """
+        Gets the turn of a player, reset for a new game.
+        :param color: color of the player
+        :param players_name: name of the player
+        :return: player turn
+        """
+        key = (color, players_name)
+        if key not in self.player_turns:
+            self.player_turns[key] = MidGamePlayerTurn(color, players_name, self.core, self.board_gui)
+        player_turn = self.player_turns[key]
+        player_turn.reset()
+        return player_turn
+
+    def _get_ai_turn(self, color: ChessColor, ais_strength: float) -> MidGameAiTurn:
+        """
+        Gets the turn of the AI, reset for a new game. The AI gave its engine back when the last game ended and
+        reserves one again once it ponders.
+        :param color: color of the AI
+        :param ais_strength: thinking time in seconds
+        :return: AI turn
+        """
+        if color not in self.ai_turns:
+            self.ai_turns[color] = MidGameAiTurn(color, ais_strength, self.core, self.board_gui)
+        ai_turn = self.ai_turns[color]
+        ai_turn.reset_ai(ais_strength)
+        return ai_turn
+
+    def _activate_powerup(self, powerup: PowerUp) -> None:
+        """
+        Activates the powerup for the current state and tells the other states about it.
+        :param powerup: powerup
+        :return: None
+        """
+        self.mid_game_state.activate_powerup(powerup)
+        for mid_game_state in self.mid_game_states.values():
+            if mid_game_state is not self.mid_game_state:
+                mid_game_state.opponent_activated_powerup(powerup)
 
     def flip_state(self) -> None:
         """
@@ -148,8 +269,9 @@ class MidGame(BaseState):
         mid_game_persist = self.mid_game_state.mid_game_persist
         self.mid_game_state = self.mid_game_states[self.mid_game_state_name]
         self.mid_game_state.startup(mid_game_persist)
-        # add powerup if player
-        if self.mid_game_state.get_player_or_none() is not None:
+        self.full_redraw = True
+        # add powerup if player or AI
+        if self.mid_game_state.get_inventory_or_none() is not None:
             self._add_powerup()
         # update ui
         self.players_ui.change_player(mid_game_persist, self.mid_game_state.get_player_or_none())
@@ -159,53 +281,8 @@ class MidGame(BaseState):
         Adds a powerup to the board.
         :return: None
         """
-        current_score = self.players_ui.get_current_score()
-        player = self.mid_game_state.get_player_or_none()
-        if player.color == ChessColor.WHITE:
-            if current_score <= -0.1:
-                player.add_powerup(self.get_random_powerup_or_none())
-        else:
-            if current_score >= 0.1:
-                player.add_powerup(self.get_random_powerup_or_none())
-
-    def get_random_powerup_or_none(self, power_up_weights=None) -> PowerUp | None:
-        """
-        Gets a random powerup or None, with individual probabilities for each powerup.
-        :param power_up_weights: Dictionary with PowerUpTypes as keys and their weights as values.
-        :return: random powerup or None
-        """
-        multiplier = self.persist[PersistentDataKeys.POWER_UP_MULTIPLICATOR]
-        probability = multiplier / 10  # Convert the multiplier into a probability between 0.1 and 1.0
-
-        # Default weights if none provided
-        if power_up_weights is None:
-            power_up_weights = {
-                PowerUpTypes.DESTROY: 0.5,
-                PowerUpTypes.DOUBLE_MOVE: 0.5,  # Double move is less likely
-                PowerUpTypes.AI_HELPS: 1,
-                PowerUpTypes.RANDOM_PROMOTION: 0.8
-            }
-
-        # If a random number is less than the probability, we give a power-up
-        if random.random() < probability:
-            total_weight = sum(power_up_weights.values())
-            random_choice = random.uniform(0, total_weight)
-            cumulative_weight = 0
-
-            for power_up_type, weight in power_up_weights.items():
-                cumulative_weight += weight
-                if random_choice <= cumulative_weight:
-                    if power_up_type == PowerUpTypes.DESTROY:
-                        return DestroyPowerUp()
-                    elif power_up_type == PowerUpTypes.DOUBLE_MOVE:
-                        return DoubleMovePowerUp()
-                    elif power_up_type == PowerUpTypes.AI_HELPS:
-                        return AIHelpsPowerUp()
-                    elif power_up_type == PowerUpTypes.RANDOM_PROMOTION:
-                        return RandomPromotionPowerUp()
-                    break
-
-        return None
+        player = self.mid_game_state.get_inventory_or_none()
+        self.core.add_powerup(player.color, self.players_ui.get_current_score())
 
     def _checks_between_moves(self) -> None:
         """
@@ -213,45 +290,19 @@ class MidGame(BaseState):
         """
         # get ui stuff
         self.mid_game_state.mid_game_persist = self.players_ui.mid_game_persist
+        self.core.mid_game_persist = self.players_ui.mid_game_persist
 
         # update ui stuff
-        self.players_ui.update_evaluation(self.mid_game_state.board)
+        self.players_ui.update_evaluation(self.board, get_power_up_context(self.core.get_power_up_types()))
 
         # check if game is over
-        outcome = self.mid_game_state.board.outcome()
+        outcome = self.core.get_outcome_or_none(self.mid_game_state.color)
         if outcome is not None:
             self.persist[PersistentDataKeys.OUTCOME] = outcome
             self.next_state = GameState.POST_GAME
             self.done = True
             return
 
-        # check forfeit
-        if self._get_mid_game_persist(MidGamePersistentDataKeys.FORFEIT):
-            self.persist[PersistentDataKeys.OUTCOME] = chess.Outcome(chess.Termination.VARIANT_LOSS,
-                                                                     self.mid_game_state.color.value)
-            self.next_state = GameState.POST_GAME
-            self.done = True
-            return
-
-        # check old draw offer
-        draw_offered = self._get_mid_game_persist(MidGamePersistentDataKeys.DRAW_OFFERED)
-        draw_accepted = self._get_mid_game_persist(MidGamePersistentDataKeys.DRAW_ACCEPTED)
-        current_player_color = self.mid_game_state.color
-        if draw_offered != current_player_color and not draw_accepted:
-            self._set_mid_game_persist(MidGamePersistentDataKeys.DRAW_OFFERED, None)
-        # normal draw between two players
-        elif draw_offered != current_player_color and draw_accepted:
-            self.persist[PersistentDataKeys.OUTCOME] = chess.Outcome(chess.Termination.VARIANT_DRAW, None)
-            self.next_state = GameState.POST_GAME
-            self.done = True
-            return
-        # draw claimed
-        elif not draw_offered and draw_accepted:
-            self.persist[PersistentDataKeys.OUTCOME] = chess.Outcome(chess.Termination.VARIANT_DRAW, None)
-            self.next_state = GameState.POST_GAME
-            self.done = True
-            return
-
         # next state
         if self.mid_game_state_name == MidGameState.TURN_PLAYER_1:
             self.mid_game_state.next_state = MidGameState.TURN_PLAYER_2
@@ -261,15 +312,6 @@ class MidGame(BaseState):
         if not self.persist[PersistentDataKeys.SINGLE_PLAYER]:
             self.mid_game_state.board_gui.rotate_board()
 
-    def _set_mid_game_persist(self, key: MidGamePersistentDataKeys, value: object) -> None:
-        """
-        Sets the mid_game_persist.
-        :param key: key
-        :param value: value
-        :return: None
-        """
-        self.mid_game_state.mid_game_persist[key] = value
-
     def _get_mid_game_persist(self, key: MidGamePersistentDataKeys) -> object:
         """
         Gets the mid_game_persist.
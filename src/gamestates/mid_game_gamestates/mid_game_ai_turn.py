@@ -1,35 +1,85 @@
 """
-Game Over State
+This module contains the MidGameAiTurn class.
 """
+import random
+import time
+
 import chess
 import chess.engine
-import threading
 
-from ...config.globals import ENGINE_PATH
-from ...enums import ChessColor
+from ...config.globals import AI_PONDER, POWER_UP_SEARCH_SHARE, POWER_UP_SEARCH_SAMPLES, POWER_UP_SEARCH_CANDIDATES, \
+    POWER_UP_SEARCH_MARGIN, POWER_UP_POLICY_SHARE, POWER_UP_POLICY_MARGIN, POWER_UP_POLICY_DOUBLE_MOVES
+from ...core.game_core import GameCore
+from ...engine.analysis_store import get_power_up_context
+from ...engine.engine_service import EngineRequest, get_engine_service
+from ...engine.evaluation_cache import get_evaluation_cache
+from ...engine.opening_book import get_opening_book
+from ...engine.power_up_search import PowerUpSearch, get_power_up_outcomes
+from ...engine.python_engine import MATE_SCORE, Searcher
+from ...engine.tablebase import get_tablebase
+from ...enums import ChessColor, PowerUpTypes
 from ...gamestates.mid_game_gamestates.mid_game_base import MidGameBaseState
 from ...mid_game.chess_board_gui import ChessBoardGui
+from ...mid_game.player import Player
+from ...mid_game.power_ups import PowerUp
 
 
 class MidGameAiTurn(MidGameBaseState):
     """
-    This class represents the post game.
+    This class represents the mid game AI turn. The AI uses its power-ups and makes its moves through the engine
+    service, whose results arrive on the main thread.
     """
     ais_strength: float
-    engine: chess.engine.SimpleEngine
+    reached_depth: int | None
+    pondered_board: chess.Board | None
+    ponder_hits: int
+    ponder_misses: int
+    in_book: bool
+    opponent: Player | None
+    power_up_search: PowerUpSearch
+    inventory: Player
+    used_powerup: bool
+    turn_started: float
+    request: EngineRequest | None
 
-    def __init__(self, color: ChessColor, ais_strength: float, board: chess.Board, board_gui: ChessBoardGui) -> None:
-        super(MidGameAiTurn, self).__init__(color)
+    def __init__(self, color: ChessColor, ais_strength: float, core: GameCore, board_gui: ChessBoardGui) -> None:
+        super(MidGameAiTurn, self).__init__(color, core, board_gui)
         # init vars
         self.ais_strength = ais_strength
-        self.board = board
-        self.board_gui = board_gui
-        # Load Stockfish engine
-        self.engine = chess.engine.SimpleEngine.popen_uci(ENGINE_PATH)
+        self.reached_depth = None
+        self.pondered_board = None
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+        self.in_book = True
+        self.opponent = None
+        self.power_up_search = PowerUpSearch(POWER_UP_SEARCH_SAMPLES, POWER_UP_SEARCH_CANDIDATES,
+                                             POWER_UP_SEARCH_MARGIN)
+        self.inventory = Player("AI", color)
+        self.used_powerup = False
+        self.turn_started = 0.0
+        self.request = None
+        # start loading the stored analysis in the background
+        get_evaluation_cache()
+
+    def reset_ai(self, ais_strength: float) -> None:
+        """
+        Resets the AI for a new game.
+        :param ais_strength: thinking time in seconds
+        """
+        self.reset()
+        self.ais_strength = ais_strength
+        self.reached_depth = None
+        self.pondered_board = None
+        self.in_book = True
+        self.opponent = None
+        self.inventory.clear_powerups()
+        self.used_powerup = False
 
     def startup(self, mid_game_persistent):
         super(MidGameAiTurn, self).startup(mid_game_persistent)
-        # Make the AI move in a separate process
+        self.used_powerup = False
+        self.turn_started = time.perf_counter()
+        # the engine service searches the move on its own thread
         # extra check if game is over
         if not self.board.is_game_over():
             self._make_ai_move()
@@ -37,32 +87,332 @@ class MidGameAiTurn(MidGameBaseState):
     def draw(self, surface):
         self.board_gui.draw(surface)
 
-    def _ai_play(self, board, time_limit, queue):
-        result = self.engine.play(board, chess.engine.Limit(time=time_limit))
-        queue.put(result)
+    def get_dirty_rects(self):
+        return self.board_gui.get_dirty_rects()
+
+    def get_inventory_or_none(self) -> Player:
+        """
+        Gets the inventory of the AI. The AI has no player, so nothing is shown in the player UI.
+        :return: inventory
+        """
+        return self.inventory
+
+    def set_opponent(self, opponent: Player | None) -> None:
+        """
+        Sets the opponent, whose power-ups the AI takes into account.
+        :param opponent: opponent
+        """
+        self.opponent = opponent
+
+    def opponent_activated_powerup(self, powerup: PowerUp) -> None:
+        """
+        A power-up that edits the board changes the position, so the pondered reply can not happen anymore and the
+        opening book does not apply for the rest of the game. AI helps leaves the position as it is.
+        :param powerup: powerup
+        """
+        if powerup.power_up_type == PowerUpTypes.AI_HELPS:
+            return
+        self.in_book = False
+        if self.pondered_board is not None:
+            self.pondered_board = None
+            self.ponder_misses += 1
+            get_engine_service().stop_pondering(self)
+
+    def cleanup(self) -> None:
+        """
+        Stops pondering and gives the engine back. A pending move must not be played in the next game.
+        """
+        if self.request is not None:
+            self.request.cancel()
+            self.request = None
+        self.pondered_board = None
+        get_engine_service().release_engine(self)
+
+    def _callback(self, board: chess.Board, context: str, result: chess.engine.PlayResult) -> None:
+        """
+        Plays the move of the engine, called on the main thread. If the opponent holds power-ups, the power-up
+        search may choose another move first.
+        :param board: The board the engine searched.
+        :param context: The power-up context of the board.
+        :param result: The result of the engine.
+        """
+        if "depth" in result.info:
+            self.reached_depth = result.info["depth"]
+        get_evaluation_cache().put_info(board, result.info, context)
+        power_up_types = self._get_opponent_power_up_types()
+        if power_up_types:
+            time_limit = self.ais_strength * POWER_UP_SEARCH_SHARE
+            self.request = get_engine_service().run_in_background(
+                lambda: self.power_up_search.choose_move(board, result.move, power_up_types, time_limit),
+                lambda move: self._play_move(board, result, move),
+                lambda error: self._play_move(board, result, result.move))
+            return
+        self._play_move(board, result, result.move)
 
-    def _callback(self, result):
-        self.board.push(result.move)
-        self._i_am_done()
+    def _play_move(self, board: chess.Board, result: chess.engine.PlayResult, move: chess.Move) -> None:
+        """
+        Plays the chosen move, called on the main thread.
+        :param board: The board the engine searched.
+        :param result: The result of the engine.
+        :param move: The chosen move.
+        """
+        # the engine now ponders on the expected reply
+        self.pondered_board = None
+        if move != result.move:
+            if AI_PONDER:
+                get_engine_service().stop_pondering(self)
+        elif AI_PONDER and result.ponder is not None and get_engine_service().can_ponder():
+            self.pondered_board = board.copy()
+            self.pondered_board.push(result.move)
+            self.pondered_board.push(result.ponder)
+        self._i_am_done(self.core.push_move(move))
+
+    def _get_opponent_power_up_types(self) -> list[PowerUpTypes]:
+        """
+        Gets the power-ups the opponent holds.
+        :return: power-up types
+        """
+        if self.opponent is None:
+            return []
+        return [power_up.power_up_type for power_up in self.opponent.get_powerups()]
+
+    def get_ponder_stats(self) -> str:
+        """
+        Gets the ponder hit and miss counters.
+        :return: statistics
+        """
+        return f'{self.ponder_hits} ponder hits, {self.ponder_misses} ponder misses'
+
+    def _is_ponder_hit(self) -> bool:
+        """
+        Checks if the opponent played the reply the engine pondered on and counts hits and misses.
+        :return: True if ponder hit, False otherwise
+        """
+        if self.pondered_board is None:
+            return False
+        hit = self.pondered_board == self.board and self.pondered_board.move_stack == self.board.move_stack
+        self.pondered_board = None
+        if hit:
+            self.ponder_hits += 1
+        else:
+            self.ponder_misses += 1
+        return hit
 
     def _make_ai_move(self):
         """
-        Makes the AI move in a separate thread.
+        Makes the AI move on the engine service, the callback runs on the main thread.
+        On a ponder hit the engine answers almost instantly, otherwise it stops pondering and searches anew.
+        A book move is played at once while the game has not left the opening book, in endgames covered by the
+        tablebases their best move is played, probed on a worker thread.
+        A cached move is played at once if it was searched at least as deep as the AI searches itself.
+        While the opponent holds power-ups, part of the time is left for the power-up search.
+        Before its first move of a turn the AI decides whether to use one of its own power-ups.
+        """
+        if not self.used_powerup and self._get_usable_power_ups():
+            self.used_powerup = True
+            self._choose_power_up()
+            return
+        move = self._get_book_move()
+        if move is not None:
+            self._play_move_at_once(move)
+            return
+        if get_tablebase().can_probe(self.board):
+            board = self.board.copy()
+            self.request = get_engine_service().run_in_background(lambda: get_tablebase().get_best_move(board),
+                                                                  self._play_tablebase_move,
+                                                                  lambda error: self._search_move())
+            return
+        self._search_move()
+
+    def _play_tablebase_move(self, move: chess.Move | None) -> None:
+        """
+        Plays the best move of the tablebases, called on the main thread.
+        :param move: best move or None if a table is missing
         """
+        if move is not None and move in self.board.legal_moves:
+            self._play_move_at_once(move)
+            return
+        self._search_move()
+
+    def _play_move_at_once(self, move: chess.Move) -> None:
+        """
+        Plays a move without asking the engine.
+        :param move: move
+        """
+        self.pondered_board = None
+        if AI_PONDER:
+            get_engine_service().stop_pondering(self)
+        self._i_am_done(self.core.push_move(move))
+
+    def _search_move(self) -> None:
+        """
+        Plays a cached move or lets the engine search the move. Results are cached per power-up context.
+        """
+        context = get_power_up_context(self.core.get_power_up_types())
+        if not self._is_ponder_hit() and self.reached_depth is not None:
+            entry = get_evaluation_cache().get(self.board, self.reached_depth, context)
+            if entry is not None and entry.best_move in self.board.legal_moves:
+                self._play_move_at_once(entry.best_move)
+                return
         # Set the AI's thinking time based on the difficulty
         time_limit = self.ais_strength  # You can adjust this based on your requirements
+        # the time spent on choosing a power-up counts
+        time_limit = max(time_limit - (time.perf_counter() - self.turn_started),
+                         time_limit * (1 - POWER_UP_POLICY_SHARE))
+        if self._get_opponent_power_up_types():
+            time_limit *= 1 - POWER_UP_SEARCH_SHARE
+
+        board = self.board.copy()
+        info = chess.engine.INFO_BASIC | chess.engine.INFO_SCORE | chess.engine.INFO_PV
+        if AI_PONDER:
+            self.request = get_engine_service().play_pondering(self, board, chess.engine.Limit(time=time_limit),
+                                                               lambda result: self._callback(board, context, result),
+                                                               lambda error: self._engine_failed(board, time_limit),
+                                                               info=info)
+        else:
+            self.request = get_engine_service().play(board, chess.engine.Limit(time=time_limit),
+                                                     lambda result: self._callback(board, context, result),
+                                                     lambda error: self._engine_failed(board, time_limit), info=info)
 
-        thread = threading.Thread(target=self._ai_play_threaded, args=(self.board, time_limit))
-        thread.start()
+    def _engine_failed(self, board: chess.Board, time_limit: float) -> None:
+        """
+        The engine failed, the built-in engine searches the move instead. Called on the main thread.
+        :param board: The board the engine should have searched.
+        :param time_limit: time in seconds for the search
+        """
+        self.pondered_board = None
+        self.request = get_engine_service().run_in_background(
+            lambda: Searcher().search(board, chess.engine.Limit(time=time_limit))[0],
+            self._play_fallback_move,
+            lambda error: self._play_fallback_move(None))
 
-    def _ai_play_threaded(self, board, time_limit):
-        result = self.engine.play(board, chess.engine.Limit(time=time_limit))
-        self._callback(result)
+    def _play_fallback_move(self, move: chess.Move | None) -> None:
+        """
+        Plays the move of the built-in engine, or a random legal move if it failed too. Called on the main thread.
+        :param move: move of the built-in engine or None
+        """
+        moves = self.core.get_legal_moves()
+        if move not in moves:
+            if not moves:
+                self.done = True
+                return
+            move = random.choice(moves)
+        self._i_am_done(self.core.push_move(move))
+
+    def _get_book_move(self) -> chess.Move | None:
+        """
+        Gets a move from the opening book. Once the game left the book or a power-up changed the position,
+        the book is not asked again.
+        :return: book move or None
+        """
+        if not self.in_book:
+            return None
+        move = get_opening_book().get_move(self.board)
+        if move is None or move not in self.board.legal_moves:
+            self.in_book = False
+            return None
+        return move
+
+    def _get_usable_power_ups(self) -> list[PowerUp]:
+        """
+        Gets one power-up of each type the AI can use, AI helps is of no use to the AI.
+        :return: power-ups
+        """
+        power_ups = {}
+        for power_up in self.inventory.get_powerups():
+            if power_up.power_up_type != PowerUpTypes.AI_HELPS and power_up.power_up_type not in power_ups:
+                power_ups[power_up.power_up_type] = power_up
+        return list(power_ups.values())
 
-    def _i_am_done(self):
+    def _choose_power_up(self) -> None:
+        """
+        Collects the positions every usable power-up can lead to on a worker thread: each piece a destroy could
+        remove, each promotion and the best first moves of a double move.
+        """
+        board = self.board.copy()
+        power_ups = self._get_usable_power_ups()
+        time_limit = self.ais_strength * POWER_UP_POLICY_SHARE
+
+        def get_candidates() -> list[tuple[PowerUp | None, list[chess.Board]]]:
+            candidates = [(None, [board])]
+            for power_up in power_ups:
+                if power_up.power_up_type == PowerUpTypes.DOUBLE_MOVE:
+                    boards = self.power_up_search.get_double_move_boards(board, POWER_UP_POLICY_DOUBLE_MOVES,
+                                                                         time_limit / 4)
+                else:
+                    boards = [outcome for _, outcome in
+                              get_power_up_outcomes(board, power_up.power_up_type, board.turn)]
+                if boards:
+                    candidates.append((power_up, boards))
+            return candidates
+
+        self.request = get_engine_service().run_in_background(
+            get_candidates, lambda candidates: self._evaluate_power_ups(candidates, time_limit),
+            lambda error: self._make_ai_move())
+
+    def _evaluate_power_ups(self, candidates: list[tuple[PowerUp | None, list[chess.Board]]],
+                            time_limit: float) -> None:
+        """
+        Lets the engines evaluate all positions as one batch, called on the main thread.
+        :param candidates: power-ups, None for no power-up, and the positions they can lead to
+        :param time_limit: time in seconds for choosing a power-up
+        """
+        boards = [board for _, candidate_boards in candidates for board in candidate_boards]
+        remaining_time = time_limit - (time.perf_counter() - self.turn_started)
+        limit = chess.engine.Limit(time=max(0.01, remaining_time / len(boards)))
+        self.request = get_engine_service().analyse_batch(boards, limit,
+                                                          lambda infos: self._use_best_power_up(candidates, infos))
+
+    def _use_best_power_up(self, candidates: list[tuple[PowerUp | None, list[chess.Board]]],
+                           infos: list[chess.engine.InfoDict | None]) -> None:
+        """
+        Uses the power-up with the best expected value if it beats not using one, then makes the move. Called on
+        the main thread.
+        :param candidates: power-ups, None for no power-up, and the positions they can lead to
+        :param infos: infos of the engines in the order of the positions
+        """
+        values = {}
+        index = 0
+        for power_up, boards in candidates:
+            scores = [info["score"].pov(self.color.value).score(mate_score=MATE_SCORE)
+                      for info in infos[index:index + len(boards)] if info is not None and "score" in info]
+            index += len(boards)
+            if not scores:
+                continue
+            # a double move is chosen by the AI, the other power-ups are random
+            if power_up is not None and power_up.power_up_type == PowerUpTypes.DOUBLE_MOVE:
+                values[power_up] = max(scores)
+            else:
+                values[power_up] = sum(scores) / len(scores)
+        power_ups = [power_up for power_up in values if power_up is not None]
+        if None in values and power_ups:
+            best_power_up = max(power_ups, key=values.get)
+            if values[best_power_up] > values[None] + POWER_UP_POLICY_MARGIN:
+                self._use_power_up(best_power_up)
+        self._make_ai_move()
+
+    def _use_power_up(self, power_up: PowerUp) -> None:
+        """
+        Uses a power-up of the inventory, a double move lasts until the first move is made.
+        :param power_up: power-up
+        """
+        self.in_book = False
+        self.activate_powerup(power_up)
+        self.board_gui.set_figures_according_to_board()
+
+    def _i_am_done(self, turn_over: bool):
         """
         Called when the AI is done with its move.
-        :return:
+        :param turn_over: False if the AI moves again after the first move of a double move
         """
         self.board_gui.set_figures_according_to_board()
+        # the engines can not search a position in which the side not to move is in check, the AI keeps the
+        # double move for a later turn then
+        if not turn_over and self.board.was_into_check():
+            self.core.give_up_second_move(self.color)
+            turn_over = True
+        if not turn_over:
+            self.turn_started = time.perf_counter()
+            self._make_ai_move()
+            return
         self.done = True
@@ -4,6 +4,7 @@ This module contains the base state.
 import chess
 import pygame
 
+from ...core.game_core import GameCore
 from ...enums import MidGamePersistentDataKeys, MidGameState, ChessColor
 from ...mid_game.chess_board_gui import ChessBoardGui
 from ...mid_game.player import Player
@@ -20,29 +21,24 @@ class MidGameBaseState(object):
     screen_rect: pygame.Rect
     mid_game_persist: dict[MidGamePersistentDataKeys, object]
     font: pygame.font.Font
+    core: GameCore
     board: chess.Board
     board_gui: ChessBoardGui
-    background_image: pygame.Surface
-    background_rect: pygame.Rect
     color: ChessColor
-    active_powerup: PowerUp | None
 
-    def __init__(self, color: ChessColor) -> None:
+    def __init__(self, color: ChessColor, core: GameCore, board_gui: ChessBoardGui) -> None:
         self.done = False
         self.quit = False
         self.next_state = MidGameState.PAUSE
         self.screen_rect = pygame.display.get_surface().get_rect()
         self.mid_game_persist = {}
         self.font = pygame.font.Font(None, 24)
-        # init board
-        self.board = chess.Board()
-        self.board_gui = ChessBoardGui(self.board, 0, 0)
-        # init background
-        self.background_image = pygame.Surface(self.screen_rect.size)
-        self.background_rect = self.background_image.get_rect(center=self.screen_rect.center)
+        # the rules, the board and its gui are shared by all states of the mid game
+        self.core = core
+        self.board = core.board
+        self.board_gui = board_gui
         # vars
         self.color = color
-        self.active_powerup = None
 
     def startup(self, mid_game_persistent: dict) -> None:
         """
@@ -51,6 +47,15 @@ class MidGameBaseState(object):
         """
         self.mid_game_persist = mid_game_persistent
 
+    def reset(self) -> None:
+        """
+        Resets the state for a new game, the board is reset by the core.
+        """
+        self.done = False
+        self.quit = False
+        self.next_state = MidGameState.PAUSE
+        self.mid_game_persist = {}
+
     def get_event(self, event: pygame.event.Event) -> None:
         """
         Gets an event.
@@ -72,6 +77,20 @@ class MidGameBaseState(object):
         """
         pass
 
+    def get_dirty_rects(self) -> list[pygame.Rect] | None:
+        """
+        Gets the regions that change with the next draw.
+        :return: dirty rects or None if the whole screen has to be redrawn
+        """
+        return None
+
+    def is_active(self) -> bool:
+        """
+        Checks if the state changes without input.
+        :return: True if the state needs the full frame rate, False otherwise
+        """
+        return self.done or self.quit
+
     def get_player_or_none(self) -> Player | None:
         """
         Gets the player or none.
@@ -79,9 +98,36 @@ class MidGameBaseState(object):
         """
         return None
 
+    def get_inventory_or_none(self) -> Player | None:
+        """
+        Gets the player that holds the power-ups of this state or none.
+        :return: Player or None
+        """
+        return self.get_player_or_none()
+
     def activate_powerup(self, powerup: PowerUp) -> None:
         """
-        Activates the powerup.
+        Activates the powerup of the player of this state, the core applies it.
         :param powerup: powerup
         """
-        self.active_powerup = powerup
+        self.core.use_powerup(self.color, powerup)
+
+    def set_opponent(self, opponent: Player | None) -> None:
+        """
+        Sets the player of the other state.
+        :param opponent: opponent or None if the other state has no player
+        """
+        pass
+
+    def opponent_activated_powerup(self, powerup: PowerUp) -> None:
+        """
+        Called when the player of another state activated a powerup.
+        :param powerup: powerup
+        """
+        pass
+
+    def cleanup(self) -> None:
+        """
+        Cleans up the state when the game is left.
+        """
+        pass
@@ -11,8 +11,8 @@ class MidGamePause(MidGameBaseState):
     """
     This class represents the post game.
     """
-    def __init__(self, color):
-        super(MidGamePause, self).__init__(color)
+    def __init__(self, color, core, board_gui):
+        super(MidGamePause, self).__init__(color, core, board_gui)
         # create "resume", "restart" and "quit" buttons
         self.resume_button = pygame.Rect(0, 0, 200, 50)
         self.resume_button.center = self.screen_rect.center
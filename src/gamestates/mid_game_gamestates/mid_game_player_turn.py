@@ -1,14 +1,16 @@
 """
 This module contains the MidGamePlayersTurn class.
 """
-import random
-import threading
-
 import pygame
 import chess
 import chess.engine
 
-from ...config.globals import ENGINE_PATH
+from ...config.globals import AI_HELPS_CACHE_MIN_DEPTH
+from ...core.game_core import GameCore
+from ...engine.analysis_store import get_power_up_context
+from ...engine.engine_service import EngineRequest, get_engine_service
+from ...engine.evaluation_cache import get_evaluation_cache
+from ...engine.tablebase import get_tablebase
 from ...enums import ChessColor, OverlayType, PowerUpTypes
 from ...gamestates.mid_game_gamestates.mid_game_base import MidGameBaseState
 from ...mid_game.chess_board_figure import ChessBoardFigure
@@ -27,9 +29,10 @@ class MidGamePlayerTurn(MidGameBaseState):
     button_down: bool
     wait_for_separate_player_input: bool
     second_move: bool
+    request: EngineRequest | None
 
-    def __init__(self, color: ChessColor, players_name: str, board: chess.Board, board_gui: ChessBoardGui):
-        super(MidGamePlayerTurn, self).__init__(color)
+    def __init__(self, color: ChessColor, players_name: str, core: GameCore, board_gui: ChessBoardGui):
+        super(MidGamePlayerTurn, self).__init__(color, core, board_gui)
         # init vars
         self.second_move = False
         self.is_figure_dragging: bool = False
@@ -38,9 +41,17 @@ class MidGamePlayerTurn(MidGameBaseState):
         self.time_clicked: float = 0
         self.button_down: bool = False
         self.wait_for_separate_player_input: bool = False
-        # init board
-        self.board = board
-        self.board_gui = board_gui
+        self.request = None
+
+    def reset(self):
+        super(MidGamePlayerTurn, self).reset()
+        self.second_move = False
+        self.is_figure_dragging = False
+        self.id_square_selected = 0
+        self.time_clicked = 0
+        self.button_down = False
+        self.wait_for_separate_player_input = False
+        self.player.clear_powerups()
 
     def startup(self, mid_game_persistent):
         super(MidGamePlayerTurn, self).startup(mid_game_persistent)
@@ -73,12 +84,25 @@ class MidGamePlayerTurn(MidGameBaseState):
     def draw(self, surface):
         self.board_gui.draw(surface)
 
+    def get_dirty_rects(self):
+        return self.board_gui.get_dirty_rects()
+
+    def is_active(self):
+        # a held button turns into a drag after a while
+        return super(MidGamePlayerTurn, self).is_active() or self.button_down or self.is_figure_dragging
+
     def update(self, dt):
         self.time_clicked += dt
         if self.time_clicked > 200 and self.button_down:
             self._handle_long_mousebuttondown(pygame.mouse.get_pos())
             self.button_down = False
 
+    def cleanup(self):
+        # a suggestion of the AI must not show up in the next game
+        if self.request is not None:
+            self.request.cancel()
+            self.request = None
+
     def get_player_or_none(self):
         """
         Gets the player or none.
@@ -88,12 +112,10 @@ class MidGamePlayerTurn(MidGameBaseState):
 
     def activate_powerup(self, powerup):
         super(MidGamePlayerTurn, self).activate_powerup(powerup)
-        switcher = {
-            PowerUpTypes.DESTROY: self._activate_powerup_destroy,
-            PowerUpTypes.AI_HELPS: self._activate_powerup_ai_helps,
-            PowerUpTypes.RANDOM_PROMOTION: self._activate_powerup_random_promotion,
-        }
-        switcher.get(powerup.power_up_type, lambda: None)()
+        if powerup.power_up_type == PowerUpTypes.AI_HELPS:
+            self._activate_powerup_ai_helps()
+        else:
+            self.board_gui.set_figures_according_to_board()
 
     def handle_peasant_promotion(self, mouse_pos: tuple[int, int]) -> None:
         """
@@ -105,28 +127,29 @@ class MidGamePlayerTurn(MidGameBaseState):
             selected_promotion = self.board_gui.get_selected_promotion(mouse_pos)
             to_square_id = self.id_square_selected + 8 if self.player.color == ChessColor.WHITE else \
                 self.id_square_selected - 8
+            turn_over = True
             if not selected_promotion:
                 return
             elif selected_promotion == OverlayType.PROMOTION_QUEEN:
-                self.board.push(chess.Move.from_uci(
+                turn_over = self.core.push_move(chess.Move.from_uci(
                     f"{self.board_gui.get_figure_by_square_id(self.id_square_selected).chess_position}"
                     f"{chess.square_name(to_square_id)}q"))
             elif selected_promotion == OverlayType.PROMOTION_ROOK:
-                self.board.push(chess.Move.from_uci(
+                turn_over = self.core.push_move(chess.Move.from_uci(
                     f"{self.board_gui.get_figure_by_square_id(self.id_square_selected).chess_position}"
                     f"{chess.square_name(to_square_id)}r"))
             elif selected_promotion == OverlayType.PROMOTION_BISHOP:
-                self.board.push(chess.Move.from_uci(
+                turn_over = self.core.push_move(chess.Move.from_uci(
                     f"{self.board_gui.get_figure_by_square_id(self.id_square_selected).chess_position}"
                     f"{chess.square_name(to_square_id)}b"))
             elif selected_promotion == OverlayType.PROMOTION_KNIGHT:
-                self.board.push(chess.Move.from_uci(
+                turn_over = self.core.push_move(chess.Move.from_uci(
                     f"{self.board_gui.get_figure_by_square_id(self.id_square_selected).chess_position}"
                     f"{chess.square_name(to_square_id)}n"))
             self.wait_for_separate_player_input = False
             self.id_square_selected = -1
             self.board_gui.set_figure_to_square(self.id_square_selected, self.player.color, selected_promotion)
-            self._i_am_done()
+            self._i_am_done(turn_over)
 
     def _check_for_peasant_promotion(self, to_square_id: int) -> bool:
         """
@@ -134,14 +157,7 @@ class MidGamePlayerTurn(MidGameBaseState):
         :param to_square_id: To square id
         :return: True if peasant promotion, False otherwise
         """
-        if self.board.piece_at(self.id_square_selected).piece_type == chess.PAWN:
-            if self.player.color == ChessColor.WHITE:
-                if to_square_id > 55:
-                    return True
-            else:
-                if to_square_id < 8:
-                    return True
-        return False
+        return self.board_gui.is_promotion_move(self.id_square_selected, to_square_id)
 
     def _handle_long_mousebuttondown(self, mouse_pos: tuple[int, int]) -> None:
         """
@@ -200,12 +216,7 @@ class MidGamePlayerTurn(MidGameBaseState):
         self.is_figure_dragging = False
         if self.id_square_selected != new_square_id:
             # check if new square is one of the possible moves
-            if self.board_gui.is_a_overlay_selected(new_square_id):
-                # check if it is the same color
-                if self.board_gui.is_overlay_selected_figure(new_square_id):
-                    self.board_gui.set_figures_according_to_board()
-                    return
-                # else it is an possible move
+            if self.board_gui.is_legal_move(self.id_square_selected, new_square_id):
                 self._move_figure(figure, new_square_id)
             else:
                 self.board_gui.set_figures_according_to_board()
@@ -242,99 +253,90 @@ class MidGamePlayerTurn(MidGameBaseState):
         if self._check_for_peasant_promotion(to_square_id):
             self._handle_peasant_promotion(to_square_id)
             return
-        self.board.push(chess.Move.from_uci(f"{figure.chess_position}{chess.square_name(to_square_id)}"))
-        self._i_am_done()
+        move = chess.Move.from_uci(f"{figure.chess_position}{chess.square_name(to_square_id)}")
+        self._i_am_done(self.core.push_move(move))
 
-    def _i_am_done(self):
+    def _i_am_done(self, turn_over: bool):
         """
         Done.
+        :param turn_over: False if the player moves again after the first move of a double move
         :return:
         """
         self.board_gui.set_figures_according_to_board()
-        if self.active_powerup is not None:
-            if self.active_powerup.power_up_type == PowerUpTypes.DOUBLE_MOVE:
-                self.second_move = True
-                self.active_powerup = None
-                self.board.push(chess.Move.null())
-                return
-        self.done = True
-
-    def _activate_powerup_destroy(self):
-        """
-        Activates the power-up destroy.
-        :return: None
-        """
-        self.active_powerup = None
-        # choose random figure
-        opponent_color = ChessColor.WHITE if self.color == ChessColor.BLACK else ChessColor.BLACK
-        # get all piece from self.board.piece_map()
-        opponent_figures = []
-        for square_id in self.board.piece_map():
-            if self.board.piece_at(square_id).color == opponent_color.value:
-                # if not king
-                if self.board.piece_at(square_id).piece_type != chess.KING:
-                    opponent_figures.append(square_id)
-        # choose random figure
-        if len(opponent_figures) == 0:
+        if not turn_over:
+            self.second_move = True
             return
-        random_item = random.choice(opponent_figures)
-        # remove figure from board
-        self.board.remove_piece_at(random_item)
-        self.board_gui.set_figures_according_to_board()
+        self.done = True
 
     def _activate_powerup_ai_helps(self):
         """
         Activates the power-up ai helps.
         :return: None
         """
-        self.active_powerup = None
-        self.engine = chess.engine.SimpleEngine.popen_uci(ENGINE_PATH)
         self.wait_for_separate_player_input = True
         self._make_ai_helps_move()
 
-    def _activate_powerup_random_promotion(self):
+    def _callback(self, board: chess.Board, context: str, result: chess.engine.PlayResult) -> None:
         """
-        Activates the power-up random promotion.
-        :return: None
+        Shows the move of the AI, called on the main thread.
+        :param board: The board the AI searched.
+        :param context: The power-up context of the board.
+        :param result: The result of the AI.
         """
-        self.active_powerup = None
-        # choose random figure
-        color = ChessColor.WHITE if self.color == ChessColor.WHITE else ChessColor.BLACK
-        # get all piece from self.board.piece_map()
-        figures = []
-        for square_id in self.board.piece_map():
-            if self.board.piece_at(square_id).color == color.value:
-                # if not king
-                if self.board.piece_at(square_id).piece_type == chess.PAWN:
-                    figures.append(square_id)
-        # choose random figure
-        if len(figures) == 0:
-            return
-        random_item = random.choice(figures)
-        # promote figure to random figure
-        possible_promotions = [chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT]
-        promotion = random.choice(possible_promotions)
-        self.board.set_piece_at(random_item, chess.Piece(promotion, color.value))
-        self.board_gui.set_figures_according_to_board()
+        get_evaluation_cache().put_info(board, result.info, context)
+        self._show_ai_helps_move(result.move)
 
-    def _ai_helps_play(self, board, time_limit, queue):
-        result = self.engine.play(board, chess.engine.Limit(time=time_limit))
-        queue.put(result)
-
-    def _callback(self, result):
-        self.id_square_selected = result.move.from_square
-        self.board_gui.set_selected_move(result.move)
-        self.engine.close()
+    def _show_ai_helps_move(self, move: chess.Move) -> None:
+        """
+        Shows the move suggested by the AI.
+        :param move: The suggested move.
+        """
+        self.id_square_selected = move.from_square
+        self.board_gui.set_selected_move(move)
+        self.wait_for_separate_player_input = False
 
     def _make_ai_helps_move(self):
         """
-        Makes the AI move in a separate thread.
+        Makes the AI move on the engine service, the callback runs on the main thread.
+        A tablebase move, probed on a worker thread, or a deep enough cached best move is shown without asking the
+        engine.
+        """
+        if get_tablebase().can_probe(self.board):
+            board = self.board.copy()
+            self.request = get_engine_service().run_in_background(lambda: get_tablebase().get_best_move(board),
+                                                                  self._show_tablebase_move,
+                                                                  lambda error: self._search_ai_helps_move())
+            return
+        self._search_ai_helps_move()
+
+    def _show_tablebase_move(self, move: chess.Move | None) -> None:
+        """
+        Shows the best move of the tablebases, called on the main thread.
+        :param move: best move or None if a table is missing
+        """
+        if move is not None and move in self.board.legal_moves:
+            self._show_ai_helps_move(move)
+            return
+        self._search_ai_helps_move()
+
+    def _search_ai_helps_move(self) -> None:
         """
+        Shows a cached move or lets the engine search the move. Results are cached per power-up context.
+        """
+        context = get_power_up_context(self.core.get_power_up_types())
+        entry = get_evaluation_cache().get(self.board, AI_HELPS_CACHE_MIN_DEPTH, context)
+        if entry is not None and entry.best_move in self.board.legal_moves:
+            self._show_ai_helps_move(entry.best_move)
+            return
         # Set the AI's thinking time based on the difficulty
-        thread = threading.Thread(target=self._ai_helps_play_threaded, args=(self.board, 4))
-        thread.start()
+        board = self.board.copy()
+        self.request = get_engine_service().play(
+            board, chess.engine.Limit(time=4), lambda result: self._callback(board, context, result),
+            self._ai_helps_failed, info=chess.engine.INFO_BASIC | chess.engine.INFO_SCORE | chess.engine.INFO_PV)
 
-    def _ai_helps_play_threaded(self, board, time_limit):
-        result = self.engine.play(board, chess.engine.Limit(time=time_limit))
-        self._callback(result)
+    def _ai_helps_failed(self, error: Exception) -> None:
+        """
+        The AI could not suggest a move, the player moves on their own. Called on the main thread.
+        :param error: error of the engine
+        """
         self.wait_for_separate_player_input = False
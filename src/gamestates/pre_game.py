@@ -81,6 +81,10 @@ class PreGame(BaseState):
         self.button_back.draw()
         self.button_start.draw()
 
+    def is_active(self):
+        # the sliders follow the mouse while the button is held
+        return pygame.mouse.get_pressed()[0]
+
     def get_event(self, event):
         if event.type == pygame.QUIT:
             self.quit = True
@@ -1,39 +1,63 @@
 """
 This module contains the Splash class.
 """
+import os
+
 import pygame
+from ..asset_manager import get_asset_manager
 from ..gamestates.base import BaseState
+from ..gamestates.mid_game import MidGame
 from ..enums import GameState, PersistentDataKeys
+from ..timing import get_startup_timer
+
+BACKGROUND_PATH = os.path.join("assets", "images", "board", "gr-stocks-Iq9SaJezkOE-unsplash.jpg")
+SPLASH_TIME = 500
 
 
 class Splash(BaseState):
     """
-    This class represents the splash screen.
+    This class represents the splash screen. The images of the game are loaded in the background while it fades in,
+    the menu starts once all of them are loaded.
     """
     time_active: int
     current_alpha: int
+    background_loaded: bool
 
     def __init__(self):
         super(Splash, self).__init__()
         self.next_state = GameState.MENU
         self.time_active = 0
-        self.background_image = pygame.image.load("assets\\images\\board\\gr-stocks-Iq9SaJezkOE-unsplash.jpg")
         self.current_alpha = 0
-        self.background_image = pygame.transform.scale(self.background_image, self.screen_rect.size)
-        self.background_rect = self.background_image.get_rect(center=self.screen_rect.center)
+        self.background_loaded = False
+        get_asset_manager().preload([(BACKGROUND_PATH, self.screen_rect.size)] + MidGame.get_asset_keys())
 
     def update(self, dt):
+        asset_manager = get_asset_manager()
+        # the screen stays black until the background is decoded
+        if not self.background_loaded:
+            if not asset_manager.is_loaded(BACKGROUND_PATH, self.screen_rect.size):
+                return
+            self.background_image = asset_manager.get_image(BACKGROUND_PATH, self.screen_rect.size)
+            self.background_rect = self.background_image.get_rect(center=self.screen_rect.center)
+            self.background_loaded = True
+            get_startup_timer().mark("background loaded")
         self.time_active += dt
-        if self.time_active >= 500:
+        if self.time_active >= SPLASH_TIME and not asset_manager.is_loading():
+            get_startup_timer().mark("assets loaded")
             self.persist[PersistentDataKeys.BACKGROUND_IMAGE] = self.background_image
             self.done = True
-        self.current_alpha = max(0, int((self.time_active / 5000) * 255))
+        # the fade stops at the handover, so the menu looks the same however long the loading takes
+        self.current_alpha = max(0, int((min(self.time_active, SPLASH_TIME) / 5000) * 255))
         self.background_image.set_alpha(self.current_alpha)
 
+    def is_active(self):
+        return True
+
     def get_event(self, event):
         if event.type == pygame.QUIT:
             self.quit = True
 
     def draw(self, surface):
         surface.fill(pygame.Color("black"))
-        surface.blit(self.background_image, self.background_rect)
+        if self.background_loaded:
+            surface.blit(self.background_image, self.background_rect)
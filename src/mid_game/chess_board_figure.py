@@ -15,13 +15,13 @@ class ChessBoardFigure:
     dragging: bool = False
     figure: pygame.Surface
 
-    def __init__(self, size: float, image_path: str, name: str, chess_position: str, cord_position: tuple):
+    def __init__(self, size: float, figure: pygame.Surface, name: str, chess_position: str, cord_position: tuple):
         self.name = name
         self.size = size
         self.chess_position = chess_position
         self.cord_position = cord_position
         self.dragging = False
-        self.figure = pygame.transform.scale(pygame.image.load(image_path), (size, size))
+        self.figure = figure
 
     def __str__(self):
         return f'Figure {self.name} at {self.chess_position} at {self.cord_position}'
@@ -7,22 +7,51 @@ import pygame
 from ..config.globals import CHESS_BOARD_COLORS
 from ..enums import OverlayType, ChessColor
 from ..mid_game.chess_board_figure import ChessBoardFigure
+from ..mid_game.legal_move_index import LegalMoveIndex
+from ..mid_game.sprite_cache import get_sprite_cache
 from ..mid_game.square_overlays import SquareOverlay, SquareOverlayMove, SquareOverlayPromotion
+from ..rendering import DrawStates, get_changed_rects
 
-PIECES = {
-    "b": "b_bishop_png_1024px.png",
-    "k": "b_king_png_1024px.png",
-    "n": "b_knight_png_1024px.png",
-    "p": "b_pawn_png_1024px.png",
-    "q": "b_queen_png_1024px.png",
-    "r": "b_rook_png_1024px.png",
-    "B": "w_bishop_png_1024px.png",
-    "K": "w_king_png_1024px.png",
-    "N": "w_knight_png_1024px.png",
-    "P": "w_pawn_png_1024px.png",
-    "Q": "w_queen_2x_ns.png",
-    "R": "w_rook_png_1024px.png"
-}
+
+# pre-rendered boards with labels by (square size, rotation, colors), shared by all guis
+BOARD_SURFACES: dict[tuple[int, bool, tuple], pygame.Surface] = {}
+LABEL_FONT: pygame.font.Font | None = None
+
+
+def get_board_surface(square_size: int, board_rotation: bool) -> pygame.Surface:
+    """
+    Gets the chessboard with its labels. The board is rendered once and cached, a new square size or new board colors
+    render it again and drop the boards of the old size or colors.
+    :param square_size: Size of a square
+    :param board_rotation: True if the board is rotated
+    :return: Chessboard surface
+    """
+    global LABEL_FONT
+    colors = tuple(tuple(color) for color in CHESS_BOARD_COLORS)
+    key = (square_size, board_rotation, colors)
+    board_surface = BOARD_SURFACES.get(key)
+    if board_surface is not None:
+        return board_surface
+    # resize or theme change, the other orientation is kept
+    for stale_key in [k for k in BOARD_SURFACES if k[0] != square_size or k[2] != colors]:
+        del BOARD_SURFACES[stale_key]
+    if LABEL_FONT is None:
+        LABEL_FONT = pygame.font.Font(None, 36)
+    board_surface = pygame.Surface((square_size * 8, square_size * 8))
+    for row in range(8):
+        for col in range(8):
+            rect = pygame.Rect(col * square_size, row * square_size, square_size, square_size)
+            if board_rotation:
+                label = f"{chr(104 - col)}{row + 1}"
+            else:
+                label = f"{chr(97 + col)}{8 - row}"
+            board_surface.fill(colors[(row + col) % 2], rect)
+            text = LABEL_FONT.render(label, True, (0, 0, 0))
+            board_surface.blit(text, text.get_rect(center=rect.center))
+    if pygame.display.get_surface() is not None:
+        board_surface = board_surface.convert()
+    BOARD_SURFACES[key] = board_surface
+    return board_surface
 
 
 class ChessBoardGui:
@@ -34,8 +63,16 @@ class ChessBoardGui:
     pieces_size_multiplier: float
     board_rotation: bool
     active_pieces: dict[int, ChessBoardFigure]
-
-    overlays: list[SquareOverlay]
+    move_index: LegalMoveIndex
+
+    overlays: dict[int, SquareOverlay]
+    move_overlays: list[SquareOverlayMove | None]
+    promotion_overlays: list[SquareOverlayPromotion]
+    promotion_overlays_by_color: dict[ChessColor, list[SquareOverlayPromotion]]
+    promotion_dialog_rect: pygame.Rect | None
+    drawn_board_state: tuple | None
+    drawn_pieces: DrawStates
+    drawn_overlays: DrawStates
     chess_field_name_to_inde: dict[str, int]
     chess_index_to_field_name: dict[int, str]
 
@@ -47,21 +84,36 @@ class ChessBoardGui:
         self.pieces_size_multiplier = pieces_size_multiplier
         self.board_rotation = board_rotation
         self.active_pieces = {}
-        # init figures
-        for square_id in board.piece_map():
-            figure = board.piece_at(square_id)
-            if figure is not None:
-                self.active_pieces[square_id] = ChessBoardFigure(square_size * pieces_size_multiplier,
-                                                                 f"assets\\images\\pieces\\"
-                                                                 f"{PIECES[str(figure)]}",
-                                                                 str(figure), chess.square_name(square_id),
-                                                                 (0, 0))
-        # init overlays
-        self.overlays = []
+        self.move_index = LegalMoveIndex(board)
+        # the figures are created by set_figures_according_to_board
+        # init overlays, indexed by square and reused
+        self.overlays = {}
+        self.move_overlays = [None] * 64
+        self.promotion_overlays = []
+        self.promotion_overlays_by_color = {}
+        self.promotion_dialog_rect = None
+        # what was drawn in the last frame
+        self.drawn_board_state = None
+        self.drawn_pieces = {}
+        self.drawn_overlays = {}
         # init chess field name to index
         self.chess_field_name_to_index = {f"{chr(97 + x)}{y + 1}": x + y * 8 for x in range(8) for y in range(8)}
         self.chess_index_to_field_name = {v: k for k, v in self.chess_field_name_to_index.items()}
 
+    def reset(self, board_rotation: bool = False) -> None:
+        """
+        Resets the gui for a new game after the board was reset. Figures that stand on the same square again are
+        reused.
+        :param board_rotation: True if the board is rotated
+        """
+        self.board_rotation = board_rotation
+        for piece in self.active_pieces.values():
+            piece.set_dragging(False)
+        self.drawn_board_state = None
+        self.drawn_pieces = {}
+        self.drawn_overlays = {}
+        self.set_figures_according_to_board()
+
     def set_figures_according_to_board(self) -> None:
         """
         Sets the figures.
@@ -78,7 +130,7 @@ class ChessBoardGui:
         for square, piece in current_pieces.items():
             if square not in self.active_pieces:
                 self.active_pieces[square] = ChessBoardFigure(self.square_size * self.pieces_size_multiplier,
-                                                              f"assets\\images\\pieces\\{PIECES[str(piece)]}",
+                                                              self._get_sprite(str(piece)),
                                                               str(piece), chess.square_name(square),
                                                               (0, 0))
 
@@ -90,7 +142,7 @@ class ChessBoardGui:
                     self._get_square_coordinates_for_centered_figure(chess.square_name(square), piece.size))
 
         # Clean all overlays
-        self.overlays.clear()
+        self._clear_overlays()
 
     def _invert_colors(self):
         """
@@ -108,30 +160,34 @@ class ChessBoardGui:
         :param square_id: Square id
         """
         # clean all overlays
-        self.overlays.clear()
+        self._clear_overlays()
 
         # Add the selected figure overlay
-        self.overlays.append(SquareOverlayMove(OverlayType.SELECTED_FIGURE,
-                                               self._get_square_coordinates_for_centered_figure(
-                                                   chess.square_name(square_id), self.square_size),
-                                               self.square_size, square_id))
-
-        # Generate and add all possible moves from this position
-        for move in self.board.legal_moves:
-            destination_square = move.to_square
-            if move.from_square == square_id:
-                if self.board.piece_at(destination_square) is None:
-                    overlay_type = OverlayType.POSSIBLE_MOVE_NORMAL
-                else:
-                    overlay_type = OverlayType.POSSIBLE_MOVE_ATTACK
-                    # cause of double move check if attacking the king
-                    if self.board.piece_at(destination_square).piece_type == chess.KING:
-                        continue
-
-                self.overlays.append(SquareOverlayMove(overlay_type,
-                                                       self._get_square_coordinates_for_centered_figure(
-                                                           chess.square_name(destination_square), self.square_size),
-                                                       self.square_size, destination_square))
+        self._set_move_overlay(square_id, OverlayType.SELECTED_FIGURE)
+
+        # Add all possible moves from this position
+        for target in self.move_index.get_targets(square_id):
+            overlay_type = OverlayType.POSSIBLE_MOVE_ATTACK if target.is_capture else OverlayType.POSSIBLE_MOVE_NORMAL
+            self._set_move_overlay(target.to_square, overlay_type)
+
+    def is_legal_move(self, from_square: int, to_square: int) -> bool:
+        """
+        Checks if a move is legal.
+        :param from_square: From square id
+        :param to_square: To square id
+        :return: True if legal, False otherwise
+        """
+        return self.move_index.get_target_or_none(from_square, to_square) is not None
+
+    def is_promotion_move(self, from_square: int, to_square: int) -> bool:
+        """
+        Checks if a move is a legal promotion.
+        :param from_square: From square id
+        :param to_square: To square id
+        :return: True if promotion, False otherwise
+        """
+        target = self.move_index.get_target_or_none(from_square, to_square)
+        return target is not None and target.is_promotion
 
     def set_selected_move(self, move: chess.Move) -> None:
         """
@@ -139,19 +195,13 @@ class ChessBoardGui:
         :param move: Move
         """
         # clean all overlays
-        self.overlays.clear()
+        self._clear_overlays()
 
         # Add the selected figure overlay
-        self.overlays.append(SquareOverlayMove(OverlayType.SELECTED_FIGURE,
-                                               self._get_square_coordinates_for_centered_figure(
-                                                   chess.square_name(move.from_square), self.square_size),
-                                               self.square_size, move.from_square))
+        self._set_move_overlay(move.from_square, OverlayType.SELECTED_FIGURE)
 
         # Add the selected move overlay
-        self.overlays.append(SquareOverlayMove(OverlayType.POSSIBLE_MOVE_ATTACK,
-                                               self._get_square_coordinates_for_centered_figure(
-                                                   chess.square_name(move.to_square), self.square_size),
-                                               self.square_size, move.to_square))
+        self._set_move_overlay(move.to_square, OverlayType.POSSIBLE_MOVE_ATTACK)
 
     def set_peasant_promotion_overlay(self, square_id: int, player_color: ChessColor) -> None:
         """
@@ -162,17 +212,27 @@ class ChessBoardGui:
         # init
         current_center_pos = self._get_square_coordinates_for_centered_figure(chess.square_name(square_id),
                                                                               self.square_size)
-        all_promotion_figures = ["Q", "R", "B", "N"] if player_color == ChessColor.WHITE else ["q", "r", "b", "n"]
-        figure_to_promotion_enum = {"Q": OverlayType.PROMOTION_QUEEN, "R": OverlayType.PROMOTION_ROOK,
-                                    "B": OverlayType.PROMOTION_BISHOP, "N": OverlayType.PROMOTION_KNIGHT,
-                                    "q": OverlayType.PROMOTION_QUEEN, "r": OverlayType.PROMOTION_ROOK,
-                                    "b": OverlayType.PROMOTION_BISHOP, "n": OverlayType.PROMOTION_KNIGHT}
-        for promotion_figure in all_promotion_figures:
-            # add the selected figure overlay
-            self.overlays.append(
-                SquareOverlayPromotion(figure_to_promotion_enum[promotion_figure], current_center_pos, self.square_size,
-                                       square_id, f"assets\\images\\pieces\\{PIECES[promotion_figure]}"))
+        # the overlays of a color are created once and moved to the promotion square
+        if player_color not in self.promotion_overlays_by_color:
+            all_promotion_figures = ["Q", "R", "B", "N"] if player_color == ChessColor.WHITE else \
+                ["q", "r", "b", "n"]
+            figure_to_promotion_enum = {"Q": OverlayType.PROMOTION_QUEEN, "R": OverlayType.PROMOTION_ROOK,
+                                        "B": OverlayType.PROMOTION_BISHOP, "N": OverlayType.PROMOTION_KNIGHT,
+                                        "q": OverlayType.PROMOTION_QUEEN, "r": OverlayType.PROMOTION_ROOK,
+                                        "b": OverlayType.PROMOTION_BISHOP, "n": OverlayType.PROMOTION_KNIGHT}
+            self.promotion_overlays_by_color[player_color] = [
+                SquareOverlayPromotion(figure_to_promotion_enum[promotion_figure], current_center_pos,
+                                       self.square_size, square_id,
+                                       get_sprite_cache().get_sprite(promotion_figure, self.square_size))
+                for promotion_figure in all_promotion_figures]
+        self.promotion_overlays = self.promotion_overlays_by_color[player_color]
+        for overlay in self.promotion_overlays:
+            overlay.square_id = square_id
+            overlay.set_position(current_center_pos)
             current_center_pos = (current_center_pos[0], current_center_pos[1] + self.square_size)
+        # the dialog is a column of squares, so a click maps to its overlay directly
+        self.promotion_dialog_rect = pygame.Rect(self.promotion_overlays[0].overlay_rect.topleft,
+                                                 (self.square_size, self.square_size * len(self.promotion_overlays)))
 
     def set_figure_to_square(self, square_id: int, player_color: ChessColor, selected_promotion: OverlayType) -> None:
         """
@@ -191,7 +251,7 @@ class ChessBoardGui:
             figure_str = "N" if player_color == ChessColor.WHITE else "n"
         # set the figure
         self.active_pieces[square_id] = ChessBoardFigure(self.square_size * self.pieces_size_multiplier,
-                                                         f"assets\\images\\pieces\\{PIECES[figure_str]}",
+                                                         self._get_sprite(figure_str),
                                                          figure_str, chess.square_name(square_id), (0, 0))
 
     def get_figure_by_square_id(self, square_id: int) -> ChessBoardFigure:
@@ -241,12 +301,10 @@ class ChessBoardGui:
         :param mouse_pos: Mouse position
         :return: Selected promotion or None
         """
-        for overlay in self.overlays:
-            if overlay.overlay_type in [OverlayType.PROMOTION_QUEEN, OverlayType.PROMOTION_ROOK,
-                                        OverlayType.PROMOTION_BISHOP, OverlayType.PROMOTION_KNIGHT]:
-                if overlay.overlay_rect.collidepoint(mouse_pos):
-                    return overlay.overlay_type
-        return None
+        if not self.is_a_overlay_selected_promotion_dialog(mouse_pos):
+            return None
+        index = (mouse_pos[1] - self.promotion_dialog_rect.top) // self.square_size
+        return self.promotion_overlays[index].overlay_type
 
     def is_a_overlay_selected(self, square_id: int) -> bool:
         """
@@ -254,10 +312,9 @@ class ChessBoardGui:
         :param square_id: Square id
         :return: True if selected, False otherwise
         """
-        for overlay in self.overlays:
-            if overlay.square_id == square_id:
-                return True
-        return False
+        if square_id in self.overlays:
+            return True
+        return len(self.promotion_overlays) > 0 and self.promotion_overlays[0].square_id == square_id
 
     def is_a_overlay_selected_promotion_dialog(self, mouse_pos: tuple[int, int]) -> bool:
         """
@@ -265,10 +322,7 @@ class ChessBoardGui:
         :param mouse_pos: Mouse position
         :return: True if selected, False otherwise
         """
-        for overlay in self.overlays:
-            if overlay.overlay_rect.collidepoint(mouse_pos):
-                return True
-        return False
+        return self.promotion_dialog_rect is not None and self.promotion_dialog_rect.collidepoint(mouse_pos)
 
     def is_overlay_selected_figure(self, square_id: int) -> bool:
         """
@@ -276,10 +330,8 @@ class ChessBoardGui:
         :param square_id: Square id
         :return: True if selected, False otherwise
         """
-        for overlay in self.overlays:
-            if overlay.overlay_type == OverlayType.SELECTED_FIGURE and overlay.square_id == square_id:
-                return True
-        return False
+        overlay = self.overlays.get(square_id)
+        return overlay is not None and overlay.overlay_type == OverlayType.SELECTED_FIGURE
 
     def rotate_board(self) -> None:
         """
@@ -295,31 +347,54 @@ class ChessBoardGui:
         self._draw_chessboard(surface)
         self._draw_figures(surface)
         self._draw_overlays(surface)
+        self.drawn_board_state = self._get_board_state()
+        self.drawn_pieces = self._get_piece_states()
+        self.drawn_overlays = self._get_overlay_states()
 
-    def _draw_chessboard(self, surface: pygame.Surface) -> None:
+    def get_dirty_rects(self) -> list[pygame.Rect]:
         """
-        Creates a chessboard.
-        :param surface: Surface to draw on
+        Gets the regions that changed since the last draw, like moved or dragged figures and shown or hidden overlays.
+        :return: dirty rects
         """
-        for row in range(8):
-            for col in range(8):
-                color = CHESS_BOARD_COLORS[(row + col) % 2]
+        rects = get_changed_rects(self.drawn_pieces, self._get_piece_states())
+        rects += get_changed_rects(self.drawn_overlays, self._get_overlay_states())
+        if self._get_board_state() != self.drawn_board_state:
+            rects.append(pygame.Rect(0, 0, self.square_size * 8, self.square_size * 8))
+        return rects
 
-                if self.board_rotation:
-                    rect = pygame.Rect(col * self.square_size, row * self.square_size, self.square_size,
-                                       self.square_size)
-                    label = f"{chr(104 - col)}{row + 1}"
-                else:
-                    rect = pygame.Rect(col * self.square_size, row * self.square_size, self.square_size,
-                                       self.square_size)
-                    label = f"{chr(97 + col)}{8 - row}"
+    def _get_board_state(self) -> tuple:
+        """
+        Gets what the chessboard below the figures looks like.
+        :return: square size, rotation and colors
+        """
+        return self.square_size, self.board_rotation, tuple(tuple(color) for color in CHESS_BOARD_COLORS)
+
+    def _get_piece_states(self) -> DrawStates:
+        """
+        Gets the draw states of the figures.
+        :return: region and sprite by figure
+        """
+        # the region is one pixel larger, the position of a figure is not a whole number
+        return {id(piece): ((int(piece.cord_position[0]), int(piece.cord_position[1]), int(piece.size) + 1,
+                             int(piece.size) + 1), id(piece.figure))
+                for piece in self.active_pieces.values()}
 
-                pygame.draw.rect(surface, color, rect)
+    def _get_overlay_states(self) -> DrawStates:
+        """
+        Gets the draw states of the shown overlays.
+        :return: draw state by overlay
+        """
+        states = {id(overlay): overlay.get_draw_state() for overlay in self.overlays.values()}
+        for overlay in self.promotion_overlays:
+            states[id(overlay)] = overlay.get_draw_state()
+        return states
 
-                font = pygame.font.Font(None, 36)
-                text = font.render(label, True, (0, 0, 0))
-                text_rect = text.get_rect(center=rect.center)
-                surface.blit(text, text_rect)
+    def _draw_chessboard(self, surface: pygame.Surface) -> None:
+        """
+        Draws the chessboard.
+        :param surface: Surface to draw on
+        """
+        surface.blit(get_board_surface(self.square_size, self.board_rotation), (0, 0))
 
     def _draw_figures(self, surface: pygame.Surface) -> None:
         """
@@ -343,8 +418,43 @@ class ChessBoardGui:
         Draw all overlays on the chessboard.
         :param surface: Surface to draw on
         """
-        for overlay in self.overlays:
+        for overlay in self.overlays.values():
             overlay.draw(surface)
+        for overlay in self.promotion_overlays:
+            overlay.draw(surface)
+
+    def _set_move_overlay(self, square_id: int, overlay_type: OverlayType) -> None:
+        """
+        Shows a move overlay on a square. The overlay of a square is created once and reused afterwards.
+        :param square_id: Square id
+        :param overlay_type: Overlay type
+        """
+        center_pos = self._get_square_coordinates_for_centered_figure(chess.square_name(square_id), self.square_size)
+        overlay = self.move_overlays[square_id]
+        if overlay is None:
+            overlay = SquareOverlayMove(overlay_type, center_pos, self.square_size, square_id)
+            self.move_overlays[square_id] = overlay
+        else:
+            # the position depends on the board rotation
+            overlay.set_position(center_pos)
+            overlay.set_overlay_type(overlay_type)
+        self.overlays[square_id] = overlay
+
+    def _get_sprite(self, symbol: str) -> pygame.Surface:
+        """
+        Gets the shared sprite of a piece in the size of the figures.
+        :param symbol: piece symbol
+        :return: sprite
+        """
+        return get_sprite_cache().get_sprite(symbol, self.square_size * self.pieces_size_multiplier)
+
+    def _clear_overlays(self) -> None:
+        """
+        Hides all overlays. The overlay objects are kept for reuse.
+        """
+        self.overlays.clear()
+        self.promotion_overlays = []
+        self.promotion_dialog_rect = None
 
     def _get_square_coordinates(self, square_name: str) -> tuple:
         """
@@ -2,14 +2,20 @@
 This module contains the EvaluationBar class.
 """
 import math
-import threading
 
 import chess
 import chess.engine
 import pygame
 
-from ..config.globals import ENGINE_PATH
+from ..config.globals import EVALUATION_STREAMING, EVALUATION_MAX_TIME, EVALUATION_STABLE_PLIES, \
+    EVALUATION_STABLE_MARGIN, EVALUATION_CACHE_MIN_DEPTH, EVALUATION_BAR_SMOOTHING_TIME
+from ..engine.engine_service import get_engine_service, EngineRequest, LatestWinsStats
+from ..engine.analysis_store import PLAIN_CONTEXT
+from ..engine.evaluation_cache import get_evaluation_cache
+from ..engine.python_engine import MATE_SCORE
+from ..engine.tablebase import get_tablebase
 
+EVALUATION_CHANNEL = "evaluation"
 COLOR_WHITE = pygame.Color(255, 255, 255)
 COLOR_BLACK = pygame.Color(0, 0, 0)
 PIECE_VALUES = {
@@ -52,22 +58,55 @@ def get_flexible_scaling(score: float, board: chess.Board) -> float:
     return normalized_score
 
 
+class StableScoreCondition:
+    """
+    This class decides when a streaming analysis has converged. That is the case once the score of the last
+    plies (search depths) stayed within a margin.
+    """
+    plies: int
+    margin: int
+    scores_by_depth: dict[int, int]
+
+    def __init__(self, plies: int, margin: int) -> None:
+        """
+        Initialize the StableScoreCondition.
+        :param plies: Number of consecutive depths the score must stay stable.
+        :param margin: Allowed difference in centipawns.
+        """
+        self.plies = plies
+        self.margin = margin
+        self.scores_by_depth = {}
+
+    def __call__(self, info: chess.engine.InfoDict) -> bool:
+        """
+        Adds an info of the engine and checks if the score is stable.
+        :param info: The info of the engine.
+        :return: True if stable, False otherwise
+        """
+        if "depth" not in info or "lowerbound" in info or "upperbound" in info:
+            return False
+        self.scores_by_depth[info["depth"]] = info["score"].white().score(mate_score=100000)
+        depths = sorted(self.scores_by_depth)[-self.plies:]
+        if len(depths) < self.plies:
+            return False
+        scores = [self.scores_by_depth[depth] for depth in depths]
+        return max(scores) - min(scores) <= self.margin
+
+
 class EvaluationBar:
     """
     This class represents the evaluation bar for the chess engine's evaluation.
     """
     evaluation_value: float
+    displayed_value: float
     starting_coordinate: tuple[int, int]
     size: tuple[int, int]
     overlay_rect_white: pygame.Rect
-    overlay_surface_white: pygame.Surface
     overlay_rect_black: pygame.Rect
-    overlay_surface_black: pygame.Surface
     overlay_rect_full: pygame.Rect
     overlay_surface_full: pygame.Surface
-    evaluation_thread: threading.Thread
-    evaluation_is_active: bool
-    engine: chess.engine.SimpleEngine
+    evaluation_request: EngineRequest | None
+    drawn_value: float | None
 
     def __init__(self, starting_coordinate: tuple[int, int], size: tuple[int, int]):
         """
@@ -77,23 +116,22 @@ class EvaluationBar:
         """
         # init vars
         self.evaluation_value = 0.0
+        self.displayed_value = 0.0
         self.starting_coordinate = starting_coordinate
         self.size = size
-        self.evaluation_thread = threading.Thread()
-        self.evaluation_is_active = False
+        self.evaluation_request = None
+        self.drawn_value = None
         # init full overlay
         self.overlay_rect_full = pygame.Rect(starting_coordinate[0], starting_coordinate[1], size[0], size[1])
         self.overlay_surface_full = pygame.Surface((size[0], size[1]), pygame.SRCALPHA)
         self._update_full_overlay_with_edges()
-        # init overlays
+        # init overlays, both halves are filled rects
         self.overlay_rect_white = pygame.Rect(starting_coordinate[0], starting_coordinate[1], size[0], size[1])
-        self.overlay_surface_white = pygame.Surface((size[0], size[1]), pygame.SRCALPHA)
         self.overlay_rect_black = pygame.Rect(starting_coordinate[0], starting_coordinate[1], size[0], size[1])
-        self.overlay_surface_black = pygame.Surface((size[0], size[1]), pygame.SRCALPHA)
         # init overlay rects
         self._update_overlay_rects()
-        # Load Stockfish engine
-        self.engine = chess.engine.SimpleEngine.popen_uci(ENGINE_PATH)
+        # start loading the stored analysis in the background
+        get_evaluation_cache()
 
     def _update_full_overlay_with_edges(self) -> None:
         """
@@ -110,77 +148,158 @@ class EvaluationBar:
 
     def _update_overlay_rects(self) -> None:
         """
-        Updates the overlay rects.
+        Updates the overlay rects in place to the displayed value.
         """
         bar_height = self.size[1]  # Gesamthöhe der Balkenanzeige
-        white_height = bar_height * (self.evaluation_value + 1) / 2  # Höhe des weißen Balkens
+        white_height = int(bar_height * (self.displayed_value + 1) / 2)  # Höhe des weißen Balkens
         black_height = bar_height - white_height  # Höhe des schwarzen Balkens
 
         # Die vertikale Position des schwarzen Balkens bleibt konstant
-        self.overlay_rect_black = pygame.Rect(self.starting_coordinate[0], self.starting_coordinate[1],
-                                              self.size[0], black_height)
+        self.overlay_rect_black.update(self.starting_coordinate[0], self.starting_coordinate[1],
+                                       self.size[0], black_height)
 
         # Die vertikale Position des weißen Balkens beginnt am Ende des schwarzen Balkens
-        self.overlay_rect_white = pygame.Rect(self.starting_coordinate[0], self.starting_coordinate[1] + black_height,
-                                              self.size[0], white_height)
+        self.overlay_rect_white.update(self.starting_coordinate[0], self.starting_coordinate[1] + black_height,
+                                       self.size[0], white_height)
 
-    def _update_overlay_surfaces(self) -> None:
+    def update(self, dt: int) -> None:
         """
-        Updates the overlay surfaces.
+        Moves the displayed value towards the evaluation value. The rects only change if the value changed.
+        :param dt: delta time in milliseconds
         """
-        self.overlay_surface_white = pygame.Surface((self.overlay_rect_white.width, self.overlay_rect_white.height),
-                                                    pygame.SRCALPHA)
-        self.overlay_surface_white.fill(COLOR_WHITE)
-        self.overlay_surface_black = pygame.Surface((self.overlay_rect_black.width, self.overlay_rect_black.height),
-                                                    pygame.SRCALPHA)
-        self.overlay_surface_black.fill(COLOR_BLACK)
+        if self.displayed_value == self.evaluation_value:
+            return
+        difference = self.evaluation_value - self.displayed_value
+        # snap once the bar would move less than a pixel
+        if EVALUATION_BAR_SMOOTHING_TIME <= 0 or abs(difference) * self.size[1] / 2 < 1:
+            self.displayed_value = self.evaluation_value
+        else:
+            self.displayed_value += difference * min(1.0, dt / EVALUATION_BAR_SMOOTHING_TIME)
+        self._update_overlay_rects()
 
-    def _update_evaluation_threaded(self, board: chess.Board, time: float) -> None:
+    def is_animating(self) -> bool:
         """
-        Update the evaluation value based on the given chess board and engine.
-        :param board: The chess board to evaluate.
-        :param engine: The chess engine to use for evaluation.
+        Checks if the bar is still moving towards the evaluation value.
+        :return: True if animating, False otherwise
+        """
+        return self.displayed_value != self.evaluation_value
+
+    def _evaluation_callback(self, board: chess.Board, context: str, info: chess.engine.InfoDict) -> None:
+        """
+        Callback after the evaluation is done, called on the main thread.
+        :param board: The evaluated chess board.
+        :param context: The power-up context of the board.
+        :param info: The info of the engine.
         """
-        info = self.engine.analyse(board, chess.engine.Limit(time=time))
         if "score" not in info:
             return
-        score_from_engine = info["score"].white().score()
-        if not score_from_engine:
+        get_evaluation_cache().put_info(board, info, context)
+        self._show_score(board, info["score"])
+
+    def _show_score(self, board: chess.Board, score: chess.engine.PovScore) -> None:
+        """
+        Shows the score of the engine on the bar, a draw as even and a mate as a full bar.
+        :param board: The evaluated chess board.
+        :param score: The score of the engine.
+        """
+        score_from_engine = score.white().score(mate_score=MATE_SCORE) / 100.0
+        self.evaluation_value = get_flexible_scaling(score_from_engine, board)
+
+    def reset(self) -> None:
+        """
+        Resets the bar to an even position for a new game, a pending evaluation is dropped.
+        """
+        if self.evaluation_request is not None:
+            self.evaluation_request.cancel()
+            self.evaluation_request = None
+        self.evaluation_value = 0.0
+        self.displayed_value = 0.0
+        self.drawn_value = None
+        self._update_overlay_rects()
+
+    def update_evaluation(self, board: chess.Board, context: str = PLAIN_CONTEXT) -> None:
+        """
+        Update the evaluation value based on the given chess board. Never blocks, the engine service calls back.
+        Only the newest board is analysed, a running analysis of an older board is stopped.
+        In streaming mode every new depth updates the bar and the analysis stops once the score is stable.
+        A cached result is shown at once, the engine is skipped if it was searched deep enough.
+        Endgames covered by the tablebases are scored without the engine, probed on a worker thread.
+        Results are cached per power-up context, the power-ups the players hold change what a position is worth.
+        :param board: The chess board to evaluate.
+        :param context: The power-up context of the board.
+        """
+        board = board.copy()
+        if self.evaluation_request is not None:
+            self.evaluation_request.cancel()
+        if get_tablebase().can_probe(board):
+            get_engine_service().cancel_latest(EVALUATION_CHANNEL)
+            self.evaluation_request = get_engine_service().run_in_background(
+                lambda: get_tablebase().get_score(board),
+                lambda score: self._tablebase_callback(board, context, score),
+                lambda error: self._analyse(board, context))
             return
-        score_from_engine /= 100.0
-        self._evaluation_callback(get_flexible_scaling(score_from_engine, board))
+        self._analyse(board, context)
 
-    def _evaluation_callback(self, score: float) -> None:
+    def _tablebase_callback(self, board: chess.Board, context: str, score: chess.engine.PovScore | None) -> None:
         """
-        Callback after the evaluation is done.
-        :param score: The normalized score.
+        Shows the score of the tablebases, called on the main thread. Without a table the engine analyses.
+        :param board: The evaluated chess board.
+        :param context: The power-up context of the board.
+        :param score: The score of the tablebases or None if a table is missing.
         """
-        self.evaluation_value = score
-        self.evaluation_is_active = False
+        if score is None:
+            self._analyse(board, context)
+            return
+        self._show_score(board, score)
+        self.evaluation_request = None
 
-    def update_evaluation(self, board: chess.Board) -> None:
+    def _analyse(self, board: chess.Board, context: str) -> None:
         """
-        Update the evaluation value based on the given chess board and engine.
+        Shows a cached result or lets the engine analyse the board.
         :param board: The chess board to evaluate.
+        :param context: The power-up context of the board.
+        """
+        entry = get_evaluation_cache().get(board, context=context)
+        if entry is not None:
+            self._show_score(board, entry.score)
+            if entry.depth >= EVALUATION_CACHE_MIN_DEPTH:
+                self.evaluation_request = None
+                get_engine_service().cancel_latest(EVALUATION_CHANNEL)
+                return
+        if EVALUATION_STREAMING:
+            self.evaluation_request = get_engine_service().analyse_latest(
+                EVALUATION_CHANNEL, board, chess.engine.Limit(time=EVALUATION_MAX_TIME),
+                lambda info: self._evaluation_callback(board, context, info), stream=True,
+                stop_condition=StableScoreCondition(EVALUATION_STABLE_PLIES, EVALUATION_STABLE_MARGIN))
+        else:
+            self.evaluation_request = get_engine_service().analyse_latest(
+                EVALUATION_CHANNEL, board, chess.engine.Limit(time=0.8),
+                lambda info: self._evaluation_callback(board, context, info))
+
+    @staticmethod
+    def get_request_stats() -> LatestWinsStats:
         """
-        # Überprüfung, ob bereits ein Thread läuft:
-        if self.evaluation_is_active:
-            self.evaluation_thread.join()
+        Gets the statistics of dropped and cancelled evaluation requests.
+        :return: statistics
+        """
+        return get_engine_service().get_channel_stats(EVALUATION_CHANNEL)
 
-        self.evaluation_thread = threading.Thread(target=self._update_evaluation_threaded, args=(board, 0.8))
-        self.evaluation_thread.start()
-        self.evaluation_is_active = True
+    def get_dirty_rects(self) -> list[pygame.Rect]:
+        """
+        Gets the regions that changed since the last draw.
+        :return: dirty rects
+        """
+        if self.displayed_value == self.drawn_value:
+            return []
+        return [self.overlay_rect_full.copy()]
 
     def draw(self, surface: pygame.Surface) -> None:
         """
         Draws the evaluation bar on the given surface.
         """
-        # update overlay rects
-        self._update_overlay_rects()
-        # update overlays
-        self._update_overlay_surfaces()
+        self.drawn_value = self.displayed_value
         # overlays
-        surface.blit(self.overlay_surface_white, self.overlay_rect_white)
-        surface.blit(self.overlay_surface_black, self.overlay_rect_black)
+        surface.fill(COLOR_WHITE, self.overlay_rect_white)
+        surface.fill(COLOR_BLACK, self.overlay_rect_black)
         # full overlay
         surface.blit(self.overlay_surface_full, self.overlay_rect_full)
@@ -0,0 +1,73 @@
+"""
+This module contains the LegalMoveIndex class, the legal moves of a position indexed by their from-square.
+"""
+import chess
+import chess.polyglot
+
+
+class MoveTarget:
+    """
+    This class represents the destination of a legal move.
+    """
+    to_square: int
+    is_capture: bool
+    is_promotion: bool
+
+    def __init__(self, to_square: int, is_capture: bool, is_promotion: bool) -> None:
+        self.to_square = to_square
+        self.is_capture = is_capture
+        self.is_promotion = is_promotion
+
+    def __repr__(self):
+        return f'MoveTarget {chess.square_name(self.to_square)} capture {self.is_capture} ' \
+               f'promotion {self.is_promotion}'
+
+
+class LegalMoveIndex:
+    """
+    This class represents the legal moves of a board in 64 slots, one per from-square. The index is built once per
+    position and rebuilt when the position changes, also if a power-up changed the pieces.
+    Moves that capture the king, which only a double move allows, are left out.
+    """
+    board: chess.Board
+    fingerprint: int | None
+    targets_by_square: list[dict[int, MoveTarget]]
+
+    def __init__(self, board: chess.Board) -> None:
+        self.board = board
+        self.fingerprint = None
+        self.targets_by_square = [{} for _ in chess.SQUARES]
+
+    def get_targets(self, from_square: int) -> list[MoveTarget]:
+        """
+        Gets the destinations of the legal moves from a square.
+        :param from_square: from-square
+        :return: destinations
+        """
+        return list(self._get_index()[from_square].values())
+
+    def get_target_or_none(self, from_square: int, to_square: int) -> MoveTarget | None:
+        """
+        Gets the destination of a legal move or None if the move is not legal.
+        :param from_square: from-square
+        :param to_square: to-square
+        :return: destination or None
+        """
+        return self._get_index()[from_square].get(to_square)
+
+    def _get_index(self) -> list[dict[int, MoveTarget]]:
+        """
+        Gets the index, rebuilt if the position changed.
+        :return: destinations by from-square and to-square
+        """
+        fingerprint = chess.polyglot.zobrist_hash(self.board)
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.targets_by_square = [{} for _ in chess.SQUARES]
+            kings = self.board.kings
+            for move in self.board.legal_moves:
+                if chess.BB_SQUARES[move.to_square] & kings:
+                    continue
+                self.targets_by_square[move.from_square][move.to_square] = MoveTarget(
+                    move.to_square, self.board.is_capture(move), move.promotion is not None)
+        return self.targets_by_square
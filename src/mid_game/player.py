@@ -57,6 +57,12 @@ class Player:
                 del self.power_ups[i]
                 break
 
+    def clear_powerups(self) -> None:
+        """
+        Removes all power-ups of the player.
+        """
+        self.power_ups.clear()
+
     def add_powerup(self, power_up: PowerUp | None) -> None:
         """
         Adds the given power-up to the player.
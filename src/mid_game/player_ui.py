@@ -1,23 +1,42 @@
 """
 This module contains the mid game players ui gamestate.
 """
+import os
+
 import chess.engine
 import pygame
 
+from ..asset_manager import AssetKey
+from ..engine.analysis_store import PLAIN_CONTEXT
 from ..enums import OverlayType, MidGamePersistentDataKeys, PowerUpTypes
 from ..mid_game.evaluation_bar import EvaluationBar
 from ..mid_game.player import Player
 from ..mid_game.square_overlays import SquareOverlayPowerupBackground, SquareOverlayPowerUp
+from ..rendering import DrawStates, get_changed_rects
 
+POWERUPS_PATH = os.path.join("assets", "images", "powerups")
 POWERUPS_IMAGE_PATHS = {
-    PowerUpTypes.DESTROY: r"assets\images\powerups\craiyon_184052_chess_pawn_logo_on_fire_with_dark_background.png",
-    PowerUpTypes.DOUBLE_MOVE: r"assets\images\powerups\craiyon_184729_black_chess_pawn_with_a__2x__marking.png",
-    PowerUpTypes.AI_HELPS: r"assets\images\powerups\craiyon_184158_A_Robot_staring_at_a_chess_board.png",
-    PowerUpTypes.RANDOM_PROMOTION: r"assets\images\powerups\craiyon_184538_A_chess_pawn_with_a_large_question_mark_"
-                                   r"above_it__surrounded_by_silhouettes_of_higher.png",
+    PowerUpTypes.DESTROY: os.path.join(POWERUPS_PATH,
+                                       "craiyon_184052_chess_pawn_logo_on_fire_with_dark_background.png"),
+    PowerUpTypes.DOUBLE_MOVE: os.path.join(POWERUPS_PATH,
+                                           "craiyon_184729_black_chess_pawn_with_a__2x__marking.png"),
+    PowerUpTypes.AI_HELPS: os.path.join(POWERUPS_PATH, "craiyon_184158_A_Robot_staring_at_a_chess_board.png"),
+    PowerUpTypes.RANDOM_PROMOTION: os.path.join(POWERUPS_PATH,
+                                                "craiyon_184538_A_chess_pawn_with_a_large_question_mark_"
+                                                "above_it__surrounded_by_silhouettes_of_higher.png"),
 }
 
 
+def get_powerup_square_size(starting_coordinate: tuple[int, int], size: tuple[int, int]) -> int:
+    """
+    Gets the size of the powerup squares.
+    :param starting_coordinate: starting coordinate of the ui
+    :param size: size of the screen
+    :return: square size
+    """
+    return int((size[0] - (starting_coordinate[0] + 100)) * 0.25)
+
+
 class PlayerUI:
     """
     This class represents the mid game players ui.
@@ -31,6 +50,8 @@ class PlayerUI:
     powerup_is_active: bool
     draw_offered_in_last_turn: bool
     evaluation_bar: EvaluationBar
+    drawn_powerups: DrawStates
+    drawn_offer_colors: tuple | None
 
     def __init__(self, starting_coordinate: tuple[int, int], size: tuple[int, int]) -> None:
         # init vars
@@ -40,8 +61,10 @@ class PlayerUI:
         self.size = size
         self.draw_offered_in_last_turn = True
         self.powerup_is_active = False
+        self.drawn_powerups = {}
+        self.drawn_offer_colors = None
         # init background
-        square_size = int((size[0] - (starting_coordinate[0] + 100)) * 0.25)
+        square_size = get_powerup_square_size(starting_coordinate, size)
         self.background = []
         for i in range(1, 5):
             self.background.append(SquareOverlayPowerupBackground(
@@ -68,6 +91,28 @@ class PlayerUI:
         bar_size = (50, size[1] - 20)
         self.evaluation_bar = EvaluationBar(bar_starting_coordinate, bar_size)
 
+    @staticmethod
+    def get_asset_keys(starting_coordinate: tuple[int, int], size: tuple[int, int]) -> list[AssetKey]:
+        """
+        Gets the assets of all powerups, to preload them.
+        :param starting_coordinate: starting coordinate of the ui
+        :param size: size of the screen
+        :return: asset keys
+        """
+        square_size = get_powerup_square_size(starting_coordinate, size)
+        return [(path, (square_size, square_size)) for path in POWERUPS_IMAGE_PATHS.values()]
+
+    def reset(self) -> None:
+        """
+        Resets the ui for a new game.
+        """
+        self.player = None
+        self.mid_game_persist = {}
+        self.powerups = []
+        self.drawn_powerups = {}
+        self.drawn_offer_colors = None
+        self.evaluation_bar.reset()
+
     def change_player(self, mid_game_persistent: dict, player: Player | None) -> None:
         """
         Changes to the player.
@@ -80,7 +125,7 @@ class PlayerUI:
         self.powerup_is_active = False
         # init powerups
         self.powerups = []
-        square_size = int((self.size[0] - (self.starting_coordinate[0] + 100)) * 0.25)
+        square_size = get_powerup_square_size(self.starting_coordinate, self.size)
         if player is not None:
             for i, powerup in enumerate(player.get_powerups()):
                 self.powerups.append(SquareOverlayPowerUp(
@@ -131,17 +176,50 @@ class PlayerUI:
         # powerups
         for powerup in self.powerups:
             powerup.draw(surface)
+        self.drawn_powerups = self._get_powerup_states()
         # offer
         self._draw_offer(surface)
         self.evaluation_bar.draw(surface)
 
-    def update_evaluation(self, board: chess.Board) -> None:
+    def get_dirty_rects(self) -> list[pygame.Rect]:
+        """
+        Gets the regions that changed since the last draw.
+        :return: dirty rects
+        """
+        rects = get_changed_rects(self.drawn_powerups, self._get_powerup_states())
+        if self._get_offer_colors() != self.drawn_offer_colors:
+            rects += [self.offer_rect.copy(), self.accept_rect.copy()]
+        return rects + self.evaluation_bar.get_dirty_rects()
+
+    def _get_powerup_states(self) -> DrawStates:
+        """
+        Gets the draw states of the shown powerups.
+        :return: draw state by powerup overlay
+        """
+        return {id(powerup): powerup.get_draw_state() for powerup in self.powerups}
+
+    def update(self, dt: int) -> None:
+        """
+        Updates the animations.
+        :param dt: delta time
+        """
+        self.evaluation_bar.update(dt)
+
+    def is_animating(self) -> bool:
+        """
+        Checks if a part of the ui is animating.
+        :return: True if animating, False otherwise
+        """
+        return self.evaluation_bar.is_animating()
+
+    def update_evaluation(self, board: chess.Board, context: str = PLAIN_CONTEXT) -> None:
         """
         Updates the evaluation.
         :param board: chess board
+        :param context: power-up context of the position
         :return:
         """
-        self.evaluation_bar.update_evaluation(board)
+        self.evaluation_bar.update_evaluation(board, context)
 
     def _draw_offer(self, surface: pygame.Surface) -> None:
         """
@@ -149,18 +227,29 @@ class PlayerUI:
         :param surface: surface
         :return: None
         """
+        offer_color, accept_color = self._get_offer_colors()
         # offer
-        color = (100, 100, 100)
-        if self.player is not None:
-            if self.mid_game_persist[MidGamePersistentDataKeys.DRAW_OFFERED] is None:
-                color = (220, 220, 220)
-        pygame.draw.rect(surface, color, self.offer_rect)
+        pygame.draw.rect(surface, offer_color, self.offer_rect)
         surface.blit(self.offer_text, self.offer_text_rect)
         # draw accept offer
-        color = (100, 100, 100)
+        pygame.draw.rect(surface, accept_color, self.accept_rect)
+        surface.blit(self.accept_text, self.accept_text_rect)
+        self.drawn_offer_colors = (offer_color, accept_color)
+
+    def _get_offer_colors(self) -> tuple[tuple, tuple]:
+        """
+        Gets the colors of the offer and the accept offer button, grey if disabled.
+        :return: offer color and accept offer color
+        """
+        # offer
+        offer_color = (100, 100, 100)
+        if self.player is not None:
+            if self.mid_game_persist[MidGamePersistentDataKeys.DRAW_OFFERED] is None:
+                offer_color = (220, 220, 220)
+        # accept offer
+        accept_color = (100, 100, 100)
         if self.player is not None:
             if self.mid_game_persist[MidGamePersistentDataKeys.DRAW_OFFERED] is not None:
                 if self.draw_offered_in_last_turn:
-                    color = (220, 220, 220)
-        pygame.draw.rect(surface, color, self.accept_rect)
-        surface.blit(self.accept_text, self.accept_text_rect)
+                    accept_color = (220, 220, 220)
+        return offer_color, accept_color
@@ -1,6 +1,8 @@
 """
 This module contains the classes for the power-ups.
 """
+import random
+
 import chess
 
 from ..enums import PowerUpTypes
@@ -15,9 +17,9 @@ class PowerUp:
     def __init__(self, power_up_type: PowerUpTypes) -> None:
         self.power_up_type = power_up_type
 
-    def apply_power_up(self, board: chess.Board):
+    def apply_power_up(self, board: chess.Board) -> None:
         """
-        Applies the power-up.
+        Applies the power-up for the side to move.
         :param board: The board on which the power-up is applied
         """
         pass
@@ -28,8 +30,15 @@ class DestroyPowerUp(PowerUp):
         super().__init__(PowerUpTypes.DESTROY)
 
     def apply_power_up(self, board):
-        # Implement the logic for the Freeze power-up here
-        pass
+        """
+        Removes a random piece of the opponent, except the king.
+        :param board: The board on which the power-up is applied
+        """
+        squares = [square for square, piece in board.piece_map().items()
+                   if piece.color != board.turn and piece.piece_type != chess.KING]
+        if len(squares) == 0:
+            return
+        board.remove_piece_at(random.choice(squares))
 
 
 class DoubleMovePowerUp(PowerUp):
@@ -37,7 +46,10 @@ class DoubleMovePowerUp(PowerUp):
         super().__init__(PowerUpTypes.DOUBLE_MOVE)
 
     def apply_power_up(self, board):
-        # Implement the logic for the DoubleMove power-up here
+        """
+        Does not change the board, the turn pushes a null move after the first move.
+        :param board: The board on which the power-up is applied
+        """
         pass
 
 
@@ -46,7 +58,10 @@ class AIHelpsPowerUp(PowerUp):
         super().__init__(PowerUpTypes.AI_HELPS)
 
     def apply_power_up(self, board):
-        # Implement the logic for the AIHelps power-up here
+        """
+        Does not change the board, the turn shows the move of the engine.
+        :param board: The board on which the power-up is applied
+        """
         pass
 
 
@@ -55,5 +70,12 @@ class RandomPromotionPowerUp(PowerUp):
         super().__init__(PowerUpTypes.RANDOM_PROMOTION)
 
     def apply_power_up(self, board):
-        # Implement the logic for the RandomPromotion power-up here
-        pass
+        """
+        Turns a random pawn of the side to move into a random queen, rook, bishop or knight.
+        :param board: The board on which the power-up is applied
+        """
+        squares = list(board.pieces(chess.PAWN, board.turn))
+        if len(squares) == 0:
+            return
+        promotion = random.choice([chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT])
+        board.set_piece_at(random.choice(squares), chess.Piece(promotion, board.turn))
@@ -0,0 +1,79 @@
+"""
+This module contains the SpriteCache class, the piece images shared by all figures and overlays.
+"""
+import os
+
+import pygame
+
+from ..asset_manager import AssetKey, get_asset_manager
+
+PIECES_PATH = os.path.join("assets", "images", "pieces")
+PIECES = {
+    "b": "b_bishop_png_1024px.png",
+    "k": "b_king_png_1024px.png",
+    "n": "b_knight_png_1024px.png",
+    "p": "b_pawn_png_1024px.png",
+    "q": "b_queen_png_1024px.png",
+    "r": "b_rook_png_1024px.png",
+    "B": "w_bishop_png_1024px.png",
+    "K": "w_king_png_1024px.png",
+    "N": "w_knight_png_1024px.png",
+    "P": "w_pawn_png_1024px.png",
+    "Q": "w_queen_2x_ns.png",
+    "R": "w_rook_png_1024px.png"
+}
+
+
+class SpriteCache:
+    """
+    This class represents the piece sprites by (piece symbol, pixel size). The images come from the asset manager,
+    figures hold references to the cached surfaces.
+    """
+    sprites: dict[tuple[str, int], pygame.Surface]
+
+    def __init__(self) -> None:
+        self.sprites = {}
+
+    def get_sprite(self, symbol: str, size: float) -> pygame.Surface:
+        """
+        Gets the sprite of a piece. The surface is shared, so it must not be drawn on.
+        :param symbol: piece symbol, e.g. "Q" or "n"
+        :param size: size in pixels
+        :return: sprite
+        """
+        key = (symbol, int(size))
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = get_asset_manager().get_image(os.path.join(PIECES_PATH, PIECES[symbol]), (key[1], key[1]))
+            self.sprites[key] = sprite
+        return sprite
+
+    @staticmethod
+    def get_asset_keys(sizes: list[float]) -> list[AssetKey]:
+        """
+        Gets the assets of all pieces, to preload them.
+        :param sizes: sizes in pixels
+        :return: asset keys
+        """
+        return [(os.path.join(PIECES_PATH, image), (int(size), int(size))) for image in PIECES.values()
+                for size in sizes]
+
+    def clear(self) -> None:
+        """
+        Clears the cache.
+        """
+        self.sprites.clear()
+
+
+_sprite_cache: SpriteCache | None = None
+
+
+def get_sprite_cache() -> SpriteCache:
+    """
+    Gets the sprite cache shared by the whole game.
+    :return: sprite cache
+    """
+    global _sprite_cache
+    if _sprite_cache is None:
+        _sprite_cache = SpriteCache()
+    return _sprite_cache
@@ -3,6 +3,7 @@ Overlay class.
 """
 import pygame
 
+from ..asset_manager import get_asset_manager
 from ..config.globals import CHESS_BOARD_COLORS
 from ..enums import OverlayType
 from ..mid_game.power_ups import PowerUp
@@ -13,17 +14,47 @@ COLOR_SCHEME = {
     OverlayType.POSSIBLE_MOVE_ATTACK: pygame.Color("red"),
     OverlayType.BACKGROUND: pygame.Color(100, 100, 100),
 }
+ALPHA_SCHEME = {
+    OverlayType.SELECTED_FIGURE: 100,
+    OverlayType.POSSIBLE_MOVE_NORMAL: 100,
+    OverlayType.POSSIBLE_MOVE_ATTACK: 100,
+    OverlayType.BACKGROUND: 255,
+}
+# pre-baked tiles by (overlay type, square size), shared by all overlays
+OVERLAY_TILES: dict[tuple[OverlayType, int], pygame.Surface] = {}
+
+
+def get_overlay_tile(overlay_type: OverlayType, square_size: int) -> pygame.Surface:
+    """
+    Gets the tile of an overlay type. The tile is filled once and shared, so it must not be drawn on.
+    :param overlay_type: overlay type of the COLOR_SCHEME
+    :param square_size: size of the square
+    :return: tile
+    """
+    key = (overlay_type, square_size)
+    tile = OVERLAY_TILES.get(key)
+    if tile is None:
+        tile = pygame.Surface((square_size, square_size))
+        if pygame.display.get_surface() is not None:
+            tile = tile.convert()
+        tile.fill(COLOR_SCHEME[overlay_type])
+        # a surface alpha blends the whole tile without per pixel alpha
+        if ALPHA_SCHEME[overlay_type] < 255:
+            tile.set_alpha(ALPHA_SCHEME[overlay_type])
+        OVERLAY_TILES[key] = tile
+    return tile
 
 
 class SquareOverlay:
     """
-    Base class for all overlays.
+    Base class for all overlays. The subclasses set the surface.
     """
     square_id: int
     overlay_type: OverlayType
     center_pos: tuple[int, int]
     overlay_rect: pygame.Rect
     overlay_surface: pygame.Surface
+    version: int
 
     def __init__(self, overlay_type: OverlayType, center_pos: tuple[int, int], square_size: int,
                  square_id: int) -> None:
@@ -31,7 +62,22 @@ class SquareOverlay:
         self.overlay_type = overlay_type
         self.center_pos = center_pos
         self.overlay_rect = pygame.Rect(center_pos, (square_size, square_size))
-        self.overlay_surface = pygame.Surface((square_size, square_size))
+        self.version = 0
+
+    def get_draw_state(self) -> tuple:
+        """
+        Gets what the overlay draws, used to find the regions that changed since the last frame.
+        :return: region, type and version of the surface
+        """
+        return tuple(self.overlay_rect), self.overlay_type, self.version
+
+    def set_position(self, center_pos: tuple[int, int]) -> None:
+        """
+        Moves the overlay, so it can be reused for another square.
+        :param center_pos: new position
+        """
+        self.center_pos = center_pos
+        self.overlay_rect.topleft = center_pos
 
     def draw(self, surface: pygame.Surface) -> None:
         """
@@ -52,11 +98,18 @@ class SquareOverlayMove(SquareOverlay):
         x, y = center_pos
         self.overlay_color = COLOR_SCHEME[overlay_type]
         self.overlay_rect = pygame.Rect(x, y, square_size, square_size)
-        self.overlay_surface = pygame.Surface((square_size, square_size), pygame.SRCALPHA)
-        self.overlay_surface.set_alpha(100)
+        self.overlay_surface = get_overlay_tile(overlay_type, square_size)
+
+    def set_overlay_type(self, overlay_type: OverlayType) -> None:
+        """
+        Changes the type of the overlay.
+        :param overlay_type: new overlay type
+        """
+        self.overlay_type = overlay_type
+        self.overlay_color = COLOR_SCHEME[overlay_type]
+        self.overlay_surface = get_overlay_tile(overlay_type, self.overlay_rect.width)
 
     def draw(self, surface):
-        pygame.draw.rect(self.overlay_surface, self.overlay_color, self.overlay_surface.get_rect())
         surface.blit(self.overlay_surface, self.overlay_rect)
 
 
@@ -64,13 +117,13 @@ class SquareOverlayPromotion(SquareOverlay):
     """
     SquareOverlayPromotion class.
     """
-    image_path: str
+    figure: pygame.Surface
 
     def __init__(self, overlay_type: OverlayType, center_pos: tuple[int, int], square_size: int, square_id: int,
-                 image_path: str):
+                 figure: pygame.Surface):
         super().__init__(overlay_type, center_pos, square_size, square_id)
         x, y = center_pos
-        self.image_path = image_path
+        self.figure = figure
         self.overlay_rect = pygame.Rect(x, y, square_size, square_size)
         self._create_overlay_surface_base(square_size)
         self._update_overlay_with_edges()
@@ -105,8 +158,7 @@ class SquareOverlayPromotion(SquareOverlay):
         Updates the overlay with the figure.
         :param square_size: Size of the square.
         """
-        figure = pygame.transform.scale(pygame.image.load(self.image_path), (square_size, square_size))
-        self.overlay_surface.blit(figure, (0, 0))
+        self.overlay_surface.blit(self.figure, (0, 0))
 
 
 class SquareOverlayPowerUp(SquareOverlay):
@@ -143,8 +195,7 @@ class SquareOverlayPowerUp(SquareOverlay):
         Updates the overlay with the figure.
         :param square_size: Size of the square.
         """
-        figure = pygame.transform.scale(pygame.image.load(self.image_path), (square_size, square_size))
-        self.overlay_surface.blit(figure, (0, 0))
+        self.overlay_surface.blit(get_asset_manager().get_image(self.image_path, (square_size, square_size)), (0, 0))
 
     def _update_overlay_with_edges(self) -> None:
         """
@@ -165,6 +216,7 @@ class SquareOverlayPowerUp(SquareOverlay):
         self.overlay_surface.fill(CHESS_BOARD_COLORS[1])
         self._update_overlay_with_figure(self.overlay_rect.width)
         self._update_overlay_with_edges()
+        self.version += 1
 
 
 class SquareOverlayPowerupBackground(SquareOverlay):
@@ -178,8 +230,7 @@ class SquareOverlayPowerupBackground(SquareOverlay):
         x, y = center_pos
         self.overlay_color = COLOR_SCHEME[overlay_type]
         self.overlay_rect = pygame.Rect(x, y, square_size, square_size)
-        self.overlay_surface = pygame.Surface((square_size, square_size), pygame.SRCALPHA)
+        self.overlay_surface = get_overlay_tile(overlay_type, square_size)
 
     def draw(self, surface):
-        pygame.draw.rect(self.overlay_surface, self.overlay_color, self.overlay_surface.get_rect())
         surface.blit(self.overlay_surface, self.overlay_rect)
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""
+This module benchmarks drawing the widgets of the mid game. Run it with: python -m src.render_benchmark
+"""
+import itertools
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+from src.mid_game.evaluation_bar import EvaluationBar
+
+
+def run_evaluation_bar_benchmark(frames: int) -> tuple[float, float, float]:
+    """
+    Draws the evaluation bar while it stands still and while it animates after an evaluation change.
+    :param frames: number of frames
+    :return: seconds per still frame, bytes allocated per still frame and seconds per animated frame
+    """
+    surface = pygame.Surface((100, 1000))
+    bar = EvaluationBar((10, 10), (50, 980))
+    bar.evaluation_value = 0.5
+    bar.update(1000)
+    bar.draw(surface)
+    # still frames
+    start = time.perf_counter()
+    for _ in itertools.repeat(None, frames):
+        bar.draw(surface)
+    still_time = (time.perf_counter() - start) / frames
+    # allocations of the still frames, the loop itself must not allocate
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    for _ in itertools.repeat(None, frames):
+        bar.draw(surface)
+    allocated = tracemalloc.get_traced_memory()[1] - memory_before
+    tracemalloc.stop()
+    # animated frames, the value swings between both sides
+    start = time.perf_counter()
+    for _ in range(frames):
+        if not bar.is_animating():
+            bar.evaluation_value = -bar.evaluation_value
+        bar.update(16)
+        bar.draw(surface)
+    animated_time = (time.perf_counter() - start) / frames
+    return still_time, allocated / frames, animated_time
+
+
+if __name__ == "__main__":
+    still_time, allocated, animated_time = run_evaluation_bar_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
+    print(f'evaluation bar: {still_time * 1e6:.1f} us and {allocated:.2f} bytes allocated per still frame, '
+          f'{animated_time * 1e6:.1f} us per animated frame')
@@ -0,0 +1,89 @@
+"""
+This module contains the helpers for the dirty rect rendering.
+"""
+import time
+
+import pygame
+
+DrawStates = dict[int, tuple]
+
+
+def get_changed_rects(drawn_states: DrawStates, current_states: DrawStates) -> list[pygame.Rect]:
+    """
+    Compares what was drawn with what would be drawn now. A draw state is a tuple, whose first element is the
+    (x, y, width, height) of the drawn region, the rest tells if the content changed.
+    :param drawn_states: draw states of the last draw by object id
+    :param current_states: current draw states by object id
+    :return: old and new regions of everything that moved, changed, appeared or disappeared
+    """
+    rects = []
+    for key, drawn_state in drawn_states.items():
+        current_state = current_states.get(key)
+        if current_state != drawn_state:
+            rects.append(pygame.Rect(drawn_state[0]))
+            if current_state is not None:
+                rects.append(pygame.Rect(current_state[0]))
+    for key, current_state in current_states.items():
+        if key not in drawn_states:
+            rects.append(pygame.Rect(current_state[0]))
+    return rects
+
+
+class FrameStats:
+    """
+    This class counts the cost of the rendered frames, to compare full and dirty rect rendering.
+    """
+    frames: int
+    full_frames: int
+    skipped_frames: int
+    updated_pixels: int
+    screen_pixels: int
+    draw_time: float
+
+    def __init__(self, screen_size: tuple[int, int]) -> None:
+        self.frames = 0
+        self.full_frames = 0
+        self.skipped_frames = 0
+        self.updated_pixels = 0
+        self.screen_pixels = screen_size[0] * screen_size[1]
+        self.draw_time = 0.0
+
+    def __repr__(self):
+        return f'FrameStats frames {self.frames} full {self.full_frames} skipped {self.skipped_frames} ' \
+               f'updated {self.get_updated_share():.1%} of the pixels ' \
+               f'draw {self.get_average_draw_time() * 1000:.2f} ms per frame'
+
+    def add_frame(self, dirty_rects: list[pygame.Rect] | None, start_time: float) -> None:
+        """
+        Adds a rendered frame.
+        :param dirty_rects: updated regions, None for a full refresh
+        :param start_time: time.perf_counter() before the frame was drawn
+        """
+        self.frames += 1
+        self.draw_time += time.perf_counter() - start_time
+        if dirty_rects is None:
+            self.full_frames += 1
+            self.updated_pixels += self.screen_pixels
+        elif not dirty_rects:
+            self.skipped_frames += 1
+        else:
+            self.updated_pixels += sum(rect.width * rect.height for rect in dirty_rects)
+
+    def get_updated_share(self) -> float:
+        """
+        Gets the share of the screen that was sent to the display, 1.0 if every frame was a full refresh.
+        Overlapping dirty rects are counted twice.
+        :return: updated share
+        """
+        if self.frames == 0:
+            return 0.0
+        return self.updated_pixels / (self.frames * self.screen_pixels)
+
+    def get_average_draw_time(self) -> float:
+        """
+        Gets the average time to draw and update a frame.
+        :return: time in seconds
+        """
+        if self.frames == 0:
+            return 0.0
+        return self.draw_time / self.frames
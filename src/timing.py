@@ -0,0 +1,78 @@
+"""
+This module contains the StartupTimer class, which measures how long the start of the game takes.
+"""
+import threading
+import time
+
+FIRST_INTERACTIVE_FRAME = "first interactive frame"
+WARM_UP_DONE = "warm-up done"
+
+
+class StartupTimer:
+    """
+    This class represents the startup timer. Marks are the seconds since the timer was created, only the first
+    mark of a name counts. Marks can be set from any thread.
+    """
+    start_time: float
+    marks: dict[str, float]
+    lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.start_time = time.perf_counter()
+        self.marks = {}
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return 'StartupTimer ' + ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, seconds in self._get_marks())
+
+    def mark(self, name: str) -> None:
+        """
+        Marks that something happened now.
+        :param name: name of the mark
+        """
+        with self.lock:
+            if name not in self.marks:
+                self.marks[name] = time.perf_counter() - self.start_time
+
+    def get_mark_or_none(self, name: str) -> float | None:
+        """
+        Gets the seconds from the start to a mark.
+        :param name: name of the mark
+        :return: seconds or None if not marked yet
+        """
+        with self.lock:
+            return self.marks.get(name)
+
+    def get_report(self) -> str:
+        """
+        Gets the startup phases, every mark with the time since the start and since the mark before.
+        :return: report
+        """
+        lines = ["startup timing:"]
+        previous_seconds = 0.0
+        for name, seconds in self._get_marks():
+            lines.append(f'  {name}: {seconds * 1000:.0f} ms (+{(seconds - previous_seconds) * 1000:.0f} ms)')
+            previous_seconds = seconds
+        return "\n".join(lines)
+
+    def _get_marks(self) -> list[tuple[str, float]]:
+        """
+        Gets the marks in the order they happened.
+        :return: names and seconds
+        """
+        with self.lock:
+            return sorted(self.marks.items(), key=lambda mark: mark[1])
+
+
+_startup_timer: StartupTimer | None = None
+
+
+def get_startup_timer() -> StartupTimer:
+    """
+    Gets the startup timer, it starts with the first call.
+    :return: startup timer
+    """
+    global _startup_timer
+    if _startup_timer is None:
+        _startup_timer = StartupTimer()
+    return _startup_timer